@@ -0,0 +1,218 @@
+"""
+Admin-only operational endpoints: cache and connection pool statistics and
+similar runtime views
+"""
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.security import HTTPBearer
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import LOG_DIRS
+from app.core.metrics import metrics
+from app.core.principal import principal_cache
+from app.core.profiling import request_profiler
+from app.core.ratelimit import rate_limiter
+from app.core.hashing import hasher
+from app.db import session
+from app.db.pool import pool_status
+from app.services import review_cache
+from app.services.audit import audit_sink
+from app.services.availability import availability_index
+from app.services.export import (EXPORT_FORMATS, MEDIA_TYPES, USER_ROLES, USER_STATUSES,
+    user_export_query, review_export_query, stream_export)
+from app.services.review_ingest import INGEST_FORMATS, ingest_reviews
+from app.utils.decorators import admin_required
+
+router = APIRouter(prefix="/admin")
+security = HTTPBearer()
+
+
+# ----------------- Principal cache -----------------
+@router.get("/principal_cache", dependencies=[Depends(security)])
+@admin_required
+def principal_cache_stats(request: Request):
+    """
+    Hit/miss counters of the authenticated-user cache in this worker
+    """
+    return principal_cache.stats()
+
+
+# ----------------- Review listing cache -----------------
+@router.get("/review_cache", dependencies=[Depends(security)])
+@admin_required
+def review_cache_stats(request: Request):
+    """
+    Hit/miss counters of the review listing response cache in this worker
+    """
+    return review_cache.listing_cache.stats()
+
+
+# ----------------- Audit sink -----------------
+@router.get("/audit", dependencies=[Depends(security)])
+@admin_required
+def audit_stats(request: Request):
+    """
+    Queue depth and written/dropped/failed counters of the audit writer
+    """
+    return audit_sink.stats()
+
+
+# ----------------- Availability index -----------------
+@router.get("/availability_index", dependencies=[Depends(security)])
+@admin_required
+def availability_index_stats(request: Request):
+    """
+    Size of the where-to-watch index in this worker and of its pending delta
+    """
+    return availability_index.stats()
+
+
+# ----------------- Rate limits -----------------
+@router.get("/rate_limits", dependencies=[Depends(security)])
+@admin_required
+def rate_limit_stats(request: Request):
+    """
+    Configured limits, allowed/rejected counters and bucket count of the rate limiter
+    """
+    return rate_limiter.stats()
+
+
+# ----------------- Slow statements -----------------
+@router.get("/slow_queries", dependencies=[Depends(security)])
+@admin_required
+def slow_queries(request: Request):
+    """
+    Slowest statement of each request, top METRICS_SLOW_STATEMENTS since start (same data as /metrics)
+    """
+    return {"statements": metrics.slowest()}
+
+
+# ----------------- Request profiles -----------------
+@router.get("/profiles", dependencies=[Depends(security)])
+@admin_required
+def list_profiles(request: Request):
+    """
+    Captured request profiles in this worker, newest first, and the capture counters
+    """
+    return {"stats": request_profiler.stats(), "profiles": request_profiler.list_captures()}
+
+
+@router.get("/profiles/{filename}", dependencies=[Depends(security)])
+@admin_required
+def download_profile(request: Request, filename: str):
+    """
+    Downloads one capture file: <name>.json (request, SQL and summary), <name>.prof
+    (cProfile, for python -m pstats) or <name>.folded (sampled stacks, for flamegraphs)
+    """
+    path = request_profiler.capture_path(filename)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    media_type = "application/json" if filename.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+
+# ----------------- Connection pools -----------------
+@router.get("/pool", dependencies=[Depends(security)])
+@admin_required
+def pool_stats(request: Request):
+    """
+    Checked-out, idle and overflow connections and checkout wait time of the
+    pools in this worker
+    """
+    pools = {"sync": pool_status(session.get_engine().pool)}
+    if session.async_engine is not None:
+        pools["async"] = pool_status(session.async_engine.pool)
+    return pools
+
+
+# ----------------- Password hashing -----------------
+@router.get("/hashing", dependencies=[Depends(security)])
+@admin_required
+def hashing_stats(request: Request):
+    """
+    Queue depth, rejections, queue time and hash latency of the KDF executor
+    """
+    return hasher.stats()
+
+
+# ----------------- Bulk review ingestion -----------------
+def _run_ingest(spool, fmt: str, chunk_size: int, rejected_path: str):
+    spool.seek(0)
+    db = session.SessionLocal()
+    try:
+        lines = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        return ingest_reviews(db, lines, fmt=fmt, chunk_size=chunk_size, rejected_path=rejected_path)
+    finally:
+        db.close()
+        spool.close()
+
+
+@router.post("/reviews/ingest", dependencies=[Depends(security)])
+@admin_required
+async def ingest_review_dump(request: Request, format: str = "ndjson", chunkSize: int = 1000):
+    """
+    Streams an NDJSON or CSV review dump from the request body (user_id,
+    movie_id, rating, comment per row) and bulk inserts it
+    """
+    if format not in INGEST_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of {INGEST_FORMATS}")
+    # spool the upload so memory stays bounded, then ingest off the event loop
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    rejected_path = os.path.join(LOG_DIRS, f"ingest_rejected_{datetime.utcnow():%Y%m%d_%H%M%S_%f}.ndjson")
+    return await run_in_threadpool(_run_ingest, spool, format, chunkSize, rejected_path)
+
+
+# ----------------- Bulk export -----------------
+def _export_response(request: Request, kind: str, query, fmt: str, chunk_size: int, filters: dict):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of {EXPORT_FORMATS}")
+    filters = {key: value for key, value in filters.items() if value is not None}
+    audit_sink.record(request.state.user.id, "admin_export", f"Exported {kind} as {fmt} {filters}")
+    filename = f"{kind}_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return StreamingResponse(
+        stream_export(session.SessionLocal, query, fmt, chunk_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/export/users", dependencies=[Depends(security)])
+@admin_required
+def export_users(request: Request, format: str = "ndjson", role: Optional[str] = None,
+        user_status: Optional[str] = Query(None, alias="status"), createdFrom: Optional[datetime] = None,
+        createdTo: Optional[datetime] = None, afterId: Optional[int] = None, limit: Optional[int] = Query(None, ge=1),
+        chunkSize: int = Query(1000, ge=1, le=10000)):
+    """
+    Streams users (without password hashes) in id order as NDJSON or CSV. To
+    resume an interrupted export pass the last id received as afterId
+    """
+    if role is not None and role not in USER_ROLES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"role must be one of {USER_ROLES}")
+    if user_status is not None and user_status not in USER_STATUSES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"status must be one of {USER_STATUSES}")
+    query = user_export_query(role=role, status=user_status, created_from=createdFrom, created_to=createdTo,
+        after_id=afterId, limit=limit)
+    return _export_response(request, "users", query, format, chunkSize, {"role": role, "status": user_status,
+        "createdFrom": createdFrom, "createdTo": createdTo, "afterId": afterId, "limit": limit})
+
+
+@router.get("/export/reviews", dependencies=[Depends(security)])
+@admin_required
+def export_reviews(request: Request, format: str = "ndjson", movieId: Optional[int] = None,
+        userId: Optional[int] = None, createdFrom: Optional[datetime] = None, createdTo: Optional[datetime] = None,
+        afterId: Optional[int] = None, limit: Optional[int] = Query(None, ge=1),
+        chunkSize: int = Query(1000, ge=1, le=10000)):
+    """
+    Streams reviews in id order as NDJSON or CSV, optionally of one movie or
+    user. To resume an interrupted export pass the last id received as afterId
+    """
+    query = review_export_query(movie_id=movieId, user_id=userId, created_from=createdFrom, created_to=createdTo,
+        after_id=afterId, limit=limit)
+    return _export_response(request, "reviews", query, format, chunkSize, {"movieId": movieId, "userId": userId,
+        "createdFrom": createdFrom, "createdTo": createdTo, "afterId": afterId, "limit": limit})
@@ -2,9 +2,11 @@
 This module handles authentication functionality, including login, token
 management, and user verification for the application.
 """
+import uuid
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer 
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.repositories.user_repository import UserRepository
 from app.models.user import User, UserLogins
@@ -16,6 +18,10 @@ from app.core.security import PasswordManager, JWTManager
 from app.utils.decorators import login_required, admin_required
 from app.db.session import get_db 
 from app.core.logger import logger
+from app.core.principal import invalidate_principal
+from app.core.revocation import token_denylist
+from app.core import hashing
+from app.services import audit
 
 
 router = APIRouter(prefix="/auth")
@@ -36,17 +42,16 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     This route is for user registration
     """
     logger.info({
-                "message":"User registration has started",
-                "timestamp": datetime.utcnow().isoformat()
+                "message":"User registration has started"
                 })
     service = UserService(db)
     created_user = service.create_user(user.username, user.email, user.role, user.password)
+    audit.record(created_user.id, "register", f"Registered as {created_user.role}")
     logger.info({
             "event": "user_registered",
             "username": user.username,
             "email": user.email,
-            "role": user.role,
-            "timestamp": datetime.utcnow().isoformat()
+            "role": user.role
         })
 
     return {"message":"User registered successfully"}
@@ -59,16 +64,14 @@ def get_users(request:Request,db: Session = Depends(get_db)):
     Route for getting all the users details generally only for admins
     """
     logger.info({
-             "message":"Getting the info of all the users",
-             "timestamp": datetime.utcnow().isoformat()
+             "message":"Getting the info of all the users"
              })
     service= UserService(db)
     users= service.list_users()
     logger.info({
         "event": "admin_view_users",
         "admin": request.state.user.username,
-        "total_users": len(users),
-        "timestamp": datetime.utcnow().isoformat()
+        "total_users": len(users)
     })
 
     return [
@@ -93,20 +96,19 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
          This is the login route
     """
     logger.info({
-              "message":"Logging route request received",
-              "timestamp": datetime.utcnow().isoformat()
+              "message":"Logging route request received"
         }) 
 
     db_user = db.query(User).filter(User.email == user.email).first()
 
-    if not db_user or not db_user.verify_password(user.password):
+    if not db_user or not hashing.verify_password(user.password, db_user.password):
         logger.warning({
-                    "message":"Error in verify password or user access",
-                    "timestamp": datetime.utcnow().isoformat()    
+                    "message":"Error in verify password or user access"
                         })
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    token = JWTManager.create_jwt({"user_id": db_user.id, "role": db_user.role})
+    # jti identifies this token for revocation on logout
+    token = JWTManager.create_jwt({"user_id": db_user.id, "role": db_user.role, "jti": uuid.uuid4().hex})
    # db_user.status= "active"
     # Save login record
     login_record = UserLogins(
@@ -121,13 +123,15 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(login_record)
     db.refresh(db_user)
+    invalidate_principal(db_user.id)
+    hashing.rehash_if_needed(db_user.id, user.password, db_user.password)
+    audit.record(db_user.id, "login")
 
     logger.info({
         "event": "login_success",
         "user_id": db_user.id,
         "username": db_user.username,
-        "email": db_user.email,
-        "timestamp": datetime.utcnow().isoformat()
+        "email": db_user.email
     })
 
     return {
@@ -148,11 +152,10 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 @login_required
 async def me(request: Request):
     user = request.state.user
-    logger.debug({
+    logger.debug(lambda: {
         "event": "user_profile_accessed",
         "user_id": user.id,
-        "username": user.username,
-        "timestamp": datetime.utcnow().isoformat()
+        "username": user.username
     })
     return {
         "id": user.id,
@@ -170,8 +173,7 @@ def logout(request: Request,db: Session=Depends(get_db)):
     Route for logout with the auth-credentials which is the access token
     """
     logger.info({
-                "message":"Logout route accessed",
-                "timestamp": datetime.utcnow().isoformat()
+                "message":"Logout route accessed"
                  }) 
     auth_header = request.headers.get("Authorization")
     token = auth_header.split(" ")[1] if auth_header else None
@@ -179,39 +181,36 @@ def logout(request: Request,db: Session=Depends(get_db)):
     if not token:
         logger.warning({
             "event": "logout_failed",
-            "reason": "missing_token",
-            "timestamp": datetime.utcnow().isoformat()
+            "reason": "missing_token"
         })
         raise HTTPException(status_code=401, detail="Token missing")
 
-    #Handling user logins table
-    login_record= db.query(UserLogins).filter(UserLogins.token == token).first()
-    users= db.query(UserLogins).filter(UserLogins.user_id == login_record.user_id).all()
-    
-    if not login_record or login_record.status == "suspended":
+    #Handling user logins table: one UPDATE on this token's row (unique index on token)
+    user_id = request.state.user.id
+    suspended = db.execute(
+        update(UserLogins)
+        .where(UserLogins.token == token, UserLogins.status != "suspended")
+        .values(status="suspended")
+    ).rowcount
+    if not suspended:
         logger.warning({
-            "message":"Check for login record and user can be suspended",
-            "timestamp": datetime.utcnow().isoformat()            
+            "message":"Check for login record and user can be suspended"
             })
         raise HTTPException(status_code= status.HTTP_400_BAD_REQUEST, detail= "Check for login record and user can be suspended")
-    
-    for user in users:
-        user.status= "suspended"
 
-    # We should even handle the user table by changing its status
-    User_update_record = db.query(User).filter(User.id == login_record.user_id).first()
-    if not User_update_record:
-       raise HTTPException(status_code=404, detail="User not found")
-
-    User_update_record.status = "suspended"
+    # Revoke the token itself; checked by the middleware without a DB hit
+    claims = getattr(request.state, "token_claims", {})
+    if claims.get("jti") and claims.get("exp"):
+        token_denylist.revoke(db, claims["jti"], user_id, float(claims["exp"]))
 
+    # We should even handle the user table by changing its status
+    db.execute(update(User).where(User.id == user_id).values(status="suspended"))
     db.commit()
-    db.refresh(login_record) 
-    db.refresh(User_update_record)
+    invalidate_principal(user_id)
+    audit.record(user_id, "logout")
     logger.info({
         "event": "logout_success",
-        "user": request.state.user.username,
-        "timestamp": datetime.utcnow().isoformat()
+        "user": request.state.user.username
     })
     return {"message": f"User '{request.state.user.username}' logged out successfully"}
 
@@ -233,6 +232,8 @@ def delete_users(request:Request, user_id : int,db: Session = Depends(get_db)):
         raise HTTPException(status_code= status.HTTP_404_NOT_FOUND, detail="User not found")
     db.delete(deleted)
     db.commit()
+    invalidate_principal(user_id)
+    audit.record(request.state.user.id, "admin_delete_user", f"Deleted user {user_id}")
 
     logger.info("User successfully deleted")
     return {"deleted": deleted}
@@ -246,8 +247,7 @@ def update_user(request:Request, userid: int, user: UserCreate, db: Session = De
     Route for updating the existing user
     """
     logger.info({
-                 "message":"Update user route accessed",
-                 "timestamp": datetime.utcnow().isoformat()            
+                 "message":"Update user route accessed"
                  }) 
     repo = UserRepository(db)
     existing_user = db.query(User).filter(User.id == userid).first()
@@ -256,38 +256,34 @@ def update_user(request:Request, userid: int, user: UserCreate, db: Session = De
 
     if existing_user.role!= user.role:
         logger.warning({
-                         "message":"Cannot change the role",
-                         "timestamp": datetime.utcnow().isoformat()
+                         "message":"Cannot change the role"
                         })
         raise HTTPException(status_code= status.HTTP_403_FORBIDDEN, detail= "Cannot change the role")
 
     if not repo.get_by_id(userid):
         logger.warning({
-                         "message":"User details not found",
-                         "timestamp": datetime.utcnow().isoformat()
+                         "message":"User details not found"
                         }) 
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User details not found")
    
     user_object= repo.get_by_email(user.email)
     if user_object and user_object.id!= userid:
         logger.warning({
-                        "message":"Error with the email",
-                         "timestamp": datetime.utcnow().isoformat()
+                        "message":"Error with the email"
                         })
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
                             detail="Error with the email")
    
     if not PasswordManager.is_strong_password(user.password):
         logger.warning({
-                      "message":"Use strong passwords for safety reasons",
-                      "timestamp": datetime.utcnow().isoformat()            
+                      "message":"Use strong passwords for safety reasons"
                         })
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password too weak. Must be 8+ chars, include uppercase, lowercase, number & special char."
         )
  
-    hashed_pw = PasswordManager.hash_password(user.password)
+    hashed_pw = hashing.hash_password(user.password)
    
     for attr, value in {
         "username": user.username,
@@ -299,6 +295,8 @@ def update_user(request:Request, userid: int, user: UserCreate, db: Session = De
    
     db.commit()
     db.refresh(existing_user)
+    invalidate_principal(existing_user.id)
+    audit.record(request.state.user.id, "admin_update_user", f"Updated user {existing_user.id}")
 
     logger.info("User successfully updated")
     return {
@@ -0,0 +1,76 @@
+"""
+Async version of the login route, mounted in front of app.api.v1.auth when
+USE_ASYNC_DB is enabled
+"""
+import uuid
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.repositories.user_repository import AsyncUserRepository
+from app.models.user import UserLogins
+from app.schemas.user import UserLogin
+from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.security import JWTManager
+from app.db.session import get_async_db
+from app.core.logger import logger
+from app.core.principal import invalidate_principal
+from app.core import hashing
+from app.services import audit
+
+
+router = APIRouter(prefix="/auth")
+
+
+# ----------------- Login -----------------
+@router.post("/login")
+async def login_async(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    """
+         This is the login route
+    """
+    logger.info({
+              "message":"Logging route request received"
+        })
+
+    db_user = await AsyncUserRepository(db).get_by_email(user.email)
+
+    # the KDF is CPU bound, keep it off the event loop
+    if not db_user or not await hashing.verify_password_async(user.password, db_user.password):
+        logger.warning({
+                    "message":"Error in verify password or user access"
+                        })
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    # jti identifies this token for revocation on logout
+    token = JWTManager.create_jwt({"user_id": db_user.id, "role": db_user.role, "jti": uuid.uuid4().hex})
+    login_record = UserLogins(
+        user_id=db_user.id,
+        token=token,
+        expiration_date=datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+    db_user.status= "active"
+    db.add(login_record)
+    await db.commit()
+    invalidate_principal(db_user.id)
+    hashing.rehash_if_needed(db_user.id, user.password, db_user.password)
+    audit.record(db_user.id, "login")
+
+    logger.info({
+        "event": "login_success",
+        "user_id": db_user.id,
+        "username": db_user.username,
+        "email": db_user.email
+    })
+
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "user": {
+            "id": db_user.id,
+            "username": db_user.username,
+            "email": db_user.email,
+            "role": db_user.role,
+            "status": db_user.status
+        }
+        }
@@ -0,0 +1,45 @@
+from datetime import date
+from fastapi.security import HTTPBearer
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.db.session import get_db
+from app.services.availability import where_to_watch, streaming_on_platform, MAX_BATCH_MOVIES
+from app.core.logger import logger
+
+router = APIRouter(prefix="/availability")
+security = HTTPBearer()
+
+
+@router.get("/movies", dependencies=[Depends(security)])
+def movies_availability(region: str, movieIds: List[int] = Query(..., min_length=1, max_length=MAX_BATCH_MOVIES),
+    on: Optional[date] = None, db: Session = Depends(get_db)):
+    """
+    Where to watch a page of movies in a region, in one lookup
+    """
+    logger.info({
+        "message":"Batch availability route accessed"
+    })
+    return where_to_watch(db, region=region, movie_ids=movieIds, on=on)
+
+
+@router.get("/movies/{movie_id}", dependencies=[Depends(security)])
+def movie_availability(movie_id: int, region: str, on: Optional[date] = None, db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Movie availability route accessed"
+    })
+    result = where_to_watch(db, region=region, movie_ids=[movie_id], on=on)
+    return {"movie_id": movie_id, "region": result["region"], "date": result["date"],
+        "availability": result["movies"][str(movie_id)]}
+
+
+@router.get("/platforms/{platform_id}", dependencies=[Depends(security)])
+def platform_availability(platform_id: int, region: str, on: Optional[date] = None, days: int = Query(7, ge=1, le=90),
+    size: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    What is streaming on a platform in a region over the next `days` days (a week by default)
+    """
+    logger.info({
+        "message":"Platform availability route accessed"
+    })
+    return streaming_on_platform(db, region=region, platform_id=platform_id, on=on, days=days, size=size, cursor=cursor)
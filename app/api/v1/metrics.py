@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPBearer
+from app.core.metrics import metrics
+from app.utils.decorators import admin_required
+
+router = APIRouter()
+security = HTTPBearer()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(security)])
+@admin_required
+def prometheus_metrics(request: Request):
+    """
+    Request latency, SQL and in-flight metrics of this worker in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,41 @@
+from fastapi.security import HTTPBearer
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.db.session import get_db
+from app.services.movie_search import search_movies
+from app.services import leaderboards
+from app.core.logger import logger
+
+router = APIRouter(prefix="/movies")
+security = HTTPBearer()
+
+
+@router.get("/search", dependencies=[Depends(security)])
+def search(q: str = Query(..., min_length=1, max_length=200), genre: Optional[str] = None, language: Optional[str] = None,
+    release_year: Optional[int] = None, size: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+    db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Movie search route accessed"
+    })
+    return search_movies(db, q=q, genre=genre, language=language, release_year=release_year, size=size, cursor=cursor)
+
+
+@router.get("/top", dependencies=[Depends(security)])
+def top_rated(genre: Optional[str] = None, language: Optional[str] = None, limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Top rated movies route accessed"
+    })
+    boards = leaderboards.ensure_fresh(db, wait=False)
+    return {"movies": boards.top_rated(genre=genre, language=language, limit=limit)}
+
+
+@router.get("/trending", dependencies=[Depends(security)])
+def trending(genre: Optional[str] = None, language: Optional[str] = None, limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Trending movies route accessed"
+    })
+    boards = leaderboards.ensure_fresh(db, wait=False)
+    return {"movies": boards.trending(genre=genre, language=language, limit=limit)}
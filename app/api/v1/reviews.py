@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.schemas.reviews import ReviewCreate, ReviewUpdate, ReviewOut, PaginatedReviews
-from app.services.user_reviews import add_review, update_review, delete_review, list_reviews_by_movie, like_review
+from app.services import review_cache, audit
+from app.services.user_reviews import add_review, update_review, delete_review, list_reviews_by_movie, like_review, unlike_review
 from app.core.logger import logger
 from typing import Optional
 from datetime import datetime
@@ -20,37 +21,39 @@ def _get_user_from_request(request: Request):
 @login_required
 def create_review(request: Request, payload: ReviewCreate, db: Session = Depends(get_db)):
     logger.info({
-        "message":"Create review route accessed",
-        "timestamp":datetime.now().isoformat()
+        "message":"Create review route accessed"
     })
     user = _get_user_from_request(request)
     review = add_review(db, user_id=user.id, movie_id=payload.movie_id, rating=payload.rating, comment=payload.comment)
+    audit.record(user.id, "review_create", f"Reviewed movie {payload.movie_id} with rating {payload.rating}")
     logger.info({
-        "message":"Create review successful",
-        "timestamp":datetime.now().isoformat()
+        "message":"Create review successful"
     })
     return review
 
 
 @router.get("/reviews/by-movie/{movie_id}",dependencies=[Depends(security)])
-def get_reviews(movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0, userId: Optional[int] = None, sort: str = "created_at", order: str = "desc", db: Session = Depends(get_db)):
+def get_reviews(request: Request, movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0, userId: Optional[int] = None, sort: str = "created_at", order: str = "desc", cursor: Optional[str] = None, includeTotal: bool = False, db: Session = Depends(get_db)):
     logger.info({
-        "message":"Get reviews by movie-id route accessed",
-        "timestamp":datetime.now().isoformat()
+        "message":"Get reviews by movie-id route accessed"
     })
-    result = list_reviews_by_movie(db, movie_id=movie_id, page=page, size=size, ratingFrom=ratingFrom, userId=userId, sort=sort, order=order)
-    return result
+    key = review_cache.listing_key(movie_id, page=page, size=size, ratingFrom=ratingFrom, userId=userId, sort=sort, order=order, cursor=cursor, includeTotal=includeTotal)
+    entry = review_cache.listing_cache.get(key)
+    if entry is None:
+        result = list_reviews_by_movie(db, movie_id=movie_id, page=page, size=size, ratingFrom=ratingFrom, userId=userId, sort=sort, order=order, cursor=cursor, includeTotal=includeTotal)
+        entry = review_cache.store(key, result)
+    return review_cache.respond(request, entry)
 
 
 @router.put("/reviews/{review_id}",status_code=status.HTTP_200_OK,dependencies=[Depends(security)])
 @admin_required
 def modify_review(request: Request, review_id: int, payload: ReviewUpdate, db: Session = Depends(get_db)):
     logger.info({
-        "message":"Update review route accessed",
-        "timestamp":datetime.now().isoformat()
+        "message":"Update review route accessed"
     })
     user = _get_user_from_request(request)
     updated = update_review(db, review_id=review_id, user_id=user.id, rating=payload.rating, comment=payload.comment)
+    audit.record(user.id, "review_update", f"Updated review {review_id}")
     
     return {
         "user_id":updated.user_id,
@@ -64,21 +67,33 @@ def modify_review(request: Request, review_id: int, payload: ReviewUpdate, db: S
 @admin_required
 def remove_review(request:Request, review_id: int, user_id:int, db: Session = Depends(get_db)):
     logger.info({
-        "message":"Delete review route accessed",
-        "timestamp":datetime.now().isoformat()
+        "message":"Delete review route accessed"
     })
     if delete_review(db, review_id=review_id, user_id=user_id):
+         audit.record(request.state.user.id, "review_delete", f"Deleted review {review_id} of user {user_id}")
          return {"message":"Successfully user deleted"}
 
 
 @router.post("/reviews/{review_id}/like",dependencies=[Depends(security)])
 def like_a_review(request: Request, review_id: int, db: Session = Depends(get_db)):
     logger.info({
-        "message":"Like a review route accessed",
-        "timestamp":datetime.now().isoformat()
+        "message":"Like a review route accessed"
+    })
+    user = _get_user_from_request(request)
+    result = like_review(db, review_id=review_id, user_id=user.id)
+    audit.record(user.id, "review_like", f"{result['message']}: review {review_id}")
+    return result
+
+
+@router.delete("/reviews/{review_id}/like",dependencies=[Depends(security)])
+def unlike_a_review(request: Request, review_id: int, db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Unlike a review route accessed"
     })
     user = _get_user_from_request(request)
-    return like_review(db, review_id=review_id, user_id=user.id)
+    result = unlike_review(db, review_id=review_id, user_id=user.id)
+    audit.record(user.id, "review_unlike", f"Unliked review {review_id}")
+    return result
 
 
 # admin access to remove the review
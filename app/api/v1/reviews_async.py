@@ -0,0 +1,69 @@
+"""
+Async versions of the hot review routes. Mounted in front of app.api.v1.reviews
+when USE_ASYNC_DB is enabled so these paths are served without a threadpool slot.
+"""
+from fastapi.security import HTTPBearer
+from fastapi import APIRouter, Depends, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.schemas.reviews import ReviewCreate
+from app.services import user_reviews_async, review_cache, audit
+from app.core.logger import logger
+from typing import Optional
+from app.utils.decorators import login_required
+
+router = APIRouter(prefix="/user")
+security = HTTPBearer()
+
+def _get_user_from_request(request: Request):
+    return getattr(request.state, "user", None)
+
+
+@router.post("/reviews", status_code=status.HTTP_201_CREATED, dependencies=[Depends(security)])
+@login_required
+async def create_review_async(request: Request, payload: ReviewCreate, db: AsyncSession = Depends(get_async_db)):
+    logger.info({
+        "message":"Create review route accessed"
+    })
+    user = _get_user_from_request(request)
+    review = await user_reviews_async.add_review(db, user_id=user.id, movie_id=payload.movie_id, rating=payload.rating, comment=payload.comment)
+    audit.record(user.id, "review_create", f"Reviewed movie {payload.movie_id} with rating {payload.rating}")
+    logger.info({
+        "message":"Create review successful"
+    })
+    return review
+
+
+@router.get("/reviews/by-movie/{movie_id}",dependencies=[Depends(security)])
+async def get_reviews_async(request: Request, movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0, userId: Optional[int] = None, sort: str = "created_at", order: str = "desc", cursor: Optional[str] = None, includeTotal: bool = False, db: AsyncSession = Depends(get_async_db)):
+    logger.info({
+        "message":"Get reviews by movie-id route accessed"
+    })
+    key = review_cache.listing_key(movie_id, page=page, size=size, ratingFrom=ratingFrom, userId=userId, sort=sort, order=order, cursor=cursor, includeTotal=includeTotal)
+    entry = review_cache.listing_cache.get(key)
+    if entry is None:
+        result = await user_reviews_async.list_reviews_by_movie(db, movie_id=movie_id, page=page, size=size, ratingFrom=ratingFrom, userId=userId, sort=sort, order=order, cursor=cursor, includeTotal=includeTotal)
+        entry = review_cache.store(key, result)
+    return review_cache.respond(request, entry)
+
+
+@router.post("/reviews/{review_id}/like",dependencies=[Depends(security)])
+async def like_a_review_async(request: Request, review_id: int, db: AsyncSession = Depends(get_async_db)):
+    logger.info({
+        "message":"Like a review route accessed"
+    })
+    user = _get_user_from_request(request)
+    result = await user_reviews_async.like_review(db, review_id=review_id, user_id=user.id)
+    audit.record(user.id, "review_like", f"{result['message']}: review {review_id}")
+    return result
+
+
+@router.delete("/reviews/{review_id}/like",dependencies=[Depends(security)])
+async def unlike_a_review_async(request: Request, review_id: int, db: AsyncSession = Depends(get_async_db)):
+    logger.info({
+        "message":"Unlike a review route accessed"
+    })
+    user = _get_user_from_request(request)
+    result = await user_reviews_async.unlike_review(db, review_id=review_id, user_id=user.id)
+    audit.record(user.id, "review_unlike", f"Unliked review {review_id}")
+    return result
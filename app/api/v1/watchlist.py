@@ -0,0 +1,55 @@
+from fastapi.security import HTTPBearer
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.db.session import get_db
+from app.schemas.watchlist import WatchlistMovies, WatchlistPage, MAX_BULK_MOVIES
+from app.services.watchlist import add_to_watchlist, remove_from_watchlist, list_watchlist, watchlist_contains
+from app.core.logger import logger
+from app.utils.decorators import login_required
+
+router = APIRouter(prefix="/user")
+security = HTTPBearer()
+
+def _get_user_from_request(request: Request):
+    return getattr(request.state, "user", None)
+
+
+@router.get("/watchlist", response_model=WatchlistPage, dependencies=[Depends(security)])
+@login_required
+def get_watchlist(request: Request, size: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Get watchlist route accessed"
+    })
+    user = _get_user_from_request(request)
+    return list_watchlist(db, user_id=user.id, size=size, cursor=cursor)
+
+
+@router.post("/watchlist", dependencies=[Depends(security)])
+@login_required
+def add_watchlist(request: Request, payload: WatchlistMovies, db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Add to watchlist route accessed"
+    })
+    user = _get_user_from_request(request)
+    return add_to_watchlist(db, user_id=user.id, movie_ids=payload.movie_ids)
+
+
+@router.delete("/watchlist", dependencies=[Depends(security)])
+@login_required
+def remove_watchlist(request: Request, movieIds: List[int] = Query(..., min_length=1, max_length=MAX_BULK_MOVIES), db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Remove from watchlist route accessed"
+    })
+    user = _get_user_from_request(request)
+    return remove_from_watchlist(db, user_id=user.id, movie_ids=movieIds)
+
+
+@router.get("/watchlist/contains", dependencies=[Depends(security)])
+@login_required
+def contains_watchlist(request: Request, movieIds: List[int] = Query(..., min_length=1, max_length=MAX_BULK_MOVIES), db: Session = Depends(get_db)):
+    logger.info({
+        "message":"Watchlist membership route accessed"
+    })
+    user = _get_user_from_request(request)
+    return watchlist_contains(db, user_id=user.id, movie_ids=movieIds)
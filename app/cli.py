@@ -0,0 +1,201 @@
+"""
+Maintenance commands for the application, run with `python -m app.cli <command>`
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from app.db.session import SessionLocal, get_engine
+
+
+# ----------------- Rebuild rating aggregates -----------------
+def rebuild_ratings(args):
+    from app.services.user_reviews import rebuild_movie_rating_aggregates
+
+    db = SessionLocal()
+    try:
+        updated = rebuild_movie_rating_aggregates(db, movie_ids=args.movie_id or None, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"Rebuilt rating aggregates for {updated} movies")
+
+
+# ----------------- Reconcile like counts -----------------
+def reconcile_likes(args):
+    from app.services.user_reviews import reconcile_like_counts
+
+    db = SessionLocal()
+    try:
+        updated = reconcile_like_counts(db, review_ids=args.review_id or None)
+    finally:
+        db.close()
+    print(f"Reconciled like_count of {updated} reviews")
+
+
+def backfill_likes(args):
+    from app.services.user_reviews import backfill_like_counts
+
+    db = SessionLocal()
+    try:
+        updated = backfill_like_counts(db, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"Backfilled like_count of {updated} reviews")
+
+
+# ----------------- Bulk review ingestion -----------------
+def ingest(args):
+    from app.services.review_ingest import ingest_reviews
+
+    db = SessionLocal()
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    try:
+        report = ingest_reviews(db, source, fmt=args.format, chunk_size=args.chunk_size, rejected_path=args.rejected)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+# ----------------- Sentiment rescoring -----------------
+def rescore_sentiment(args):
+    from app.services.sentiment import rescore_reviews
+
+    db = SessionLocal()
+    try:
+        rescored = rescore_reviews(db, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"Rescored sentiment of {rescored} reviews")
+
+
+# ----------------- Recommendations -----------------
+def recommend(args):
+    from app.services.recommender import run_recommender
+
+    db = SessionLocal()
+    try:
+        report = run_recommender(db, full=args.full, neighbors=args.neighbors, per_user=args.per_user,
+            memory_mb=args.memory_mb)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+# ----------------- Bulk export -----------------
+def export(args):
+    from app.services.export import user_export_query, review_export_query, stream_export
+
+    if args.kind == "users":
+        query = user_export_query(role=args.role, status=args.status, created_from=args.created_from,
+            created_to=args.created_to, after_id=args.after_id, limit=args.limit)
+    else:
+        query = review_export_query(movie_id=args.movie_id, user_id=args.user_id, created_from=args.created_from,
+            created_to=args.created_to, after_id=args.after_id, limit=args.limit)
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in stream_export(SessionLocal, query, args.format, chunk_size=args.chunk_size):
+            target.write(chunk)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+
+# ----------------- Schema -----------------
+def create_schema(args):
+    from app.db import schema
+
+    created = schema.create_schema(get_engine())
+    print(f"Created {len(created)} tables" + (f": {', '.join(created)}" if created else ""))
+
+
+# Added with 0 on movies that may already have reviews: the first review write
+# would then set Movies.rating from that one review, so they are rebuilt at once
+_RATING_AGGREGATE_STEPS = {f"add column Movies.{name}" for name in ("rating_sum", "rating_count", "rating_sq_sum")}
+
+
+def upgrade_schema(args):
+    from app.db import schema
+    from app.services.user_reviews import rebuild_movie_rating_aggregates
+
+    report = schema.upgrade_schema(get_engine(), dry_run=args.dry_run)
+    if _RATING_AGGREGATE_STEPS & set(report["steps"]):
+        step = "rebuild Movies rating aggregates from Reviews"
+        if not args.dry_run:
+            db = SessionLocal()
+            try:
+                step += f" ({rebuild_movie_rating_aggregates(db)} movies)"
+            finally:
+                db.close()
+        report["steps"].append(step)
+    print(json.dumps(report, indent=2))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Stream users or reviews as NDJSON/CSV in id order")
+    export_cmd.add_argument("kind", choices=["users", "reviews"])
+    export_cmd.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export_cmd.add_argument("--output", default="-", help="Output file, or - for stdout")
+    export_cmd.add_argument("--role", choices=["admin", "user"], help="users only")
+    export_cmd.add_argument("--status", choices=["active", "suspended"], help="users only")
+    export_cmd.add_argument("--movie-id", type=int, help="reviews only")
+    export_cmd.add_argument("--user-id", type=int, help="reviews only")
+    export_cmd.add_argument("--created-from", type=datetime.fromisoformat, help="Inclusive, ISO date or datetime")
+    export_cmd.add_argument("--created-to", type=datetime.fromisoformat, help="Exclusive, ISO date or datetime")
+    export_cmd.add_argument("--after-id", type=int, help="Resume after this id")
+    export_cmd.add_argument("--limit", type=int)
+    export_cmd.add_argument("--chunk-size", type=int, default=1000)
+    export_cmd.set_defaults(func=export)
+
+    create_cmd = commands.add_parser("create-schema", help="Create the tables that do not exist yet")
+    create_cmd.set_defaults(func=create_schema)
+
+    upgrade_cmd = commands.add_parser("upgrade-schema", help="Add missing tables, columns and indexes (never drops), rebuilding rating aggregates they add")
+    upgrade_cmd.add_argument("--dry-run", action="store_true", help="Only print the planned changes")
+    upgrade_cmd.set_defaults(func=upgrade_schema)
+
+    rebuild = commands.add_parser("rebuild-ratings", help="Recompute Movies rating aggregates from Reviews")
+    rebuild.add_argument("--movie-id", type=int, action="append", help="Only rebuild these movies (repeatable)")
+    rebuild.add_argument("--chunk-size", type=int, default=1000)
+    rebuild.set_defaults(func=rebuild_ratings)
+
+    reconcile = commands.add_parser("reconcile-likes", help="Recompute Reviews.like_count from Review_Liked")
+    reconcile.add_argument("--review-id", type=int, action="append", help="Only reconcile these reviews (repeatable)")
+    reconcile.set_defaults(func=reconcile_likes)
+
+    backfill = commands.add_parser("backfill-like-counts", help="Set NULL Reviews.like_count to 0 (needed by the helpful sort)")
+    backfill.add_argument("--chunk-size", type=int, default=10000)
+    backfill.set_defaults(func=backfill_likes)
+
+    ingest_cmd = commands.add_parser("ingest-reviews", help="Bulk load an NDJSON/CSV review dump")
+    ingest_cmd.add_argument("path", help="Input file, or - for stdin")
+    ingest_cmd.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    ingest_cmd.add_argument("--chunk-size", type=int, default=1000)
+    ingest_cmd.add_argument("--rejected", default="rejected_reviews.ndjson", help="Where to write rejected rows")
+    ingest_cmd.set_defaults(func=ingest)
+
+    rescore = commands.add_parser("rescore-sentiment", help="Rescore Reviews.sentiment_score with the current lexicon (resumable)")
+    rescore.add_argument("--chunk-size", type=int, default=1000)
+    rescore.set_defaults(func=rescore_sentiment)
+
+    recommend_cmd = commands.add_parser("recommend", help="Refresh the Recommendation table (incremental unless --full)")
+    recommend_cmd.add_argument("--full", action="store_true", help="Recompute item similarities from every rating")
+    recommend_cmd.add_argument("--neighbors", type=int, help="Similar movies kept per movie")
+    recommend_cmd.add_argument("--per-user", type=int, help="Recommendations written per user")
+    recommend_cmd.add_argument("--memory-mb", type=int, help="Working memory budget for the similarity blocks")
+    recommend_cmd.set_defaults(func=recommend)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
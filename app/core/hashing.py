@@ -0,0 +1,198 @@
+"""
+Dedicated executor for the password KDF (hash/verify). Keeps the CPU heavy work
+off the request threads and the event loop, caps how many hashes run at once
+and rejects with 503 instead of queueing without bound during login bursts.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from app.core.logger import logger
+from app.core.settings import settings
+
+
+# Module level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    from app.core.security import PasswordManager
+    return PasswordManager.hash_password(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    from app.core.security import pwd_context
+    return pwd_context.verify(password, hashed)
+
+
+def _timed(fn, submitted_at: float, *args):
+    started_at = time.time()
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, started_at - submitted_at, time.perf_counter() - start
+
+
+class HashingExecutor:
+
+    def __init__(self, max_workers: int, max_queue: int, use_processes: bool = False):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._pool = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    pool_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+                    self._pool = pool_cls(max_workers=self.max_workers)
+        return self._pool
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            _, queued, took = future.result()
+            self.completed += 1
+            self.queue_time_total += queued
+            self.hash_time_total += took
+            self.queue_time_max = max(self.queue_time_max, queued)
+            self.hash_time_max = max(self.hash_time_max, took)
+
+    def submit(self, fn, *args):
+        """
+        Returns a future resolving to (result, queue seconds, run seconds), or
+        raises 503 when every worker is busy and the queue is full
+        """
+        pool = self._get_pool()
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            future = pool.submit(_timed, fn, time.time(), *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args):
+        # For sync callers, which already run on a threadpool thread
+        return self.submit(fn, *args).result()[0]
+
+    async def run_async(self, fn, *args):
+        result = await asyncio.wrap_future(self.submit(fn, *args))
+        return result[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executor": "process" if self.use_processes else "thread",
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_time_avg_seconds": self.queue_time_total / self.completed if self.completed else 0.0,
+                "queue_time_max_seconds": self.queue_time_max,
+                "hash_time_avg_seconds": self.hash_time_total / self.completed if self.completed else 0.0,
+                "hash_time_max_seconds": self.hash_time_max,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+hasher = HashingExecutor(
+    max_workers=settings.hash_workers,
+    max_queue=settings.hash_queue_limit,
+    use_processes=settings.hash_executor == "process",
+)
+
+
+def hash_password(password: str) -> str:
+    return hasher.run(_hash, password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return hasher.run(_verify, password, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hasher.run_async(_hash, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await hasher.run_async(_verify, password, hashed)
+
+
+# Writes the upgraded hashes; a slow or locked database only delays these,
+# never the hash executor's result delivery to waiting logins
+_store_pool = None
+_store_pool_lock = threading.Lock()
+
+
+def _get_store_pool():
+    global _store_pool
+    if _store_pool is None:
+        with _store_pool_lock:
+            if _store_pool is None:
+                _store_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash-store")
+    return _store_pool
+
+
+def _store_rehash(user_id: int, hashed: str, new_hash: str):
+    from app.db.session import SessionLocal
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        # only replace the hash we verified against, never a newer password
+        db.execute(update(User).where(User.id == user_id, User.password == hashed).values(password=new_hash))
+        db.commit()
+        logger.info("Rehashed password of user %s with current parameters", user_id)
+    except Exception:
+        logger.exception("Password rehash failed for user %s", user_id)
+    finally:
+        db.close()
+
+
+def rehash_if_needed(user_id: int, password: str, hashed: str):
+    """
+    After a successful login, upgrades a hash made with outdated parameters.
+    Runs in the background on the executor; the response does not wait for it.
+    """
+    from app.core.security import pwd_context
+
+    if not pwd_context.needs_update(hashed):
+        return
+    try:
+        future = hasher.submit(_hash, password)
+    except HTTPException:
+        # saturated, the next login will try again
+        return
+
+    def _store(done):
+        # runs on the thread that completed the hash: hand the write off at once
+        if done.cancelled() or done.exception() is not None:
+            return
+        _get_store_pool().submit(_store_rehash, user_id, hashed, done.result()[0])
+
+    future.add_done_callback(_store)
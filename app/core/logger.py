@@ -1,18 +1,121 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import os
+from app.core.settings import settings
 
 LOG_DIRS= "logs"
 os.makedirs(LOG_DIRS, exist_ok= True)
 
+# Set per request by RequestIdMiddleware and stamped on every record
+request_id_var: ContextVar = ContextVar("request_id", default=None)
+
+
+# Values the JSON formatter renders as they are; anything else is turned into
+# its str() before the record is queued
+_PLAIN_TYPES = (str, int, float, bool, type(None), list, tuple, dict)
+
+
+def _resolve_msg(msg):
+    # Lazy structured fields: a callable is only evaluated when the level is
+    # enabled (NonBlockingQueueHandler.prepare resolves it on the calling thread)
+    return msg() if callable(msg) else msg
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Dict messages are merged into the object, so
+    callers log fields and let the formatter add time, level and request id.
+    """
+
+    def format(self, record):
+        msg = record.msg = _resolve_msg(record.msg)
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.module,
+            "request_id": getattr(record, "request_id", None),
+        }
+        if isinstance(msg, dict):
+            entry.update(msg)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+
+    def format(self, record):
+        record.msg = _resolve_msg(record.msg)
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue drained by a QueueListener thread, so file
+    I/O and rotation never run on the request thread. When the queue is full
+    the drop policy decides: "drop_new" discards the record, "drop_oldest"
+    discards the oldest queued one, "block" waits for room.
+    """
+
+    def __init__(self, log_queue, drop_policy: str = "drop_new"):
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Runs on the calling thread. Lazy callables and %-args are resolved
+        # here, while the objects they read (ORM instances, request state) are
+        # still what the caller logged; the listener only renders and writes
+        record.request_id = request_id_var.get()
+        msg = _resolve_msg(record.msg)
+        if isinstance(msg, dict):
+            msg = {key: value if isinstance(value, _PLAIN_TYPES) else str(value) for key, value in msg.items()}
+        elif record.args:
+            record.msg = msg
+            msg = record.getMessage()
+            record.args = None
+        record.msg = msg
+        return record
+
+    def enqueue(self, record):
+        if self.drop_policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.drop_policy == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(record)
+                    self.dropped += 1
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+
 # Naming the logger
 logger = logging.getLogger("AuthLogger")
-logger.setLevel(logging.DEBUG)
+logger.setLevel(settings.log_level)
+logger.propagate = False
 
 # Now we make a custom logger to handle all the auth_logging
 
-formatter = logging.Formatter(
-    fmt="%(asctime)s [%(levelname)s] [%(module)s] %(message)s",
+formatter = TextFormatter(
+    fmt="%(asctime)s [%(levelname)s] [%(module)s] [%(request_id)s] %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S"
 )
 
@@ -28,9 +131,12 @@ file_handler = RotatingFileHandler(
     backupCount=3
 )
 file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-
-# Add handlers to logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+file_handler.setFormatter(JsonFormatter())
 
+# Handlers run on the listener thread; the logger itself only enqueues
+log_queue = queue.Queue(maxsize=settings.log_queue_size)
+queue_handler = NonBlockingQueueHandler(log_queue, drop_policy=settings.log_drop_policy)
+listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+logger.addHandler(queue_handler)
+listener.start()
+atexit.register(listener.stop)
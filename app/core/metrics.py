@@ -0,0 +1,228 @@
+"""
+In-process request and SQL metrics, rendered in the Prometheus text format at
+/metrics.
+
+MetricsMiddleware times every request and labels it with the route template
+(not the raw path, so ids do not explode the series count), method and status.
+SQLAlchemy cursor events count statements and their time into the RequestStats
+of the request that issued them (found through a ContextVar, which follows the
+request into the threadpool and into the async engine's greenlets). Statements
+run outside a request (background threads, CLI) only reach the global totals.
+
+Observations are a bisect and a few integer adds under a lock.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.settings import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+_STATEMENT_MAX_CHARS = 300
+_WHITESPACE_RE = re.compile(r"\s+")
+_INF = 'le="+Inf"'
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+
+request_stats_var: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_bound(bound) -> str:
+    return repr(float(bound)) if not isinstance(bound, int) else str(bound)
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_bound(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, _INF)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self, slow_statements: int = 20):
+        self._lock = threading.Lock()
+        self.latency = Histogram("http_request_duration_seconds",
+            "Request latency by route template, method and status", ("route", "method", "status"), LATENCY_BUCKETS)
+        self.db_time = Histogram("http_request_db_seconds",
+            "Time spent in SQL statements per request", ("route", "method"), LATENCY_BUCKETS)
+        self.db_queries = Histogram("http_request_db_queries",
+            "SQL statements executed per request", ("route", "method"), QUERY_COUNT_BUCKETS)
+        self.in_flight = 0
+        self.queries_total = 0
+        self.query_seconds_total = 0.0
+        # (route, scope) -> requests rejected by the rate limiter
+        self.rate_limited = {}
+        self.slow_statements = slow_statements
+        # (route, statement) -> worst seconds, for the slowest statements seen;
+        # _slow_floor is the fastest of them once the list is full
+        self._slowest = {}
+        self._slow_floor = 0.0
+        self.started_at = time.time()
+
+    # ----------------- Recording -----------------
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, route: str, method: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.in_flight -= 1
+            self.latency.observe((route, method, str(status)), seconds)
+            self.db_time.observe((route, method), stats.db_seconds)
+            self.db_queries.observe((route, method), stats.queries)
+            if stats.slowest_statement is not None:
+                self._track_slow(stats.slowest_seconds, stats.slowest_statement, route)
+
+    def query_finished(self, seconds: float):
+        with self._lock:
+            self.queries_total += 1
+            self.query_seconds_total += seconds
+
+    def request_rate_limited(self, route: str, scope: str):
+        with self._lock:
+            key = (route, scope)
+            self.rate_limited[key] = self.rate_limited.get(key, 0) + 1
+
+    def _track_slow(self, seconds: float, statement: str, route: str):
+        full = len(self._slowest) >= self.slow_statements
+        if full and seconds <= self._slow_floor:
+            return
+        key = (route, normalize_statement(statement))
+        if key in self._slowest:
+            self._slowest[key] = max(self._slowest[key], seconds)
+        else:
+            if full:
+                del self._slowest[min(self._slowest, key=self._slowest.get)]
+            self._slowest[key] = seconds
+        if len(self._slowest) >= self.slow_statements:
+            self._slow_floor = min(self._slowest.values())
+
+    # ----------------- Reading -----------------
+    def _slowest_first(self):
+        return sorted(self._slowest.items(), key=lambda item: item[1], reverse=True)
+
+    def slowest(self):
+        with self._lock:
+            entries = self._slowest_first()
+        return [{"seconds": round(seconds, 6), "route": route, "statement": statement}
+            for (route, statement), seconds in entries]
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for histogram in (self.latency, self.db_time, self.db_queries):
+                lines.extend(histogram.render())
+            lines += [
+                "# HELP http_requests_in_flight Requests currently being served by this worker",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_rate_limited_total Requests rejected with 429 by the rate limiter",
+                "# TYPE http_rate_limited_total counter",
+            ]
+            for (route, scope), count in sorted(self.rate_limited.items()):
+                lines.append(f"http_rate_limited_total{_format_labels(('route', 'scope'), (route, scope))} {count}")
+            lines += [
+                "# HELP db_queries_total SQL statements executed, including outside requests",
+                "# TYPE db_queries_total counter",
+                f"db_queries_total {self.queries_total}",
+                "# HELP db_query_seconds_total Time spent in SQL statements, including outside requests",
+                "# TYPE db_query_seconds_total counter",
+                f"db_query_seconds_total {self.query_seconds_total}",
+                "# HELP db_slowest_statement_seconds Slowest statement of a request, top entries since start",
+                "# TYPE db_slowest_statement_seconds gauge",
+            ]
+            for (route, statement), seconds in self._slowest_first():
+                labels = _format_labels(("route", "statement"), (route, statement))
+                lines.append(f"db_slowest_statement_seconds{labels} {seconds}")
+            lines += [
+                "# HELP process_start_time_seconds Start time of this worker since the epoch",
+                "# TYPE process_start_time_seconds gauge",
+                f"process_start_time_seconds {self.started_at}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# ----------------- SQLAlchemy hooks -----------------
+# The start time rides on the execution context, which exists once per statement
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._metrics_started_at
+    metrics.query_finished(seconds)
+    stats = request_stats_var.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        if seconds > stats.slowest_seconds:
+            stats.slowest_seconds = seconds
+            stats.slowest_statement = statement
+
+
+def normalize_statement(statement: str) -> str:
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    return statement if len(statement) <= _STATEMENT_MAX_CHARS else statement[:_STATEMENT_MAX_CHARS] + "..."
+
+
+def install_sql_hooks():
+    """
+    Registers the cursor hooks on every Engine (the async engine's sync_engine included)
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+metrics = MetricsRegistry(slow_statements=settings.metrics_slow_statements)
@@ -0,0 +1,30 @@
+"""
+Lightweight snapshot of the authenticated user and the in-process cache that
+lets JWTAuthMiddleware skip the User lookup on most requests
+"""
+from typing import NamedTuple
+from app.core.cache import TTLCache
+from app.core.settings import settings
+
+
+class UserPrincipal(NamedTuple):
+    id: int
+    username: str
+    email: str
+    role: str
+    status: str
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, username=user.username, email=user.email, role=user.role, status=user.status)
+
+
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl)
+
+
+def invalidate_principal(user_id: int):
+    """
+    Must be called whenever a User row changes (status, role, email, deletion),
+    otherwise the old snapshot is served until its TTL runs out
+    """
+    principal_cache.pop(user_id)
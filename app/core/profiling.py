@@ -0,0 +1,377 @@
+"""
+On-demand profiling of single requests, for when one route is slow in
+production and cannot be reproduced elsewhere.
+
+A request is captured when
+- an admin sends the PROFILE_HEADER header, valued "cprofile" or "sample"
+  (anything else means PROFILE_MODE), or
+- its route template is drawn by PROFILE_SAMPLE_RATES, e.g.
+  "/auth/get_users=0.05,/user/reviews/by-movie/{movie_id}=0.01".
+
+Each capture is written to PROFILE_DIR as <name>.json (route, status, timings,
+every SQL statement with its offset and duration, and a text summary) next to
+the profile itself: <name>.prof for cProfile (python -m pstats, snakeviz) or
+<name>.folded for the stack sampler (collapsed stacks for flamegraph.pl or
+speedscope). Only the newest PROFILE_MAX_CAPTURES captures are kept.
+
+cProfile is exact but only sees the threads it is enabled in: the event loop
+thread, where async routes run, and the threadpool calls made through
+profiled_call, which is how login_required/admin_required run the plain def
+routes they wrap. Undecorated def routes are run in the threadpool by FastAPI
+itself and stay invisible to it. The stack sampler, the default PROFILE_MODE,
+follows the request into any threadpool worker once it runs SQL for it (and
+from the start for profiled_call). Both see whatever else the event loop
+interleaves meanwhile, so a worker runs one capture at a time and triggers
+arriving during it are skipped.
+
+Requests that are not captured pay a header lookup in ProfilingMiddleware and a
+ContextVar read per SQL statement.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.logger import logger
+from app.core.settings import settings
+
+PROFILE_MODES = ("cprofile", "sample")
+MAX_STATEMENTS = 1000
+_STATEMENT_MAX_CHARS = 2000
+_SUMMARY_LINES = 40
+_NAME_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_-]")
+_CAPTURE_FILE_RE = re.compile(r"^[A-Za-z0-9_-]+\.(json|prof|folded)$")
+_CAPTURE_SUFFIXES = (".json", ".prof", ".folded")
+# worker thread samples only count while the worker is inside the application
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+def parse_sample_rates(value: str) -> dict:
+    """
+    "/a/{id}=0.01,/b=1" -> {"/a/{id}": 0.01, "/b": 1.0}
+    """
+    rates = {}
+    for item in value.split(","):
+        route, sep, rate = item.strip().rpartition("=")
+        if not sep or not route:
+            continue
+        try:
+            rates[route.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            logger.warning({"message": "Ignoring invalid PROFILE_SAMPLE_RATES entry", "entry": item})
+    return {route: rate for route, rate in rates.items() if rate > 0}
+
+
+def _fold(frame, app_only: bool) -> Optional[str]:
+    names = []
+    in_app = False
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        in_app = in_app or code.co_filename.startswith(_APP_ROOT)
+        frame = frame.f_back
+    if app_only and not in_app:
+        return None
+    names.reverse()
+    return ";".join(names)
+
+
+class StackSampler:
+    """
+    Samples the stacks of the request's threads every interval from a daemon thread
+    """
+
+    def __init__(self, loop_thread: int, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        self.ticks = 0
+        self._loop_thread = loop_thread
+        self._threads = {loop_thread: "event-loop"}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def follow(self, thread_id: int):
+        if thread_id not in self._threads:
+            self._threads[thread_id] = f"worker-{len(self._threads)}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, label in list(self._threads.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _fold(frame, app_only=thread_id != self._loop_thread)
+                if stack is not None:
+                    self.samples[f"{label};{stack}"] += 1
+            self.ticks += 1
+
+
+class ProfileCapture:
+    """
+    One profiled request: its profiler and the SQL statements it executed
+    """
+
+    def __init__(self, name: str, mode: str, trigger: str):
+        self.name = name
+        self.mode = mode
+        self.trigger = trigger
+        self.statements = []
+        self.dropped_statements = 0
+        self.db_seconds = 0.0
+        self.started = 0.0
+        self.seconds = 0.0
+        self.profiler = None
+        self.worker_profilers = []
+        self.sampler = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), settings.profile_sample_interval_ms / 1000.0)
+            self.sampler.start()
+        self.started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self.started
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def run_in_worker(self, func, *args, **kwargs):
+        """
+        Runs func in the calling threadpool worker, profiled like the event loop thread
+        """
+        if self.sampler is not None:
+            self.sampler.follow(threading.get_ident())
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        self.worker_profilers.append(profiler)
+        return profiler.runcall(func, *args, **kwargs)
+
+    def statement_finished(self, started_at: float, statement: str, executemany: bool):
+        seconds = time.perf_counter() - started_at
+        self.db_seconds += seconds
+        if len(self.statements) >= MAX_STATEMENTS:
+            self.dropped_statements += 1
+            return
+        if len(statement) > _STATEMENT_MAX_CHARS:
+            statement = statement[:_STATEMENT_MAX_CHARS] + "..."
+        self.statements.append({
+            "offset_ms": round((started_at - self.started) * 1000, 3),
+            "ms": round(seconds * 1000, 3),
+            "executemany": executemany,
+            "statement": statement,
+        })
+
+
+profile_capture_var: ContextVar[Optional[ProfileCapture]] = ContextVar("profile_capture", default=None)
+
+
+def profiled_call(func, *args, **kwargs):
+    """
+    Calls func, under the request's capture if there is one. Pass it to
+    run_in_threadpool so the worker thread shows up in the profile
+    """
+    capture = profile_capture_var.get()
+    if capture is None:
+        return func(*args, **kwargs)
+    return capture.run_in_worker(func, *args, **kwargs)
+
+
+class RequestProfiler:
+    """
+    Decides which requests are captured and keeps the capture directory bounded
+    """
+
+    def __init__(self, directory: str, max_captures: int, header: str, sample_rates: str, mode: str):
+        self.directory = directory
+        self.max_captures = max(1, max_captures)
+        self.header = header.lower().encode("latin-1")
+        self.sample_rates = parse_sample_rates(sample_rates)
+        self.default_mode = mode if mode in PROFILE_MODES else "sample"
+        self._busy = threading.Lock()
+        self.captured = 0
+        self.skipped_busy = 0
+        self.failed = 0
+
+    # ----------------- Triggering -----------------
+    def header_mode(self, scope) -> Optional[str]:
+        """
+        Mode asked for by the profiling header, or None when it is absent
+        """
+        for name, value in scope["headers"]:
+            if name == self.header:
+                value = value.decode("latin-1").strip().lower()
+                return value if value in PROFILE_MODES else self.default_mode
+        return None
+
+    def begin(self, mode: str, trigger: str, request_id: Optional[str]) -> Optional[ProfileCapture]:
+        if not self._busy.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        suffix = _NAME_UNSAFE_RE.sub("", request_id or "")[:32] or "request"
+        capture = ProfileCapture(f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{suffix}", mode, trigger)
+        try:
+            capture.start()
+        except Exception:
+            self._busy.release()
+            raise
+        return capture
+
+    def finish(self, capture: ProfileCapture, request: dict):
+        """
+        Writes the capture (call from a worker thread) and frees the slot for the next one
+        """
+        try:
+            self._write(capture, request)
+            self.captured += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning({"message": "Could not write request profile", "profile": capture.name, "error": str(e)})
+        finally:
+            self._busy.release()
+
+    # ----------------- Storage -----------------
+    def _write(self, capture: ProfileCapture, request: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, capture.name)
+        if capture.profiler is not None:
+            profile_file = capture.name + ".prof"
+            text = io.StringIO()
+            stats = pstats.Stats(capture.profiler, *capture.worker_profilers, stream=text)
+            stats.dump_stats(base + ".prof")
+            stats.sort_stats("cumulative").print_stats(_SUMMARY_LINES)
+            summary = text.getvalue().strip().splitlines()
+            samples = None
+        else:
+            profile_file = capture.name + ".folded"
+            sampler = capture.sampler
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in sampler.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            summary = [f"{count} {stack}" for stack, count in sampler.samples.most_common(_SUMMARY_LINES)]
+            samples = {"ticks": sampler.ticks, "interval_ms": sampler.interval * 1000}
+
+        record = {
+            "name": capture.name,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            **request,
+            "mode": capture.mode,
+            "trigger": capture.trigger,
+            "duration_ms": round(capture.seconds * 1000, 3),
+            "db_ms": round(capture.db_seconds * 1000, 3),
+            "sql_statements": len(capture.statements) + capture.dropped_statements,
+            "files": [capture.name + ".json", profile_file],
+            "samples": samples,
+            "summary": summary,
+            "statements": capture.statements,
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=1)
+        self._prune()
+
+    def _capture_names(self):
+        try:
+            files = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # names start with a UTC timestamp, so they sort oldest first
+        return sorted(f[:-len(".json")] for f in files if f.endswith(".json"))
+
+    def _prune(self):
+        names = self._capture_names()
+        for name in names[:-self.max_captures]:
+            for suffix in _CAPTURE_SUFFIXES:
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    # ----------------- Reading -----------------
+    def list_captures(self):
+        captures = []
+        for name in reversed(self._capture_names()):
+            try:
+                with open(os.path.join(self.directory, name + ".json"), encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            record.pop("summary", None)
+            record.pop("statements", None)
+            captures.append(record)
+        return captures
+
+    def capture_path(self, filename: str) -> Optional[str]:
+        """
+        Path of a capture file, or None when the name is not one (no path traversal)
+        """
+        if not _CAPTURE_FILE_RE.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.isfile(path) else None
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "skipped_busy": self.skipped_busy,
+            "failed": self.failed,
+            "kept": len(self._capture_names()),
+            "max_captures": self.max_captures,
+            "sample_rates": self.sample_rates,
+            "directory": self.directory,
+        }
+
+
+# ----------------- SQLAlchemy hooks -----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = profile_capture_var.get()
+    if capture is not None:
+        context._profile_started_at = time.perf_counter()
+        if capture.sampler is not None:
+            capture.sampler.follow(threading.get_ident())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = profile_capture_var.get()
+    if capture is not None:
+        capture.statement_finished(context._profile_started_at, statement, executemany)
+
+
+def install_profiling_hooks():
+    """
+    Registers the statement capture hooks on every Engine
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+request_profiler = RequestProfiler(
+    directory=settings.profile_dir,
+    max_captures=settings.profile_max_captures,
+    header=settings.profile_header,
+    sample_rates=settings.profile_sample_rates,
+    mode=settings.profile_mode,
+)
@@ -0,0 +1,281 @@
+"""
+Token-bucket rate limiting for the expensive routes: login (a password KDF
+and a User_Logins insert per attempt), registration, review writes and likes.
+
+RATE_LIMITS configures limits per route template and method, e.g.
+"POST /user/reviews=user:30/60|ip:300/60": each user may create 30 reviews
+and each client address 300 per minute, with bursts up to those numbers.
+Every limit is its own bucket per key; a request must get a token from all
+of them, and the tokens it took are given back when a later limit rejects it.
+"user" limits do not apply to unauthenticated requests; "email" limits key on
+the email of the JSON body (per account attempts on login) and do not apply
+to bodies without one.
+
+Buckets live in this worker (MemoryBuckets) or, with RATE_LIMIT_BACKEND=sqlite,
+in a SQLite file shared by the workers of one host (SQLiteBuckets). A bucket
+that has been idle for a full period is full again, exactly like a missing
+one, so idle buckets are evicted without changing any decision.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.core.logger import logger
+from app.core.settings import settings
+
+RATE_LIMIT_SCOPES = ("ip", "user", "email")
+_SWEEP_INTERVAL = 1.0
+
+
+class Limit(NamedTuple):
+    scope: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_rate_limits(value: str) -> Dict[Tuple[str, str], Tuple[Limit, ...]]:
+    """
+    "POST /a/{id}=user:30/60|ip:300/60" -> {("POST", "/a/{id}"): (Limit("user", 30, 60.0), Limit("ip", 300, 60.0))}
+    """
+    rules = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            route, _, spec = entry.partition("=")
+            method, path = route.split()
+            limits = []
+            for item in spec.split("|"):
+                scope, _, amount = item.strip().partition(":")
+                requests, _, seconds = amount.partition("/")
+                limit = Limit(scope, int(requests), float(seconds))
+                if scope not in RATE_LIMIT_SCOPES or limit.capacity < 1 or limit.period <= 0:
+                    raise ValueError(item)
+                limits.append(limit)
+            rules[(method.upper(), path)] = tuple(limits)
+        except ValueError:
+            logger.warning({"message": "Ignoring invalid RATE_LIMITS entry", "entry": entry})
+    return rules
+
+
+class MemoryBuckets:
+    """
+    Buckets of this worker in an OrderedDict kept in last-use order: a take is
+    a lookup and a move_to_end, and evicting idle keys pops from the front
+    until the first recently used one, so bookkeeping is O(1) amortized.
+    Beyond max_keys the least recently used bucket is dropped (it restarts full).
+    """
+    blocking = False
+
+    def __init__(self, max_keys: int, idle_after: float):
+        self.max_keys = max_keys
+        self.idle_after = idle_after
+        # key -> [tokens, last update]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self.evicted_idle = 0
+        self.evicted_full = 0
+
+    def take(self, key: str, limit: Limit) -> float:
+        """
+        Takes a token; returns 0 when granted, else the seconds until one is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = limit.capacity
+            else:
+                tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+                self._buckets.move_to_end(key)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / limit.rate
+            if not wait:
+                tokens -= 1
+            if bucket is None:
+                self._buckets[key] = [tokens, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted_full += 1
+            else:
+                bucket[0], bucket[1] = tokens, now
+            if now - self._swept_at > _SWEEP_INTERVAL:
+                self._sweep(now)
+            return wait
+
+    def refund(self, key: str, limit: Limit):
+        """
+        Gives back a token taken by take()
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(limit.capacity, bucket[0] + 1)
+
+    def _sweep(self, now: float):
+        self._swept_at = now
+        cutoff = now - self.idle_after
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] > cutoff:
+                break
+            del self._buckets[key]
+            self.evicted_idle += 1
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "keys": len(self._buckets), "max_keys": self.max_keys,
+                "evicted_idle": self.evicted_idle, "evicted_full": self.evicted_full}
+
+
+class SQLiteBuckets:
+    """
+    Buckets in a SQLite file shared by every worker on the host; each take is
+    one IMMEDIATE transaction, so concurrent workers never grant the same token.
+    Calls block (SQLite locking), so the middleware runs them in the threadpool.
+    """
+    blocking = True
+
+    def __init__(self, path: str, idle_after: float):
+        self.path = path
+        self.idle_after = idle_after
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated ON rate_limit_buckets (updated)")
+        self._lock = threading.Lock()
+        self._swept_at = time.time()
+        self.evicted_idle = 0
+
+    def take(self, key: str, limit: Limit) -> float:
+        # wall clock: the timestamps are compared across processes
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = limit.capacity if row is None else min(limit.capacity, row[0] + max(0.0, now - row[1]) * limit.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / limit.rate
+                if not wait:
+                    tokens -= 1
+                self._conn.execute("INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now))
+                if now - self._swept_at > _SWEEP_INTERVAL:
+                    self._swept_at = now
+                    self.evicted_idle += self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?",
+                        (now - self.idle_after,)).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def refund(self, key: str, limit: Limit):
+        with self._lock:
+            self._conn.execute("UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?",
+                (limit.capacity, key))
+
+    def stats(self):
+        with self._lock:
+            keys = self._conn.execute("SELECT count(*) FROM rate_limit_buckets").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "keys": keys, "evicted_idle": self.evicted_idle}
+
+
+class RateLimiter:
+
+    def __init__(self, rules: Dict[Tuple[str, str], Tuple[Limit, ...]], backend_name: str, max_keys: int,
+            sqlite_path: str):
+        self.rules = rules
+        self.backend_name = backend_name
+        self.max_keys = max_keys
+        self.sqlite_path = sqlite_path
+        # a bucket idle for its longest period is full again
+        self.idle_after = max((limit.period for limits in rules.values() for limit in limits), default=60.0)
+        self._backend = None
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = {}
+        self.errors = 0
+
+    @property
+    def backend(self):
+        # created on first use, so importing the app opens no file
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    if self.backend_name == "sqlite":
+                        self._backend = SQLiteBuckets(self.sqlite_path, self.idle_after)
+                    else:
+                        self._backend = MemoryBuckets(self.max_keys, self.idle_after)
+        return self._backend
+
+    def _refund(self, taken):
+        try:
+            for key, limit in taken:
+                self.backend.refund(key, limit)
+        except Exception as e:
+            logger.warning({"message": "Rate limit refund failed", "error": str(e)})
+
+    def check(self, route: str, limits: Tuple[Limit, ...], ip: str, user_id: Optional[int],
+            email: Optional[str] = None):
+        """
+        (retry after seconds, scope) of the first exhausted limit, or None when allowed.
+        Backend failures let the request through
+        """
+        # emails are only kept hashed in the buckets
+        subjects = {"ip": ip, "user": user_id,
+            "email": hashlib.blake2b(email.encode(), digest_size=16).hexdigest() if email else None}
+        taken = []
+        for index, limit in enumerate(limits):
+            subject = subjects[limit.scope]
+            if subject is None:
+                continue
+            key = f"{route}|{index}|{subject}"
+            try:
+                wait = self.backend.take(key, limit)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.warning({"message": "Rate limit backend failed, allowing request", "error": str(e)})
+                return None
+            if wait:
+                # a rejected request must not use up the other limits' tokens
+                self._refund(taken)
+                with self._lock:
+                    key = f"{route} {limit.scope}"
+                    self.rejected[key] = self.rejected.get(key, 0) + 1
+                return max(1, math.ceil(wait)), limit.scope
+            taken.append((key, limit))
+        with self._lock:
+            self.allowed += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            counters = {"allowed": self.allowed, "rejected": dict(self.rejected), "errors": self.errors}
+        rules = {f"{method} {path}": [f"{limit.scope}:{limit.capacity}/{limit.period:g}" for limit in limits]
+            for (method, path), limits in self.rules.items()}
+        return {**counters, "rules": rules, "buckets": self.backend.stats()}
+
+
+rate_limiter = RateLimiter(
+    rules=parse_rate_limits(settings.rate_limits),
+    backend_name=settings.rate_limit_backend,
+    max_keys=settings.rate_limit_max_keys,
+    sqlite_path=settings.rate_limit_sqlite_path,
+)
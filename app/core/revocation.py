@@ -0,0 +1,207 @@
+"""
+JWT revocation by `jti`. Revoked ids live in an in-memory dict (O(1) check in
+JWTAuthMiddleware, no DB hit) with a heap ordered by token expiry, so entries
+are dropped as soon as the token could not be used anyway. Every revocation is
+also written to Revoked_Tokens, which is how it survives restarts and reaches
+the other workers: a maintenance thread pulls new rows, and one worker at a
+time purges expired Revoked_Tokens and User_Logins rows.
+
+The denylist is loaded before the app serves; until a load succeeded,
+JWTAuthMiddleware answers 503 for tokens that carry a jti rather than accept
+a token that may have been revoked.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, insert, delete, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import MaintenanceRuns, RevokedTokens, UserLogins
+
+# Re-read revocations this far behind the newest revoked_at seen, for
+# transactions that committed after a later one
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _utc_naive(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenDenylist:
+
+    def __init__(self):
+        self._revoked = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+        # newest Revoked_Tokens.revoked_at seen by the last sync
+        self.watermark = None
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def _add(self, jti: str, expires_at: float):
+        if expires_at <= time.time() or jti in self._revoked:
+            return
+        self._revoked[jti] = expires_at
+        heapq.heappush(self._expiry, (expires_at, jti))
+
+    def _evict_expired(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._revoked.pop(jti, None)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        # tokens issued before jti was added carry none and fall back to the status checks
+        return jti is not None and jti in self._revoked
+
+    def revoke(self, db: Session, jti: str, user_id: int, expires_at: float):
+        """
+        Persists the revocation in the caller's transaction (the caller commits)
+        and takes effect in this worker immediately
+        """
+        stmt = insert(RevokedTokens).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+        db.execute(stmt.values(jti=jti, user_id=user_id, expires_at=_utc_naive(expires_at)))
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def sync(self, db: Session) -> int:
+        """
+        Pulls revocations written since the last sync (by any worker)
+        """
+        stmt = select(RevokedTokens.jti, RevokedTokens.expires_at, RevokedTokens.revoked_at).where(
+            RevokedTokens.expires_at > _utc_naive(time.time()))
+        if self.watermark is not None:
+            stmt = stmt.where(RevokedTokens.revoked_at >= self.watermark - _SYNC_OVERLAP)
+        rows = db.execute(stmt).all()
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._add(jti, _epoch(expires_at))
+                if revoked_at is not None and (self.watermark is None or revoked_at > self.watermark):
+                    self.watermark = revoked_at
+            self._evict_expired(time.time())
+            self.loaded = True
+        return len(rows)
+
+
+token_denylist = TokenDenylist()
+
+
+def _purge(db: Session, model, column, batch_size: int) -> int:
+    # deleted in id batches so a large backlog never holds long locks
+    now = datetime.utcnow()
+    purged = 0
+    while True:
+        ids = db.scalars(select(model.id).where(column < now).limit(batch_size)).all()
+        if not ids:
+            return purged
+        db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        purged += len(ids)
+
+
+def purge_expired(db: Session, batch_size: int = 1000):
+    logins = _purge(db, UserLogins, UserLogins.expiration_date, batch_size)
+    revoked = _purge(db, RevokedTokens, RevokedTokens.expires_at, batch_size)
+    if logins or revoked:
+        logger.info("Purged %s expired logins and %s expired revocations", logins, revoked)
+    return {"user_logins": logins, "revoked_tokens": revoked}
+
+
+def claim_run(db: Session, name: str, interval: float) -> bool:
+    """
+    True for the one worker that gets to run the periodic job `name` now: its
+    last run (by any worker) is at least 0.9 * interval old. Workers attempt
+    every interval, so the job still runs about once per interval.
+    """
+    if db.get(MaintenanceRuns, name) is None:
+        try:
+            db.add(MaintenanceRuns(name=name))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    now = datetime.utcnow()
+    stmt = (
+        update(MaintenanceRuns)
+        .where(
+            MaintenanceRuns.name == name,
+            or_(MaintenanceRuns.last_run_at.is_(None),
+                MaintenanceRuns.last_run_at <= now - timedelta(seconds=0.9 * interval)),
+        )
+        .values(last_run_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = db.execute(stmt).rowcount == 1
+    db.commit()
+    return claimed
+
+
+# ----------------- Maintenance thread -----------------
+_stop = threading.Event()
+_thread = None
+
+
+def load_denylist():
+    """
+    First sync, run by the lifespan before the app serves. On failure the
+    maintenance thread keeps retrying and the middleware fails closed meanwhile.
+    """
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        loaded = token_denylist.sync(db)
+        db.commit()
+        logger.info("Loaded %s token revocations", loaded)
+    except Exception:
+        db.rollback()
+        logger.exception("Loading the token denylist failed, retrying in the background")
+    finally:
+        db.close()
+
+
+def _maintenance_loop():
+    from app.db.session import SessionLocal
+
+    last_purge = 0.0
+    while True:
+        db = SessionLocal()
+        try:
+            token_denylist.sync(db)
+            db.commit()
+            if time.monotonic() - last_purge >= settings.login_purge_interval:
+                last_purge = time.monotonic()
+                if claim_run(db, "purge_expired", settings.login_purge_interval):
+                    purge_expired(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Token revocation maintenance failed")
+        finally:
+            db.close()
+        if _stop.wait(settings.revocation_sync_interval):
+            return
+
+
+def start_revocation_maintenance():
+    """
+    Keeps the denylist in sync with Revoked_Tokens (load_denylist does the first load)
+    """
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _stop.clear()
+    _thread = threading.Thread(target=_maintenance_loop, name="token-revocation", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop_revocation_maintenance():
+    _stop.set()
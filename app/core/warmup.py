@@ -0,0 +1,70 @@
+"""
+Startup warm-up, run from the lifespan of create_app: opens a few pooled
+connections so the first requests do not pay for connecting, and builds the
+in-memory caches (leaderboards, where-to-watch index) on a background thread
+instead of on the first request that needs them.
+
+Nothing here stops a worker from starting: with the database down, failures
+are logged and connections are made on first use as before.
+"""
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import logger
+from app.core.settings import Settings
+from app.db import session
+
+
+def _warm_sync_pool(count: int):
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(session.get_engine().connect())
+    finally:
+        # back into the pool, where they stay open
+        for connection in connections:
+            connection.close()
+
+
+async def _warm_async_pool(count: int):
+    session.get_async_sessionmaker()
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(await session.async_engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+
+
+def _warm_caches():
+    from app.services import availability, leaderboards
+
+    db = session.SessionLocal()
+    try:
+        for name, ensure_fresh in (("leaderboards", leaderboards.ensure_fresh), ("availability", availability.ensure_fresh)):
+            started = time.perf_counter()
+            try:
+                ensure_fresh(db)
+            except Exception:
+                logger.exception("Warm-up of %s failed", name)
+                db.rollback()
+            else:
+                logger.info({"message": "Cache warmed", "cache": name, "seconds": round(time.perf_counter() - started, 3)})
+    finally:
+        db.close()
+
+
+async def warm_up(app_settings: Settings):
+    started = time.perf_counter()
+    count = min(app_settings.startup_warm_connections, app_settings.db_pool_size)
+    if count > 0:
+        try:
+            await run_in_threadpool(_warm_sync_pool, count)
+            if app_settings.async_db:
+                await _warm_async_pool(count)
+        except Exception as e:
+            logger.warning({"message": "Connection pool warm-up failed", "error": str(e)})
+    if app_settings.startup_warm_caches:
+        threading.Thread(target=_warm_caches, name="cache-warmup", daemon=True).start()
+    logger.info({"message": "Warm-up done", "connections": count, "seconds": round(time.perf_counter() - started, 3)})
@@ -0,0 +1,87 @@
+"""
+Connection pool classes that record checkout wait time, plus a helper that
+reports the live state of an engine's pool
+"""
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolWaitStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_total_seconds": self.wait_total,
+                "checkout_wait_max_seconds": self.wait_max,
+                "checkout_wait_avg_seconds": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            }
+
+
+class _TimedPoolMixin:
+    """
+    Times Pool.connect(), i.e. how long a caller waited for a connection,
+    including opening a new one when the pool had to overflow
+    """
+
+    @property
+    def wait_stats(self) -> PoolWaitStats:
+        stats = self.__dict__.get("_wait_stats")
+        if stats is None:
+            stats = self.__dict__.setdefault("_wait_stats", PoolWaitStats())
+        return stats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(pool):
+    """
+    Checked-out, idle and overflow connections of a pool plus its wait stats
+    """
+    status = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _TimedPoolMixin):
+        status.update(pool.wait_stats.snapshot())
+    return status
@@ -0,0 +1,123 @@
+"""
+Schema management, run explicitly instead of on import:
+
+    python -m app.cli create-schema               # create missing tables (new database)
+    python -m app.cli upgrade-schema --dry-run    # show what an upgrade would add
+    python -m app.cli upgrade-schema              # add missing tables, columns and indexes
+
+Upgrades are add-only: nothing is dropped, renamed or altered. A missing
+NOT NULL column without a server default cannot be added to a table that
+already has rows, so it is reported and left for a manual migration.
+Foreign keys of added columns are not created either. Missing unique
+constraints are added as unique indexes, unless existing rows hold
+duplicates: those are reported and have to be cleaned up first.
+"""
+from typing import List, Tuple
+from sqlalchemy import func, inspect, select, UniqueConstraint
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from app.db.session import Base
+
+
+def _metadata():
+    # registers every model on Base.metadata
+    import app.models.user  # noqa: F401
+
+    return Base.metadata
+
+
+def _applies(index, dialect_name: str) -> bool:
+    # indexes declared with .ddl_if(dialect=...) (the MySQL FULLTEXT ones)
+    ddl_if = getattr(index, "_ddl_if", None)
+    if ddl_if is None or ddl_if.dialect is None:
+        return True
+    dialects = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else ddl_if.dialect
+    return dialect_name in dialects
+
+
+def create_schema(engine: Engine) -> List[str]:
+    """
+    Creates the tables (and their indexes) that do not exist yet, returns their names
+    """
+    metadata = _metadata()
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        missing = [table for table in metadata.sorted_tables if table.name not in existing]
+        metadata.create_all(conn, tables=missing)
+    return [table.name for table in missing]
+
+
+def _has_duplicates(conn, table, columns) -> bool:
+    cols = [table.c[name] for name in columns]
+    stmt = select(*cols).where(*(col.is_not(None) for col in cols)).group_by(*cols).having(func.count() > 1).limit(1)
+    return conn.execute(stmt).first() is not None
+
+
+def plan_upgrade(conn) -> Tuple[List[Tuple[str, object]], List[str]]:
+    """
+    (steps, skipped): steps are (description, DDL string or schema item to create)
+    """
+    metadata = _metadata()
+    inspector = inspect(conn)
+    dialect = conn.dialect
+    preparer = dialect.identifier_preparer
+    existing = set(inspector.get_table_names())
+    steps, skipped = [], []
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            steps.append((f"create table {table.name}", table))
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        existing_indexes = inspector.get_indexes(table.name)
+        existing_uniques = inspector.get_unique_constraints(table.name)
+        names = {index["name"] for index in existing_indexes} | {u["name"] for u in existing_uniques if u.get("name")}
+        # a unique index and a unique constraint on the same columns enforce the same thing
+        unique_columns = {tuple(index["column_names"]) for index in existing_indexes if index.get("unique")}
+        unique_columns |= {tuple(u["column_names"]) for u in existing_uniques}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                skipped.append(f"{table.name}.{column.name}: NOT NULL without a server default")
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {CreateColumn(column).compile(dialect=dialect)}"
+            steps.append((f"add column {table.name}.{column.name}", ddl))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in names or not _applies(index, dialect.name):
+                continue
+            index_columns = tuple(column.name for column in index.columns)
+            if index.unique and index_columns in unique_columns:
+                continue
+            if index.unique and set(index_columns) <= columns and _has_duplicates(conn, table, index_columns):
+                skipped.append(f"{table.name}.{index.name}: duplicate {index_columns} rows, remove them first")
+                continue
+            steps.append((f"create index {index.name} on {table.name}", index))
+        constraints = [c for c in table.constraints if isinstance(c, UniqueConstraint)]
+        for constraint in sorted(constraints, key=lambda c: [column.name for column in c.columns]):
+            constraint_columns = tuple(column.name for column in constraint.columns)
+            name = constraint.name or f"uq_{table.name}_{'_'.join(constraint_columns)}"
+            if name in names or constraint_columns in unique_columns:
+                continue
+            if set(constraint_columns) <= columns and _has_duplicates(conn, table, constraint_columns):
+                skipped.append(f"{table.name}.{name}: duplicate {constraint_columns} rows, remove them first")
+                continue
+            ddl = (f"CREATE UNIQUE INDEX {preparer.quote(name)} ON {preparer.format_table(table)} "
+                f"({', '.join(preparer.quote(column) for column in constraint_columns)})")
+            steps.append((f"create unique index {name} on {table.name}", ddl))
+    return steps, skipped
+
+
+def upgrade_schema(engine: Engine, dry_run: bool = False) -> dict:
+    """
+    Adds missing tables, columns and indexes in one transaction (where the
+    database supports transactional DDL; MySQL commits each statement)
+    """
+    with engine.begin() as conn:
+        steps, skipped = plan_upgrade(conn)
+        if not dry_run:
+            for _, step in steps:
+                if isinstance(step, str):
+                    conn.exec_driver_sql(step)
+                else:
+                    step.create(conn)
+    return {"dry_run": dry_run, "steps": [description for description, _ in steps], "skipped": skipped}
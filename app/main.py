@@ -1,16 +1,83 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.db.session import engine, Base
-from app.api.v1 import auth, reviews
+from starlette.concurrency import run_in_threadpool
+from app.db import session
+from app.api.v1 import auth, reviews, admin, movies, watchlist, availability, metrics
 from app.middleware.auth_middleware import JWTAuthMiddleware
+from app.middleware.request_id_middleware import RequestIdMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.core.metrics import install_sql_hooks
+from app.core.profiling import install_profiling_hooks
 from app.core.logger import logger 
+from app.core.settings import Settings, settings
+from app.core.revocation import load_denylist, start_revocation_maintenance, stop_revocation_maintenance
+from app.core.warmup import warm_up
+from app.services import sentiment
+from app.services.like_buffer import like_buffer
+from app.services.audit import audit_sink
 from datetime import datetime
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="User & Movie API")
 
-# Include versioned API routers
-app.include_router(auth.router, tags=["Auth"])
-app.include_router(reviews.router , tags=["User reviews and ratings"])
-app.add_middleware(JWTAuthMiddleware)
+def create_app(app_settings: Settings = settings) -> FastAPI:
+    """
+    Builds the application without touching the database: engines are created
+    on first use and tables by `python -m app.cli create-schema` / `upgrade-schema`.
+    app_settings picks the database, routers and middleware; the per-process
+    services (caches, audit sink, metrics) keep reading the environment settings.
+    """
+    session.configure(app_settings)
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        started = time.perf_counter()
+        # revoked tokens must be known before the first authenticated request
+        await run_in_threadpool(load_denylist)
+        start_revocation_maintenance()
+        if app_settings.sentiment_rescore_on_startup:
+            sentiment.start_background_rescore()
+        await warm_up(app_settings)
+        logger.info({"message": "Application started", "startup_seconds": round(time.perf_counter() - started, 3)})
+        yield
+        stop_revocation_maintenance()
+        sentiment.stop_background_rescore()
+        like_buffer.stop()
+        audit_sink.stop()
+
+    app = FastAPI(title="User & Movie API", lifespan=lifespan)
+
+    # Async hot routes go first so they take precedence over the sync ones on the same paths
+    if app_settings.async_db:
+        from app.api.v1 import auth_async, reviews_async
+        app.include_router(auth_async.router, tags=["Auth"])
+        app.include_router(reviews_async.router, tags=["User reviews and ratings"])
+
+    # Include versioned API routers
+    app.include_router(auth.router, tags=["Auth"])
+    app.include_router(reviews.router , tags=["User reviews and ratings"])
+    app.include_router(movies.router, tags=["Movies"])
+    app.include_router(watchlist.router, tags=["Watchlist"])
+    app.include_router(availability.router, tags=["Availability"])
+    app.include_router(admin.router, tags=["Admin"])
+    app.include_router(metrics.router, tags=["Admin"])
+    if app_settings.profiling_enabled:
+        install_profiling_hooks()
+        # inside the auth middleware, which tells admins (allowed to send the profile header) apart
+        app.add_middleware(ProfilingMiddleware)
+    if app_settings.rate_limit_enabled:
+        # inside the auth middleware for per-user limits, outside profiling so rejections are never profiled
+        app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(JWTAuthMiddleware)
+    if app_settings.metrics_enabled:
+        install_sql_hooks()
+        # outside the auth middleware, so rejected requests and auth time are measured too
+        app.add_middleware(MetricsMiddleware)
+    # Added last so it is outermost and even auth rejections carry a request id
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+# uvicorn app.main:app (or uvicorn --factory app.main:create_app)
+app = create_app()
@@ -1,59 +1,125 @@
-from fastapi import Request, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from sqlalchemy import select
 from app.core.security import JWTManager
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, get_async_sessionmaker
+from app.core.settings import settings
 from app.models.user import User
- 
- 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Public (unauthenticated) routes
-        public_routes = [
-            "/auth/login",
-            "/auth/register",
-             "/openapi.json",
-            "/docs",
-            "/redoc"
-        ]
-        if any(request.url.path.startswith(route) for route in public_routes):
-            return await call_next(request)
- 
+from app.core.principal import UserPrincipal, principal_cache
+from app.core.revocation import token_denylist
+from app.utils.decorators import PUBLIC_ROUTES
+
+# Public (unauthenticated) routes, matched by prefix as before ("/docs/oauth2-redirect",
+# "/auth/login/"); built once, so the check is a single str.startswith call
+PUBLIC_PREFIXES = tuple(PUBLIC_ROUTES)
+
+
+def _load_principal(db, user_id):
+    db_user = db.query(User).filter(User.id == user_id).first()
+    return UserPrincipal.from_user(db_user) if db_user else None
+
+
+async def _load_principal_async(db, user_id):
+    db_user = await db.scalar(select(User).where(User.id == user_id))
+    return UserPrincipal.from_user(db_user) if db_user else None
+
+
+class JWTAuthMiddleware:
+    """
+    Plain ASGI middleware: verifies the Bearer token and attaches the user to
+    scope["state"] (read back as request.state.user in the routes)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(PUBLIC_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
         # Authorization header
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=401,
                 content={"detail": "Missing or invalid Authorization header"},
             )
- 
-        token = auth_header.split(" ")[1]
- 
+            await response(scope, receive, send)
+            return
+
+        token = auth_header[7:]
+
         # Verify JWT
         payload = JWTManager.verify_jwt(token)
         if not payload:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=401,
                 content={"detail": "Invalid or expired token"},
             )
- 
-        # Fetch user from DB
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.id == payload.get("user_id")).first()
-            request.state.user = user
-        finally:
-            db.close()
- 
+            await response(scope, receive, send)
+            return
+
+        # Revocations not loaded yet (database unreachable at startup): fail closed
+        if not token_denylist.loaded and payload.get("jti") is not None:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Token revocations are not loaded yet, please retry"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        # Revoked by logout (in-memory denylist keyed by the token's jti)
+        if token_denylist.is_revoked(payload.get("jti")):
+            response = JSONResponse(
+                status_code=401,
+                content={"detail": "Token has been revoked"},
+            )
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["token_claims"] = payload
+
+        # Fetch user from the principal cache, falling back to the DB. On a miss
+        # the session is handed on to the route (see get_db) and closed here.
+        user_id = payload.get("user_id")
+        user = principal_cache.get(user_id)
+        if user is None:
+            if settings.async_db:
+                async with get_async_sessionmaker()() as db:
+                    user = await _load_principal_async(db, user_id)
+                    if user is not None:
+                        principal_cache.set(user_id, user)
+                    await self._authorize(scope, receive, send, user, "async_db", db)
+            else:
+                db = SessionLocal()
+                try:
+                    user = await run_in_threadpool(_load_principal, db, user_id)
+                    if user is not None:
+                        principal_cache.set(user_id, user)
+                    await self._authorize(scope, receive, send, user, "db", db)
+                finally:
+                    await run_in_threadpool(db.close)
+            return
+        await self._authorize(scope, receive, send, user)
+
+    async def _authorize(self, scope, receive, send, user, db_key=None, db=None):
         if not user:
-            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "User not found"})
-        
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "User not found"})
+            await response(scope, receive, send)
+            return
+
         # we should even make sure that the user is sctive currently
         if user.status == "suspended":
-            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail":"User is not accessesd"})
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail":"User is not accessesd"})
+            await response(scope, receive, send)
+            return
+
         # Attach user to request (accessible in routes)
- 
-        response = await call_next(request)
-        return response
- 
- 
\ No newline at end of file
+        state = scope.setdefault("state", {})
+        state["user"] = user
+        if db is not None:
+            state[db_key] = db
+        await self.app(scope, receive, send)
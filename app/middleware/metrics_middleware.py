@@ -0,0 +1,53 @@
+import time
+from starlette.routing import Match
+from app.core.metrics import metrics, RequestStats, request_stats_var
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and per-request SQL stats under the route template
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        # rejected before routing (e.g. by JWTAuthMiddleware): match the template here
+        if self._routes is None:
+            app = scope.get("app")
+            self._routes = list(getattr(getattr(app, "router", None), "routes", ()))
+        for candidate in self._routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return candidate.path
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats_var.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.request_started()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            request_stats_var.reset(token)
+            metrics.request_finished(self._route_template(scope), scope["method"], status_code, seconds, stats)
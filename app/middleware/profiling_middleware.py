@@ -0,0 +1,75 @@
+import random
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from app.core.logger import request_id_var
+from app.core.profiling import request_profiler, profile_capture_var
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests picked by request_profiler (admin header or per-route
+    sampling) and writes the capture once the response is sent. Sits inside
+    JWTAuthMiddleware, which is what tells admins apart.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._sampled_routes = None
+
+    def _sampled(self, scope) -> bool:
+        if self._sampled_routes is None:
+            routes = getattr(getattr(scope.get("app"), "router", None), "routes", ())
+            self._sampled_routes = [(route, request_profiler.sample_rates[route.path]) for route in routes
+                if getattr(route, "path", None) in request_profiler.sample_rates]
+        for route, rate in self._sampled_routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return random.random() < rate
+        return False
+
+    def _trigger(self, scope):
+        mode = request_profiler.header_mode(scope)
+        if mode is not None:
+            user = scope.get("state", {}).get("user")
+            if user is not None and user.role == "admin":
+                return mode, "header"
+        if request_profiler.sample_rates and self._sampled(scope):
+            return request_profiler.default_mode, "sampled"
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode, trigger = self._trigger(scope)
+        capture = request_profiler.begin(mode, trigger, request_id_var.get()) if mode is not None else None
+        if capture is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = capture.name
+            await send(message)
+
+        token = profile_capture_var.set(capture)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            capture.stop()
+            profile_capture_var.reset(token)
+            route = scope.get("route")
+            request = {
+                "request_id": request_id_var.get(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status_code,
+            }
+            await run_in_threadpool(request_profiler.finish, capture, request)
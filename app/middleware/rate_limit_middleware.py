@@ -0,0 +1,137 @@
+import json
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.core.metrics import metrics
+from app.core.ratelimit import rate_limiter
+from app.core.settings import settings
+
+
+class RateLimitMiddleware:
+    """
+    Applies the RATE_LIMITS of the matched route and answers 429 with
+    Retry-After when a bucket is empty. Sits inside JWTAuthMiddleware so
+    "user" limits see request.state.user; requests to routes without limits
+    only pay a dict lookup on their method. Routes with "email" limits have
+    their body read here, up to RATE_LIMIT_MAX_BODY_BYTES (413 beyond), and
+    replayed to the app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # method -> [(route, "METHOD /template", limits)]
+        self._by_method = None
+
+    def _resolve(self, scope):
+        by_method = {}
+        routes = getattr(getattr(scope.get("app"), "router", None), "routes", ())
+        for (method, path), limits in rate_limiter.rules.items():
+            for route in routes:
+                if getattr(route, "path", None) == path and method in (getattr(route, "methods", None) or ()):
+                    by_method.setdefault(method, []).append((route, f"{method} {path}", limits))
+        return by_method
+
+    def _client_ip(self, scope) -> str:
+        if settings.rate_limit_trust_forwarded:
+            forwarded = Headers(scope=scope).get("x-forwarded-for")
+            hops = max(1, settings.rate_limit_trusted_proxies)
+            entries = [entry.strip() for entry in forwarded.split(",")] if forwarded else []
+            # the client controls everything left of what our proxies appended
+            if len(entries) >= hops and entries[-hops]:
+                return entries[-hops]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _read_body(self, scope, receive, max_bytes: int):
+        """
+        The whole request body, and a receive that hands it to the app again.
+        The body is None when it is larger than max_bytes.
+        """
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            return None, receive
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # disconnected: let the app see it
+                replay = [message]
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > max_bytes:
+                return None, receive
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                replay = []
+                break
+        body = b"".join(chunks)
+        pending = [{"type": "http.request", "body": body, "more_body": False}, *replay]
+
+        async def replay_receive():
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        return body, replay_receive
+
+    @staticmethod
+    def _email(body: bytes) -> Optional[str]:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        email = data.get("email") if isinstance(data, dict) else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._by_method is None:
+            self._by_method = self._resolve(scope)
+        candidates = self._by_method.get(scope["method"])
+        if not candidates:
+            await self.app(scope, receive, send)
+            return
+
+        # the method already matched, only the path is left to compare
+        path = scope["path"]
+        root_path = scope.get("root_path")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        for route, name, limits in candidates:
+            if route.path_regex.match(path):
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        user = scope.get("state", {}).get("user")
+        email = None
+        if any(limit.scope == "email" for limit in limits):
+            body, receive = await self._read_body(scope, receive, settings.rate_limit_max_body_bytes)
+            if body is None:
+                response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+                await response(scope, receive, send)
+                return
+            email = self._email(body)
+        args = (name, limits, self._client_ip(scope), user.id if user is not None else None, email)
+        if rate_limiter.backend.blocking:
+            rejected = await run_in_threadpool(rate_limiter.check, *args)
+        else:
+            rejected = rate_limiter.check(*args)
+        if rejected is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after, limit_scope = rejected
+        metrics.request_rate_limited(route.path, limit_scope)
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, please retry later"},
+            headers={"Retry-After": str(retry_after)},
+        )
+        await response(scope, receive, send)
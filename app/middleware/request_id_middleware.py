@@ -0,0 +1,31 @@
+import uuid
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.logger import request_id_var
+
+
+class RequestIdMiddleware:
+    """
+    Takes the caller's X-Request-ID (or generates one), exposes it to the
+    logger through request_id_var and echoes it on the response
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
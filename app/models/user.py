@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, Enum, TIMESTAMP, ForeignKey, Date, BigInteger, text, CheckConstraint,UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, Enum, TIMESTAMP, ForeignKey, Date, BigInteger, text, CheckConstraint,UniqueConstraint, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 from app.core.security import pwd_context
-from app.db.session import engine 
+
+# MySQL TIMESTAMP keeps whole seconds, and SQLite's CURRENT_TIMESTAMP writes
+# "YYYY-MM-DD HH:MM:SS" text. Values bound from Python (inserts, cursor seeks)
+# use that same text on SQLite instead of SQLAlchemy's default with
+# microseconds, so they compare correctly against the stored strings.
+Timestamp = TIMESTAMP().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
 # ----------------- User -----------------
 class User(Base):
     __tablename__ = "User"
@@ -13,8 +19,8 @@ class User(Base):
     role = Column(Enum('admin', 'user'), server_default='user')
     password = Column(String(255), nullable=False)
     status = Column(Enum('active', 'suspended'), server_default='active')
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
-    updated_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
 
     # logins = relationship("UserLogins", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     # movies_created = relationship("Movies", back_populates="creator", cascade="all, delete-orphan", passive_deletes=True)
@@ -35,12 +41,37 @@ class UserLogins(Base):
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     token = Column(String(255), unique=True, nullable=False)
     status = Column(Enum('active', 'suspended'), server_default='active')
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
-    expiration_date = Column(TIMESTAMP)
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+    expiration_date = Column(Timestamp)
+
+    # Periodic purge of expired logins (app.core.revocation)
+    __table_args__ = (Index("ix_user_logins_expiration", "expiration_date"),)
 
     # user = relationship("User", back_populates="logins")
 
 
+# ----------------- Revoked tokens -----------------
+class RevokedTokens(Base):
+    __tablename__ = "Revoked_Tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String(64), unique=True, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    # UTC, same as the token's exp; rows are purged once it has passed
+    expires_at = Column(Timestamp, nullable=False, index=True)
+    # the workers pull new rows by revoked_at
+    revoked_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), index=True)
+
+
+class MaintenanceRuns(Base):
+    # Last run of a periodic job shared by all workers: a worker runs the job
+    # only when its conditional UPDATE of last_run_at matched
+    __tablename__ = "Maintenance_Runs"
+
+    name = Column(String(64), primary_key=True)
+    last_run_at = Column(Timestamp, nullable=True)
+
+
 # ----------------- Movies -----------------
 class Movies(Base):
     __tablename__ = "Movies"
@@ -55,10 +86,22 @@ class Movies(Base):
     release_year = Column(Integer)
     poster_url = Column(Text)
     rating = Column(Float, default=0.0)
+    # Running aggregates over Reviews.rating, kept in step with every review write
+    rating_sum = Column(Float, nullable=False, default=0.0, server_default=text('0'))
+    rating_count = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    rating_sq_sum = Column(Float, nullable=False, default=0.0, server_default=text('0'))
     approved = Column(Boolean, default=False)
     created_by = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
-    updated_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+
+    __table_args__ = (
+        # Full-text search (MySQL only); MATCH() column lists must match one of these exactly
+        Index("ft_movies_title", "title", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        Index("ft_movies_people", "director", "cast", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        Index("ft_movies_description", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        Index("ft_movies_all", "title", "director", "cast", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     # creator = relationship("User", back_populates="movies_created",cascade="all, delete-orphan", passive_deletes=True)
     # reviews = relationship("Reviews", back_populates="movie", cascade="all, delete-orphan", passive_deletes=True)
@@ -76,9 +119,9 @@ class Reviews(Base):
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     rating = Column(Float)
     comment = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
-    updated_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
-    like_count= Column(Integer)
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+    like_count= Column(Integer, default=0, server_default=text('0'))
     sentiment_score= Column(Float)
 
     # movie = relationship("Movies", back_populates="reviews",cascade="all, delete-orphan", passive_deletes=True)
@@ -87,6 +130,12 @@ class Reviews(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "movie_id", name="unique_user_movie_review"),
         CheckConstraint("rating >= 0 AND rating <= 10", name="rating_range_check"),
+        # Keyset pagination of a movie's reviews seeks on (sort column, id)
+        Index("ix_reviews_movie_created", "movie_id", "created_at", "id"),
+        Index("ix_reviews_movie_rating", "movie_id", "rating", "id"),
+        Index("ix_reviews_movie_likes", "movie_id", "like_count", "id"),
+        # Incremental recommender runs select the users whose ratings changed
+        Index("ix_reviews_updated", "updated_at"),
     )
 
 
@@ -96,10 +145,34 @@ class Review_Liked(Base):
     id = Column(Integer, primary_key=True)
     review_id = Column(Integer, nullable=False)
     user_id = Column(Integer, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
     __table_args__ = (UniqueConstraint("review_id", "user_id", name="unique_review_user_like"),)
 
 
+#-----------------------Sentiment rescoring progress ---------------
+class SentimentRescoreState(Base):
+    __tablename__ = "Sentiment_Rescore_State"
+    id = Column(Integer, primary_key=True)
+    lexicon_version = Column(Integer, nullable=False)
+    last_review_id = Column(Integer, nullable=False, server_default=text('0'))
+    completed = Column(Boolean, nullable=False, default=False)
+    # Process running the rescore: claimed with a conditional UPDATE and renewed
+    # with every chunk, so only one worker rescores at a time
+    owner = Column(String(64), nullable=True)
+    lease_until = Column(Timestamp, nullable=True)
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+
+
+#-----------------------Recommender progress ---------------
+class RecommenderState(Base):
+    __tablename__ = "Recommender_State"
+    id = Column(Integer, primary_key=True)
+    # Reviews.updated_at high-water mark of the last run
+    last_rating_change = Column(Timestamp, nullable=True)
+    last_full_run = Column(Timestamp, nullable=True)
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+
+
 #----------------------History------------------
 class ReviewHistory(Base):
     __tablename__ = "ReviewHistory"
@@ -108,7 +181,13 @@ class ReviewHistory(Base):
     user_id = Column(Integer, nullable=False)
     old_rating = Column(Float)
     old_comment = Column(Text)
-    changed_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    changed_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+
+    __table_args__ = (
+        # Deleted reviews leave a row here; the incremental recommender run
+        # scans for the ones since its last run
+        Index("ix_reviewhistory_changed_at", "changed_at"),
+    )
 
 
 # ----------------- Watchlist -----------------
@@ -118,7 +197,15 @@ class Watchlist(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     movie_id = Column(Integer, ForeignKey("Movies.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+
+    __table_args__ = (
+        # One entry per movie; also the index for membership checks. An index
+        # rather than a table constraint, so upgrade-schema adds it to old tables
+        Index("unique_user_movie_watchlist", "user_id", "movie_id", unique=True),
+        # Listing a user's watchlist newest first seeks on (user_id, id)
+        Index("ix_watchlist_user_id", "user_id", "id"),
+    )
 
     # user = relationship("User", back_populates="watchlist")
     # movie = relationship("Movies", back_populates="watchlist")
@@ -132,7 +219,7 @@ class Platforms(Base):
     name = Column(String(100), nullable=False)
     type = Column(String(50))
     website = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
 
     # availability = relationship("MovieAvailability", back_populates="platform", cascade="all, delete-orphan", passive_deletes=True)
 
@@ -144,7 +231,7 @@ class Regions(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     code = Column(String(50), unique=True)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
 
     # availability = relationship("MovieAvailability", back_populates="region", cascade="all, delete-orphan", passive_deletes=True)
 
@@ -161,8 +248,13 @@ class MovieAvailability(Base):
     start_date = Column(Date)
     end_date = Column(Date)
     url = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
-    updated_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'), onupdate=text('CURRENT_TIMESTAMP'))
+
+    __table_args__ = (
+        # The availability index pulls changed rows by updated_at
+        Index("ix_movie_availability_updated", "updated_at"),
+    )
 
     # movie = relationship("Movies", back_populates="availability")
     # platform = relationship("Platforms", back_populates="availability")
@@ -177,7 +269,7 @@ class UserActivityLogs(Base):
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     action_type = Column(String(100))
     description = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
 
     # user = relationship("User", back_populates="activities")
 
@@ -190,9 +282,7 @@ class Recommendation(Base):
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
     recommended_movie_id = Column(Integer, ForeignKey("Movies.id", ondelete="CASCADE"), nullable=False)
     reason = Column(Text)
-    created_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP'))
+    created_at = Column(Timestamp, server_default=text('CURRENT_TIMESTAMP'))
 
     # user = relationship("User", back_populates="recommendations")
     # recommended_movie = relationship("Movies", back_populates="recommendations")
-
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
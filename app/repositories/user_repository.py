@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
 
@@ -30,3 +32,34 @@ class UserRepository:
 
     def list(self):
         return self.db.query(User).all()
+
+
+class AsyncUserRepository:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_by_email(self, email: str):
+        return await self.db.scalar(select(User).where(User.email == email))
+
+    async def get_by_id(self, user_id: int):
+        return await self.db.scalar(select(User).where(User.id == user_id))
+
+    async def create(self, user: User):
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def update(self, user: User):
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def delete(self, user: User):
+        await self.db.delete(user)
+        await self.db.commit()
+        return user
+
+    async def list(self):
+        return (await self.db.scalars(select(User))).all()
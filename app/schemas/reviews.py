@@ -26,7 +26,9 @@ class ReviewOut(BaseModel):
         orm_mode = True
 
 class PaginatedReviews(BaseModel):
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
     reviews: List[ReviewOut]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, conlist
+from typing import Optional, List
+from datetime import datetime
+
+# Upper bound for the bulk endpoints, keeps the IN (...) lists reasonable
+MAX_BULK_MOVIES = 1000
+
+class WatchlistMovies(BaseModel):
+    movie_ids: conlist(int, min_length=1, max_length=MAX_BULK_MOVIES)
+
+class WatchlistItem(BaseModel):
+    movie_id: int
+    title: str
+    genre: Optional[str]
+    language: Optional[str]
+    release_year: Optional[int]
+    poster_url: Optional[str]
+    rating: Optional[float]
+    added_at: Optional[datetime]
+
+class WatchlistPage(BaseModel):
+    size: int
+    items: List[WatchlistItem]
+    next_cursor: Optional[str] = None
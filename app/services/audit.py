@@ -0,0 +1,137 @@
+"""
+Audit trail sink for User_Activity_Logs. Routes only enqueue an event; a
+background thread bulk-inserts them every AUDIT_BATCH_SIZE events or
+AUDIT_FLUSH_INTERVAL seconds, so the request path adds no INSERT or commit.
+When the queue is full events are dropped (AUDIT_FULL_POLICY=drop_new) or the
+caller waits briefly for room (block).
+"""
+import atexit
+import queue
+import threading
+import time
+from typing import Optional
+from sqlalchemy import insert
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import UserActivityLogs
+
+_STOP = object()
+
+
+class AuditSink:
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, policy: str = "drop_new",
+        block_timeout: float = 0.1):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def record(self, user_id: int, action_type: str, description: Optional[str] = None):
+        event = {"user_id": user_id, "action_type": action_type, "description": description}
+        self._ensure_worker()
+        try:
+            if self.policy == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _write(self, batch):
+        from app.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.connection().execute(insert(UserActivityLogs), batch)
+            db.commit()
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.failed += len(batch)
+            logger.exception("Writing %s audit events failed", len(batch))
+        finally:
+            db.close()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                break
+            if event is not None:
+                batch.append(event)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+        # drain whatever is still queued, then exit
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                batch.append(event)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Flushes everything queued and stops the worker
+        """
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        worker.join(timeout)
+        self._worker = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "policy": self.policy,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+audit_sink = AuditSink(
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval,
+    max_queue=settings.audit_queue_size,
+    policy=settings.audit_full_policy,
+)
+atexit.register(audit_sink.stop)
+
+
+def record(user_id: int, action_type: str, description: Optional[str] = None):
+    audit_sink.record(user_id, action_type, description)
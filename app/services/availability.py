@@ -0,0 +1,507 @@
+"""
+"Where to watch" lookups over Movie_Availability, answered from memory instead
+of joining Movie_Availability, Platforms and Regions on every request.
+
+Rows are held per region in NumPy columns:
+- sorted by (movie_id, id), so a page of movie ids is one searchsorted call;
+- per platform, ordered by (start_date, id) with the latest end_date of every
+  BLOCK rows, so an overlap query bisects on the start date and skips whole
+  blocks whose windows all ended before the range.
+Dates are day ordinals; an open start or end is date.min / date.max.
+
+Changes go to a small delta (new or changed rows, plus tombstones for the base
+rows they replace) that is folded back into the columns once it outgrows a
+fraction of the base. ORM writes in this process are applied after commit,
+rows written elsewhere are pulled by updated_at every AVAILABILITY_SYNC_SECONDS
+and the whole index is rebuilt every AVAILABILITY_REFRESH_SECONDS. Results are
+re-read by primary key for their url, which also drops rows deleted since.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import MovieAvailability, Platforms, Regions
+from app.utils.pagination import encode_cursor, decode_cursor
+
+BLOCK = 64
+MAX_BATCH_MOVIES = 200
+_OPEN_START = date.min.toordinal()
+_OPEN_END = date.max.toordinal()
+# Platform windows are keyed by start << _KEY_SHIFT | id, which is also the cursor
+_KEY_SHIFT = 40
+# Fold the delta back in once it holds this many rows or 1/8 of the base
+_COMPACT_MIN = 4096
+# Re-read rows this far behind the newest updated_at seen, for transactions
+# that committed after a later one
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+_SELECT = (
+    MovieAvailability.id, MovieAvailability.movie_id, MovieAvailability.platform_id, MovieAvailability.region_id,
+    MovieAvailability.start_date, MovieAvailability.end_date, MovieAvailability.availability_type,
+)
+_DTYPES = {"ids": np.int64, "movies": np.int64, "platforms": np.int64, "regions": np.int64,
+    "starts": np.int32, "ends": np.int32, "types": np.int32}
+
+
+def _row(source) -> tuple:
+    """
+    (id, movie_id, platform_id, region_id, start, end, availability_type)
+    from an ORM object or a result row
+    """
+    return (
+        source.id, source.movie_id, source.platform_id, source.region_id,
+        source.start_date.toordinal() if source.start_date else _OPEN_START,
+        source.end_date.toordinal() if source.end_date else _OPEN_END,
+        source.availability_type,
+    )
+
+
+def _key(start: int, row_id: int) -> int:
+    return (start << _KEY_SHIFT) | row_id
+
+
+def _columns(rows: List[tuple], type_codes: dict, type_names: List[str]) -> dict:
+    if not rows:
+        return {name: np.empty(0, dtype) for name, dtype in _DTYPES.items()}
+    ids, movies, platforms, regions, starts, ends, names = zip(*rows)
+    # type codes only ever grow, so slices built earlier keep resolving theirs
+    types = [type_codes.setdefault(name, len(type_codes)) for name in names]
+    type_names.extend(list(type_codes)[len(type_names):])
+    values = {"ids": ids, "movies": movies, "platforms": platforms, "regions": regions,
+        "starts": starts, "ends": ends, "types": types}
+    return {name: np.asarray(values[name], dtype) for name, dtype in _DTYPES.items()}
+
+
+def _concat(parts: List[dict]) -> dict:
+    return {name: np.concatenate([part[name] for part in parts]) for name in _DTYPES}
+
+
+class _RegionSlice:
+    """
+    One region's rows sorted by (movie_id, id), plus a start-ordered view per platform
+    """
+
+    def __init__(self, region_id: int, columns: dict, type_names: List[str]):
+        self.region_id = region_id
+        self.type_names = type_names
+        order = np.lexsort((columns["ids"], columns["movies"]))
+        self.ids = columns["ids"][order]
+        self.movies = columns["movies"][order]
+        self.platforms = columns["platforms"][order]
+        self.starts = columns["starts"][order]
+        self.ends = columns["ends"][order]
+        self.types = columns["types"][order]
+
+        self.by_platform = {}
+        by_start = np.lexsort((self.ids, self.starts, self.platforms))
+        cuts = np.flatnonzero(np.diff(self.platforms[by_start])) + 1
+        for positions in np.split(by_start, cuts):
+            if not len(positions):
+                continue
+            keys = (self.starts[positions].astype(np.int64) << _KEY_SHIFT) | self.ids[positions]
+            ends = self.ends[positions]
+            block_max = np.maximum.reduceat(ends, np.arange(0, len(ends), BLOCK))
+            self.by_platform[int(self.platforms[positions[0]])] = (keys, ends, positions, block_max)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def columns(self, keep) -> dict:
+        return {
+            "ids": self.ids[keep], "movies": self.movies[keep], "platforms": self.platforms[keep],
+            "regions": np.full(int(np.count_nonzero(keep)), self.region_id, np.int64),
+            "starts": self.starts[keep], "ends": self.ends[keep], "types": self.types[keep],
+        }
+
+    def row(self, pos: int) -> tuple:
+        return (
+            int(self.ids[pos]), int(self.movies[pos]), int(self.platforms[pos]), self.region_id,
+            int(self.starts[pos]), int(self.ends[pos]), self.type_names[self.types[pos]],
+        )
+
+    def on_day(self, lo: int, hi: int, day: int):
+        return np.flatnonzero((self.starts[lo:hi] <= day) & (self.ends[lo:hi] >= day)) + lo
+
+    def overlapping(self, platform_id: int, first: int, last: int, after_key: Optional[int]):
+        """
+        Yields (key, position) of the platform's windows overlapping [first, last],
+        in key order and after after_key
+        """
+        entry = self.by_platform.get(platform_id)
+        if entry is None:
+            return
+        keys, ends, positions, block_max = entry
+        lo = int(np.searchsorted(keys, after_key, "right")) if after_key is not None else 0
+        hi = int(np.searchsorted(keys, _key(last + 1, 0), "left"))
+        if lo >= hi:
+            return
+        first_block = lo // BLOCK
+        blocks = np.flatnonzero(block_max[first_block:(hi - 1) // BLOCK + 1] >= first) + first_block
+        for block in blocks:
+            start, stop = max(lo, block * BLOCK), min(hi, (block + 1) * BLOCK)
+            for i in np.flatnonzero(ends[start:stop] >= first) + start:
+                yield int(keys[i]), int(positions[i])
+
+
+def _build(columns: dict, type_names: List[str]):
+    slices = {}
+    order = np.argsort(columns["regions"], kind="stable")
+    cuts = np.flatnonzero(np.diff(columns["regions"][order])) + 1
+    for positions in np.split(order, cuts):
+        if len(positions):
+            region_id = int(columns["regions"][positions[0]])
+            slices[region_id] = _RegionSlice(region_id, {name: col[positions] for name, col in columns.items()}, type_names)
+    if not slices:
+        return slices, (np.empty(0, np.int64),) * 3
+    ids = np.concatenate([s.ids for s in slices.values()])
+    regions = np.concatenate([np.full(len(s), s.region_id, np.int64) for s in slices.values()])
+    positions = np.concatenate([np.arange(len(s), dtype=np.int64) for s in slices.values()])
+    order = np.argsort(ids)
+    return slices, (ids[order], regions[order], positions[order])
+
+
+class AvailabilityIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset({}, (np.empty(0, np.int64),) * 3, [])
+        self.regions = {}
+        self.platforms = {}
+        self.watermark = None
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.synced_at = 0.0
+
+    def _reset(self, slices: dict, lookup: tuple, type_names: List[str]):
+        self._slices = slices
+        # ids sorted, with the region and position of each, to find a base row by id
+        self._lookup = lookup
+        self._type_names = type_names
+        self._type_codes = {name: code for code, name in enumerate(type_names)}
+        self._delta = {}
+        self._tombstones = set()
+        self._delta_movies = defaultdict(set)
+        self._delta_platforms = defaultdict(set)
+        self.base_rows = len(lookup[0])
+
+    def __len__(self):
+        return self.base_rows - len(self._tombstones) + len(self._delta)
+
+    # ----------------- Changes -----------------
+    def _base_row(self, row_id: int):
+        ids, regions, positions = self._lookup
+        i = int(np.searchsorted(ids, row_id))
+        if i < len(ids) and ids[i] == row_id:
+            return self._slices[int(regions[i])].row(int(positions[i]))
+        return None
+
+    def _current(self, row_id: int):
+        if row_id in self._delta:
+            return self._delta[row_id]
+        return None if row_id in self._tombstones else self._base_row(row_id)
+
+    def _discard(self, row_id: int):
+        old = self._delta.pop(row_id, None)
+        if old is not None:
+            self._delta_movies[(old[3], old[1])].discard(row_id)
+            self._delta_platforms[(old[3], old[2])].discard(row_id)
+        if self._base_row(row_id) is not None:
+            self._tombstones.add(row_id)
+
+    def upsert(self, row: tuple) -> bool:
+        with self._lock:
+            if self._current(row[0]) == row:
+                return False
+            self._discard(row[0])
+            self._delta[row[0]] = row
+            self._delta_movies[(row[3], row[1])].add(row[0])
+            self._delta_platforms[(row[3], row[2])].add(row[0])
+            return True
+
+    def remove(self, row_id: int):
+        with self._lock:
+            self._discard(row_id)
+
+    def compact_if_needed(self):
+        with self._lock:
+            if len(self._delta) + len(self._tombstones) > max(_COMPACT_MIN, self.base_rows // 8):
+                self._compact()
+
+    def _compact(self):
+        dead = np.fromiter(self._tombstones, np.int64, len(self._tombstones))
+        parts = [s.columns(~np.isin(s.ids, dead)) for s in self._slices.values()]
+        parts.append(_columns(list(self._delta.values()), self._type_codes, self._type_names))
+        slices, lookup = _build(_concat(parts), self._type_names)
+        self._reset(slices, lookup, self._type_names)
+
+    # ----------------- Reads -----------------
+    def movies_on(self, region_id: int, movie_ids: List[int], day: int):
+        """
+        movie_id -> rows available in the region on that day
+        """
+        found = {movie_id: [] for movie_id in movie_ids}
+        with self._lock:
+            region = self._slices.get(region_id)
+            if region is not None:
+                wanted = np.asarray(movie_ids, np.int64)
+                lows = np.searchsorted(region.movies, wanted, "left")
+                highs = np.searchsorted(region.movies, wanted, "right")
+                for movie_id, lo, hi in zip(movie_ids, lows, highs):
+                    if lo == hi:
+                        continue
+                    for pos in region.on_day(lo, hi, day):
+                        row = region.row(pos)
+                        if row[0] not in self._tombstones:
+                            found[movie_id].append(row)
+            for movie_id in movie_ids:
+                for row_id in self._delta_movies.get((region_id, movie_id), ()):
+                    row = self._delta[row_id]
+                    if row[4] <= day <= row[5]:
+                        found[movie_id].append(row)
+        return found
+
+    def platform_window(self, region_id: int, platform_id: int, first: int, last: int,
+        after_key: Optional[int], limit: int):
+        """
+        Up to limit + 1 (key, row) pairs for windows overlapping [first, last], in key order
+        """
+        rows = []
+        with self._lock:
+            region = self._slices.get(region_id)
+            if region is not None:
+                for key, pos in region.overlapping(platform_id, first, last, after_key):
+                    if int(region.ids[pos]) in self._tombstones:
+                        continue
+                    rows.append((key, region.row(pos)))
+                    if len(rows) > limit:
+                        break
+            for row_id in self._delta_platforms.get((region_id, platform_id), ()):
+                row = self._delta[row_id]
+                key = _key(row[4], row[0])
+                if row[4] <= last and row[5] >= first and (after_key is None or key > after_key):
+                    rows.append((key, row))
+        rows.sort(key=lambda item: item[0])
+        return rows[:limit + 1]
+
+    # ----------------- Loading -----------------
+    def _load_names(self, db: Session):
+        self.regions = {code.lower(): region_id for region_id, code in db.execute(select(Regions.id, Regions.code)) if code}
+        self.platforms = dict(db.execute(select(Platforms.id, Platforms.name)).all())
+
+    def rebuild(self, db: Session, chunk_size: int = 50000):
+        started = time.time()
+        # read before the scan, so rows changed during it are pulled again by sync
+        watermark = db.scalar(select(func.max(MovieAvailability.updated_at)))
+        type_codes, type_names = {}, []
+        parts = []
+        # Core rows unpacked by position: most of the build time is per-row overhead
+        result = db.connection().execute(select(*_SELECT).execution_options(yield_per=chunk_size))
+        for chunk in result.partitions():
+            rows = [
+                (row_id, movie_id, platform_id, region_id,
+                    start.toordinal() if start else _OPEN_START, end.toordinal() if end else _OPEN_END, kind)
+                for row_id, movie_id, platform_id, region_id, start, end, kind in chunk
+            ]
+            parts.append(_columns(rows, type_codes, type_names))
+        parts.append(_columns([], type_codes, type_names))
+        slices, lookup = _build(_concat(parts), type_names)
+        with self._lock:
+            self._load_names(db)
+            self._reset(slices, lookup, type_names)
+            self.watermark = watermark
+            self.loaded = True
+            self.loaded_at = self.synced_at = time.time()
+        logger.info("Built availability index: %s rows in %s regions in %.2fs",
+            self.base_rows, len(slices), time.time() - started)
+
+    def sync(self, db: Session) -> int:
+        """
+        Applies rows inserted or updated since the last build or sync
+        """
+        stmt = select(*_SELECT, MovieAvailability.updated_at)
+        if self.watermark is not None:
+            stmt = stmt.where(MovieAvailability.updated_at >= self.watermark - _SYNC_OVERLAP)
+        changed = 0
+        newest = self.watermark
+        for row in db.execute(stmt):
+            changed += self.upsert(_row(row))
+            if row.updated_at is not None and (newest is None or row.updated_at > newest):
+                newest = row.updated_at
+        with self._lock:
+            self._load_names(db)
+            self.watermark = newest
+            self.synced_at = time.time()
+        self.compact_if_needed()
+        return changed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": len(self),
+                "base_rows": self.base_rows,
+                "delta_rows": len(self._delta),
+                "tombstones": len(self._tombstones),
+                "regions": len(self._slices),
+                "loaded_at": self.loaded_at,
+                "synced_at": self.synced_at,
+            }
+
+
+availability_index = AvailabilityIndex()
+_refresh_lock = threading.Lock()
+
+
+def ensure_fresh(db: Session):
+    """
+    Builds the index on first use; afterwards syncs or rebuilds it in the
+    background when AVAILABILITY_SYNC_SECONDS / AVAILABILITY_REFRESH_SECONDS passed
+    """
+    if not availability_index.loaded:
+        with _refresh_lock:
+            if not availability_index.loaded:
+                availability_index.rebuild(db)
+        return availability_index
+    now = time.time()
+    full = now - availability_index.loaded_at > settings.availability_refresh_seconds
+    if (full or now - availability_index.synced_at > settings.availability_sync_seconds) and _refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_background_refresh, args=(full,), name="availability-refresh", daemon=True).start()
+    return availability_index
+
+
+def _background_refresh(full: bool):
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if full:
+            availability_index.rebuild(db)
+        else:
+            availability_index.sync(db)
+    except Exception:
+        logger.exception("Availability index refresh failed")
+    finally:
+        db.close()
+        _refresh_lock.release()
+
+
+# ----------------- Incremental index maintenance -----------------
+# Availability changes are collected per session at flush time and applied to
+# the index only once the transaction commits
+@event.listens_for(Session, "after_flush")
+def _collect_availability_changes(session, flush_context):
+    pending = None
+    for obj in session.new.union(session.dirty):
+        if isinstance(obj, MovieAvailability):
+            pending = session.info.setdefault("availability_pending", {})
+            pending[obj.id] = _row(obj)
+    for obj in session.deleted:
+        if isinstance(obj, MovieAvailability):
+            pending = session.info.setdefault("availability_pending", {})
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_availability_changes(session):
+    pending = session.info.pop("availability_pending", None)
+    if not pending or not availability_index.loaded:
+        return
+    for row_id, row in pending.items():
+        if row is None:
+            availability_index.remove(row_id)
+        else:
+            availability_index.upsert(row)
+    availability_index.compact_if_needed()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_availability_changes(session):
+    session.info.pop("availability_pending", None)
+
+
+# ----------------- Query -----------------
+def _region_id(index: AvailabilityIndex, region: str) -> int:
+    region_id = index.regions.get(region.lower())
+    if region_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Region not found")
+    return region_id
+
+
+def _hydrate(db: Session, index: AvailabilityIndex, rows: List[tuple]):
+    """
+    Adds url by primary key; rows deleted since the index saw them are dropped
+    """
+    if not rows:
+        return []
+    urls = dict(db.execute(
+        select(MovieAvailability.id, MovieAvailability.url).where(MovieAvailability.id.in_([r[0] for r in rows]))
+    ).all())
+    return [
+        {
+            "availability_id": row_id,
+            "movie_id": movie_id,
+            "platform_id": platform_id,
+            "platform": index.platforms.get(platform_id),
+            "availability_type": availability_type,
+            "start_date": date.fromordinal(start) if start != _OPEN_START else None,
+            "end_date": date.fromordinal(end) if end != _OPEN_END else None,
+            "url": urls[row_id],
+        }
+        for row_id, movie_id, platform_id, _, start, end, availability_type in rows
+        if row_id in urls
+    ]
+
+
+def where_to_watch(db: Session, region: str, movie_ids: List[int], on: Optional[date] = None):
+    """
+    Platforms each movie can be watched on in the region on the given day (today by default)
+    """
+    index = ensure_fresh(db)
+    region_id = _region_id(index, region)
+    day = on or date.today()
+    movie_ids = list(dict.fromkeys(movie_ids))
+    found = index.movies_on(region_id, movie_ids, day.toordinal())
+    hydrated = _hydrate(db, index, [row for rows in found.values() for row in rows])
+    movies = {str(movie_id): [] for movie_id in movie_ids}
+    for item in hydrated:
+        movies[str(item["movie_id"])].append(item)
+    return {"region": region, "date": day, "movies": movies}
+
+
+def streaming_on_platform(db: Session, region: str, platform_id: int, on: Optional[date] = None, days: int = 7,
+    size: int = 20, cursor: Optional[str] = None):
+    """
+    Movies whose window on the platform overlaps [on, on + days) in the region,
+    ordered by window start
+    """
+    index = ensure_fresh(db)
+    region_id = _region_id(index, region)
+    if platform_id not in index.platforms:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Platform not found")
+    first = on or date.today()
+    # clamped: a window reaching past date.max ends there
+    last = date.fromordinal(min(first.toordinal() + days - 1, date.max.toordinal()))
+    after_key = None
+    if cursor:
+        after_key = decode_cursor(cursor).get("k")
+        if not isinstance(after_key, int):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    rows = index.platform_window(region_id, platform_id, first.toordinal(), last.toordinal(), after_key, size)
+    next_cursor = encode_cursor({"k": rows[size - 1][0]}) if len(rows) > size else None
+    items = _hydrate(db, index, [row for _, row in rows[:size]])
+    return {
+        "region": region,
+        "platform_id": platform_id,
+        "platform": index.platforms[platform_id],
+        "from": first,
+        "to": last,
+        "size": size,
+        "items": items,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,106 @@
+"""
+Streaming bulk export of users and reviews as NDJSON or CSV, in constant
+memory: rows are read through a server-side cursor (stream_results, so
+pymysql uses an unbuffered SSCursor) in partitions of chunk_size and each
+partition is encoded into one text chunk.
+
+Rows come out in id order and every row carries its id, so an interrupted
+export resumes with after_id set to the last id received. created_from is
+inclusive and created_to exclusive.
+
+The export generator opens and closes its own session: a StreamingResponse
+keeps iterating after the route (and its get_db session) has returned. It
+holds one pooled connection for as long as the export runs.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator, Optional
+from sqlalchemy import select
+from app.core.logger import logger
+from app.models.user import User, Reviews
+
+EXPORT_FORMATS = ("ndjson", "csv")
+USER_ROLES = ("admin", "user")
+USER_STATUSES = ("active", "suspended")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# never the password hash
+USER_COLUMNS = (User.id, User.username, User.email, User.role, User.status, User.created_at, User.updated_at)
+REVIEW_COLUMNS = (Reviews.id, Reviews.movie_id, Reviews.user_id, Reviews.rating, Reviews.comment,
+    Reviews.like_count, Reviews.sentiment_score, Reviews.created_at, Reviews.updated_at)
+
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def user_export_query(role: Optional[str] = None, status: Optional[str] = None,
+        created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+        after_id: Optional[int] = None, limit: Optional[int] = None):
+    query = select(*USER_COLUMNS)
+    if role is not None:
+        query = query.where(User.role == role)
+    if status is not None:
+        query = query.where(User.status == status)
+    if created_from is not None:
+        query = query.where(User.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(User.created_at < created_to)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return query.order_by(User.id).limit(limit)
+
+
+def review_export_query(movie_id: Optional[int] = None, user_id: Optional[int] = None,
+        created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+        after_id: Optional[int] = None, limit: Optional[int] = None):
+    query = select(*REVIEW_COLUMNS)
+    if movie_id is not None:
+        query = query.where(Reviews.movie_id == movie_id)
+    if user_id is not None:
+        query = query.where(Reviews.user_id == user_id)
+    if created_from is not None:
+        query = query.where(Reviews.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Reviews.created_at < created_to)
+    if after_id is not None:
+        query = query.where(Reviews.id > after_id)
+    return query.order_by(Reviews.id).limit(limit)
+
+
+def _encode_ndjson(columns, rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, map(_export_value, row))), ensure_ascii=False, default=str) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_export(session_factory, query, fmt: str, chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Yields the export as text chunks, one per chunk_size rows
+    """
+    columns = [column.key for column in query.selected_columns]
+    if fmt == "csv":
+        yield _encode_csv([columns])
+    db = session_factory()
+    exported, last_id = 0, None
+    try:
+        connection = db.connection(execution_options={"stream_results": True, "yield_per": chunk_size})
+        for rows in connection.execute(query).partitions():
+            exported += len(rows)
+            last_id = rows[-1][0]
+            yield _encode_ndjson(columns, rows) if fmt == "ndjson" else _encode_csv(rows)
+    finally:
+        # also reached when the client disconnects and the generator is closed
+        db.close()
+        logger.info({"message": "Export finished", "format": fmt, "rows": exported, "last_id": last_id})
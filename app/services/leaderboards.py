@@ -0,0 +1,332 @@
+"""
+Precomputed movie leaderboards, kept in memory and updated from the review
+write path instead of sorting Movies on every request.
+
+- top rated: Bayesian average (C * m + rating_sum) / (C + rating_count), so a
+  movie needs review volume, not just one 10/10, to rank. m is the catalog
+  mean rating, refreshed on every rebuild.
+- trending: exponentially decayed review and like activity. Scores are stored
+  relative to a fixed reference time, so decay never reorders anything and
+  only new activity touches the board.
+
+Each board is a sorted list maintained with bisect, so reading the top k is a
+slice. Boards exist overall, per genre, per language and per genre+language.
+
+The boards are per worker and only this worker's writes reach them directly.
+Rating and metadata changes made by other workers are pulled from Movies by
+updated_at every LEADERBOARD_SYNC_SECONDS; their reviews and likes reach
+trending only at the full rebuild every LEADERBOARD_REFRESH_SECONDS. Until the
+first build (started by the warm-up or the first request) the routes answer
+503 instead of holding the request.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import Movies, Reviews, Review_Liked
+
+REVIEW_WEIGHT = 3.0
+LIKE_WEIGHT = 1.0
+# Rebase the trending scores before exp() gets anywhere near float overflow
+_MAX_EXPONENT = 500.0
+# Re-read movies this far behind the newest updated_at seen, for transactions
+# that committed after a later one
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+# The timestamp columns hold naive UTC (CURRENT_TIMESTAMP)
+def _utc_naive(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _epoch(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class _Board:
+    """
+    movie_id -> score plus the same entries as a list sorted best first
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.order = []
+
+    def set(self, movie_id: int, score: float):
+        self.remove(movie_id)
+        self.scores[movie_id] = score
+        insort(self.order, (-score, movie_id))
+
+    def remove(self, movie_id: int):
+        score = self.scores.pop(movie_id, None)
+        if score is not None:
+            i = bisect_left(self.order, (-score, movie_id))
+            del self.order[i]
+
+    def scale(self, factor: float):
+        # order is unchanged by a positive factor
+        self.scores = {movie_id: score * factor for movie_id, score in self.scores.items()}
+        self.order = [(key * factor, movie_id) for key, movie_id in self.order]
+
+    def top(self, k: int):
+        return [(movie_id, -key) for key, movie_id in self.order[:k]]
+
+
+def _board_keys(genre: Optional[str], language: Optional[str]):
+    genre = genre.lower() if genre else None
+    language = language.lower() if language else None
+    keys = [(None, None)]
+    if genre:
+        keys.append((genre, None))
+    if language:
+        keys.append((None, language))
+    if genre and language:
+        keys.append((genre, language))
+    return keys
+
+
+class Leaderboards:
+
+    def __init__(self, prior_weight: float, half_life_hours: float):
+        self.prior_weight = prior_weight
+        self.tau = half_life_hours * 3600 / math.log(2)
+        self._lock = threading.RLock()
+        self._reset(global_mean=0.0, reference=time.time())
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.synced_at = 0.0
+        # newest Movies.updated_at seen by the rebuild or the last sync
+        self.watermark = None
+
+    def _reset(self, global_mean: float, reference: float):
+        self.global_mean = global_mean
+        self.reference = reference
+        self._movies = {}
+        self._top = {}
+        self._trending = {}
+        self._trend_scores = {}
+
+    # ----------------- Scores -----------------
+    def _bayesian(self, rating_sum: float, rating_count: int) -> float:
+        return (self.prior_weight * self.global_mean + rating_sum) / (self.prior_weight + rating_count)
+
+    def _weight_at(self, ts: float) -> float:
+        return math.exp((ts - self.reference) / self.tau)
+
+    def _rebase(self, ts: float):
+        factor = math.exp((self.reference - ts) / self.tau)
+        for board in self._trending.values():
+            board.scale(factor)
+        self._trend_scores = {movie_id: score * factor for movie_id, score in self._trend_scores.items()}
+        self.reference = ts
+
+    # ----------------- Updates -----------------
+    def _set_top(self, movie_id: int):
+        info = self._movies[movie_id]
+        for key in _board_keys(info["genre"], info["language"]):
+            board = self._top.setdefault(key, _Board())
+            if info["count"] > 0:
+                board.set(movie_id, self._bayesian(info["sum"], info["count"]))
+            else:
+                board.remove(movie_id)
+
+    def _load_movie(self, movie_id: int, title, genre, language, rating_sum, rating_count):
+        old = self._movies.get(movie_id)
+        if old is not None and (old["genre"], old["language"]) != (genre, language):
+            # moved to other boards: drop it from the old ones first
+            for key in _board_keys(old["genre"], old["language"]):
+                for boards in (self._top, self._trending):
+                    board = boards.get(key)
+                    if board is not None:
+                        board.remove(movie_id)
+        self._movies[movie_id] = {"title": title, "genre": genre, "language": language,
+            "sum": rating_sum or 0.0, "count": rating_count or 0}
+        self._set_top(movie_id)
+        score = self._trend_scores.get(movie_id)
+        if old is not None and score is not None:
+            for key in _board_keys(genre, language):
+                self._trending.setdefault(key, _Board()).set(movie_id, score)
+
+    def _add_activity(self, movie_id: int, weight: float, ts: float):
+        info = self._movies.get(movie_id)
+        if info is None:
+            return
+        if (ts - self.reference) / self.tau > _MAX_EXPONENT:
+            self._rebase(ts)
+        score = self._trend_scores.get(movie_id, 0.0) + weight * self._weight_at(ts)
+        self._trend_scores[movie_id] = score
+        for key in _board_keys(info["genre"], info["language"]):
+            self._trending.setdefault(key, _Board()).set(movie_id, score)
+
+    def record_review(self, movie_id: int, old_rating: Optional[float], new_rating: Optional[float], movie=None):
+        """
+        Called after a review write commits. old_rating is None for a new review,
+        new_rating is None for a deleted one. movie (the Movies row) is only
+        needed for movies created since the last rebuild.
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            info = self._movies.get(movie_id)
+            if info is None:
+                if movie is None:
+                    return
+                info = self._movies[movie_id] = {"title": movie.title, "genre": movie.genre,
+                    "language": movie.language, "sum": 0.0, "count": 0}
+            info["sum"] += (new_rating or 0.0) - (old_rating or 0.0)
+            info["count"] += (new_rating is not None) - (old_rating is not None)
+            self._set_top(movie_id)
+            if old_rating is None and new_rating is not None:
+                self._add_activity(movie_id, REVIEW_WEIGHT, time.time())
+
+    def record_likes(self, movie_likes: Dict[int, int]):
+        """
+        movie_id -> number of new likes, fed from the like_count flush
+        """
+        if not self.loaded:
+            return
+        now = time.time()
+        with self._lock:
+            for movie_id, likes in movie_likes.items():
+                if likes > 0:
+                    self._add_activity(movie_id, LIKE_WEIGHT * likes, now)
+
+    # ----------------- Reads -----------------
+    def _read(self, kind: str, genre, language, limit, decay_to=None):
+        key = (genre.lower() if genre else None, language.lower() if language else None)
+        with self._lock:
+            board = getattr(self, kind).get(key)
+            entries = board.top(limit) if board else []
+            factor = math.exp((self.reference - decay_to) / self.tau) if decay_to else 1.0
+            return [
+                {
+                    "movie_id": movie_id,
+                    "title": self._movies[movie_id]["title"],
+                    "score": round(score * factor, 4),
+                    "rating_count": self._movies[movie_id]["count"],
+                }
+                for movie_id, score in entries
+            ]
+
+    def top_rated(self, genre: Optional[str] = None, language: Optional[str] = None, limit: int = 10):
+        return self._read("_top", genre, language, limit)
+
+    def trending(self, genre: Optional[str] = None, language: Optional[str] = None, limit: int = 10):
+        return self._read("_trending", genre, language, limit, decay_to=time.time())
+
+    # ----------------- Rebuild -----------------
+    def rebuild(self, db: Session):
+        """
+        Loads both leaderboards from Movies, Reviews and Review_Liked. Activity
+        older than ten half-lives is ignored, it no longer moves the ranking.
+        """
+        now = time.time()
+        since = _utc_naive(now - 10 * self.tau * math.log(2))
+        # read before the scan, so movies changed during it are pulled again by sync
+        watermark = db.scalar(select(func.max(Movies.updated_at)))
+        totals = db.execute(select(func.sum(Movies.rating_sum), func.sum(Movies.rating_count))).one()
+        global_mean = (totals[0] or 0.0) / totals[1] if totals[1] else 0.0
+        review_activity = db.execute(
+            select(Reviews.movie_id, Reviews.created_at).where(Reviews.created_at >= since)
+        ).all()
+        like_activity = db.execute(
+            select(Reviews.movie_id, Review_Liked.created_at)
+            .join(Reviews, Reviews.id == Review_Liked.review_id)
+            .where(Review_Liked.created_at >= since)
+        ).all()
+        movies = db.execute(
+            select(Movies.id, Movies.title, Movies.genre, Movies.language, Movies.rating_sum, Movies.rating_count)
+            .execution_options(yield_per=1000)
+        )
+
+        with self._lock:
+            self._reset(global_mean=global_mean, reference=now)
+            for row in movies:
+                self._load_movie(*row)
+            for weight, activity in ((REVIEW_WEIGHT, review_activity), (LIKE_WEIGHT, like_activity)):
+                for movie_id, created_at in activity:
+                    if created_at is not None:
+                        self._add_activity(movie_id, weight, _epoch(created_at))
+            self.watermark = watermark
+            self.loaded = True
+            self.loaded_at = now
+            self.synced_at = now
+        logger.info("Rebuilt leaderboards for %s movies (global mean %.3f)", len(self._movies), global_mean)
+
+    def sync(self, db: Session) -> int:
+        """
+        Reloads the rating totals and metadata of movies inserted or updated
+        since the last rebuild or sync, including by other workers
+        """
+        stmt = select(Movies.id, Movies.title, Movies.genre, Movies.language, Movies.rating_sum,
+            Movies.rating_count, Movies.updated_at)
+        if self.watermark is not None:
+            stmt = stmt.where(Movies.updated_at >= self.watermark - _SYNC_OVERLAP)
+        rows = db.execute(stmt).all()
+        with self._lock:
+            newest = self.watermark
+            for *row, updated_at in rows:
+                self._load_movie(*row)
+                if updated_at is not None and (newest is None or updated_at > newest):
+                    newest = updated_at
+            self.watermark = newest
+            self.synced_at = time.time()
+        return len(rows)
+
+
+leaderboards = Leaderboards(
+    prior_weight=settings.leaderboard_prior_weight,
+    half_life_hours=settings.trending_half_life_hours,
+)
+_rebuild_lock = threading.Lock()
+
+
+def ensure_fresh(db: Session, wait: bool = True):
+    """
+    Builds the boards on first use; afterwards syncs them in the background
+    every LEADERBOARD_SYNC_SECONDS and rebuilds them every
+    LEADERBOARD_REFRESH_SECONDS to pick up the new catalog mean and the other
+    workers' activity. With wait=False (the routes) the first build also runs
+    in the background and the caller gets 503 until it is done.
+    """
+    if not leaderboards.loaded:
+        if wait:
+            with _rebuild_lock:
+                if not leaderboards.loaded:
+                    leaderboards.rebuild(db)
+            return leaderboards
+        if _rebuild_lock.acquire(blocking=False):
+            threading.Thread(target=_background_rebuild, args=(True,), name="leaderboard-rebuild", daemon=True).start()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboards are loading, please retry",
+            headers={"Retry-After": "1"},
+        )
+    now = time.time()
+    full = now - leaderboards.loaded_at > settings.leaderboard_refresh_seconds
+    if (full or now - leaderboards.synced_at > settings.leaderboard_sync_seconds) and _rebuild_lock.acquire(blocking=False):
+        threading.Thread(target=_background_rebuild, args=(full,), name="leaderboard-rebuild", daemon=True).start()
+    return leaderboards
+
+
+def _background_rebuild(full: bool):
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if full:
+            leaderboards.rebuild(db)
+        else:
+            leaderboards.sync(db)
+    except Exception:
+        logger.exception("Leaderboard rebuild failed")
+    finally:
+        db.close()
+        _rebuild_lock.release()
@@ -0,0 +1,117 @@
+"""
+Write-behind buffer for Reviews.like_count. Like/unlike only record a delta in
+memory; a background thread writes the touched reviews in batches, once per
+review however many likes it got. A flush recounts like_count from
+Review_Liked (an index range on unique_review_user_like) instead of adding
+the deltas, so it is idempotent: a flush of another worker or a concurrent
+reconcile_like_counts() can never count a like twice.
+"""
+import atexit
+import threading
+from collections import defaultdict
+from sqlalchemy import update, select, bindparam, func
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import Reviews, Review_Liked
+from app.services import review_cache
+from app.services.leaderboards import leaderboards
+
+
+_flush_stmt = (
+    update(Reviews)
+    .where(Reviews.id == bindparam("b_review_id"))
+    .values(like_count=select(func.count(Review_Liked.id)).where(Review_Liked.review_id == Reviews.id).scalar_subquery())
+)
+
+
+class LikeCountBuffer:
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._deltas = defaultdict(int)
+        self._events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self.flushed_batches = 0
+        self.flush_errors = 0
+
+    def add(self, review_id: int, delta: int):
+        with self._lock:
+            self._deltas[review_id] += delta
+            self._events += 1
+            full = self._events >= self.max_pending
+        self._ensure_worker()
+        if full:
+            self._wake.set()
+
+    def pending(self, review_id: int) -> int:
+        with self._lock:
+            return self._deltas.get(review_id, 0)
+
+    def flush(self):
+        """
+        Writes out everything buffered so far. Returns the number of reviews
+        updated. On failure the deltas are put back for the next attempt.
+        """
+        from app.db.session import SessionLocal
+
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, defaultdict(int)
+                self._events = 0
+            # a like undone before the flush leaves nothing to recount
+            params = [{"b_review_id": review_id} for review_id, delta in deltas.items() if delta]
+            if not params:
+                return 0
+            db = SessionLocal()
+            try:
+                # like_count is part of the cached listing pages of these movies,
+                # new likes also count as trending activity
+                review_movies = db.execute(
+                    select(Reviews.id, Reviews.movie_id).where(Reviews.id.in_([p["b_review_id"] for p in params]))
+                ).all()
+                db.connection().execute(_flush_stmt, params)
+                db.commit()
+                self.flushed_batches += 1
+            except Exception:
+                db.rollback()
+                self.flush_errors += 1
+                with self._lock:
+                    for review_id, delta in deltas.items():
+                        self._deltas[review_id] += delta
+                logger.exception("Flushing %s like_count deltas failed", len(params))
+                return 0
+            finally:
+                db.close()
+        movie_likes = defaultdict(int)
+        for review_id, movie_id in review_movies:
+            movie_likes[movie_id] += deltas[review_id]
+        review_cache.bump_movies(movie_likes)
+        leaderboards.record_likes(movie_likes)
+        return len(params)
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="like-count-flusher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+
+like_buffer = LikeCountBuffer(flush_interval=settings.like_flush_interval, max_pending=settings.like_flush_max_pending)
+atexit.register(like_buffer.stop)
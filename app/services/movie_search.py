@@ -0,0 +1,351 @@
+"""
+Full-text movie search over title, description, cast and director.
+
+Two backends answer the same query:
+- "fulltext": MySQL FULLTEXT indexes (MATCH ... AGAINST) with per-field boosts
+- "memory": an in-process inverted index with BM25 ranking per field, used
+  for SQLite/local runs. It is built from Movies on first use and kept up to
+  date from committed ORM changes to Movies in this process; movies changed
+  elsewhere are pulled by updated_at every SEARCH_SYNC_SECONDS, and movies
+  deleted elsewhere drop out at the rebuild every SEARCH_REFRESH_SECONDS.
+Both page with an opaque (score, id) cursor, and both match the genre and
+language filters case-insensitively.
+"""
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import Movies
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Field boosts shared by both backends
+FIELD_BOOSTS = {"title": 3.0, "director": 2.0, "cast": 2.0, "description": 1.0}
+_FIELDS = tuple(FIELD_BOOSTS)
+_META = ("title", "genre", "language", "release_year", "director")
+
+_COLUMNS = ("id", "description", "cast", *_META)
+# Re-read movies this far behind the newest updated_at seen, for transactions
+# that committed after a later one
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(("a", "an", "and", "the", "of", "in", "on", "to", "is", "it", "for", "with", "at", "by", "from"))
+
+
+def tokenize(value: Optional[str]):
+    if not value:
+        return []
+    return [t for t in _TOKEN_RE.findall(value.lower()) if t not in _STOPWORDS]
+
+
+def _matches_filters(meta: dict, genre, language, release_year):
+    if genre and (meta["genre"] or "").lower() != genre.lower():
+        return False
+    if language and (meta["language"] or "").lower() != language.lower():
+        return False
+    if release_year and meta["release_year"] != release_year:
+        return False
+    return True
+
+
+class InvertedIndex:
+    """
+    term -> {movie_id: {field: term frequency}}, with per-field document
+    lengths for BM25 length normalisation
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._lengths = {}
+        self._length_totals = dict.fromkeys(_FIELDS, 0)
+        self._meta = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.synced_at = 0.0
+        # newest Movies.updated_at seen by the build or the last sync
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._meta)
+
+    def upsert(self, movie: dict):
+        with self._lock:
+            self.remove(movie["id"])
+            movie_id = movie["id"]
+            lengths = {}
+            terms = set()
+            for field in _FIELDS:
+                tokens = tokenize(movie.get(field))
+                lengths[field] = len(tokens)
+                self._length_totals[field] += len(tokens)
+                for token in tokens:
+                    tfs = self._postings[token].setdefault(movie_id, {})
+                    tfs[field] = tfs.get(field, 0) + 1
+                    terms.add(token)
+            self._doc_terms[movie_id] = terms
+            self._lengths[movie_id] = lengths
+            self._meta[movie_id] = {key: movie.get(key) for key in _META}
+
+    def remove(self, movie_id: int):
+        with self._lock:
+            terms = self._doc_terms.pop(movie_id, None)
+            if terms is None:
+                return
+            for token in terms:
+                postings = self._postings[token]
+                postings.pop(movie_id, None)
+                if not postings:
+                    del self._postings[token]
+            for field, length in self._lengths.pop(movie_id).items():
+                self._length_totals[field] -= length
+            self._meta.pop(movie_id, None)
+
+    def search(self, query: str, genre=None, language=None, release_year=None):
+        """
+        All matching movies as a list of (score, movie_id, meta), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._meta)
+            if not terms or not n_docs:
+                return []
+            avg = {f: (self._length_totals[f] / n_docs) or 1.0 for f in _FIELDS}
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for movie_id, tfs in postings.items():
+                    lengths = self._lengths[movie_id]
+                    for field, tf in tfs.items():
+                        norm = self.k1 * (1 - self.b + self.b * lengths[field] / avg[field])
+                        scores[movie_id] += FIELD_BOOSTS[field] * idf * tf * (self.k1 + 1) / (tf + norm)
+            results = [
+                (score, movie_id, self._meta[movie_id])
+                for movie_id, score in scores.items()
+                if _matches_filters(self._meta[movie_id], genre, language, release_year)
+            ]
+        results.sort(key=lambda r: (-r[0], r[1]))
+        return results
+
+
+movie_index = InvertedIndex()
+# Changes committed in this process while a build runs, replayed onto the new
+# index before it replaces the old one; None when no build is running
+_backlog = None
+_backlog_lock = threading.Lock()
+
+
+def _movie_dict(movie) -> dict:
+    return {key: getattr(movie, key) for key in _COLUMNS}
+
+
+def _apply(index: InvertedIndex, changes):
+    for movie_id, movie in changes:
+        if movie is None:
+            index.remove(movie_id)
+        else:
+            index.upsert(movie)
+
+
+def build_index(db: Session, chunk_size: int = 1000):
+    """
+    (Re)loads the in-process index from the Movies table
+    """
+    global movie_index, _backlog
+    with _backlog_lock:
+        _backlog = []
+    try:
+        # read before the scan, so movies changed during it are pulled again by sync
+        watermark = db.scalar(select(func.max(Movies.updated_at)))
+        fresh = InvertedIndex()
+        for row in db.execute(select(*(getattr(Movies, key) for key in _COLUMNS)).execution_options(yield_per=chunk_size)):
+            fresh.upsert(dict(row._mapping))
+    except Exception:
+        with _backlog_lock:
+            _backlog = None
+        raise
+    with _backlog_lock:
+        _apply(fresh, _backlog)
+        _backlog = None
+        fresh.watermark = watermark
+        fresh.loaded = True
+        fresh.loaded_at = time.time()
+        # commits of other processes during the scan are picked up by the
+        # next sync, in a new transaction that can see them
+        fresh.synced_at = 0.0
+        movie_index = fresh
+    logger.info("Built movie search index: %s movies", len(fresh))
+    return fresh
+
+
+def sync_index(db: Session, index: InvertedIndex, chunk_size: int = 1000) -> int:
+    """
+    Re-indexes the movies inserted or updated since the last build or sync
+    """
+    stmt = select(*(getattr(Movies, key) for key in _COLUMNS), Movies.updated_at)
+    if index.watermark is not None:
+        stmt = stmt.where(Movies.updated_at >= index.watermark - _SYNC_OVERLAP)
+    changed = 0
+    newest = index.watermark
+    for row in db.execute(stmt.execution_options(yield_per=chunk_size)):
+        movie = dict(row._mapping)
+        updated_at = movie.pop("updated_at")
+        index.upsert(movie)
+        changed += 1
+        if updated_at is not None and (newest is None or updated_at > newest):
+            newest = updated_at
+    index.watermark = newest
+    index.synced_at = time.time()
+    return changed
+
+
+_build_lock = threading.Lock()
+
+
+def _ensure_index(db: Session):
+    """
+    Builds the index on first use; afterwards syncs or rebuilds it in the
+    background when SEARCH_SYNC_SECONDS / SEARCH_REFRESH_SECONDS passed
+    """
+    if not movie_index.loaded:
+        with _build_lock:
+            if not movie_index.loaded:
+                build_index(db)
+        return movie_index
+    now = time.time()
+    full = now - movie_index.loaded_at > settings.search_refresh_seconds
+    if (full or now - movie_index.synced_at > settings.search_sync_seconds) and _build_lock.acquire(blocking=False):
+        threading.Thread(target=_background_refresh, args=(full,), name="search-index-refresh", daemon=True).start()
+    return movie_index
+
+
+def _background_refresh(full: bool):
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if full:
+            build_index(db)
+        else:
+            sync_index(db, movie_index)
+    except Exception:
+        logger.exception("Movie search index refresh failed")
+    finally:
+        db.close()
+        _build_lock.release()
+
+
+# ----------------- Incremental index maintenance -----------------
+# Movie changes are collected per session at flush time and applied to the
+# index only once the transaction commits
+@event.listens_for(Session, "after_flush")
+def _collect_movie_changes(session, flush_context):
+    pending = session.info.setdefault("movie_search_pending", {})
+    for obj in session.new.union(session.dirty):
+        if isinstance(obj, Movies):
+            pending[obj.id] = _movie_dict(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Movies):
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_movie_changes(session):
+    pending = session.info.pop("movie_search_pending", None)
+    if not pending:
+        return
+    with _backlog_lock:
+        if _backlog is not None:
+            _backlog.extend(pending.items())
+    if movie_index.loaded:
+        _apply(movie_index, pending.items())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_movie_changes(session):
+    session.info.pop("movie_search_pending", None)
+
+
+# ----------------- Query -----------------
+def _backend(db: Session) -> str:
+    if settings.search_backend != "auto":
+        return settings.search_backend
+    return "fulltext" if db.get_bind().dialect.name == "mysql" else "memory"
+
+
+def _decode_search_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    data = decode_cursor(cursor)
+    if not isinstance(data.get("s"), (int, float)) or not isinstance(data.get("i"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return float(data["s"]), data["i"]
+
+
+def _page(results, size: int, after):
+    if after is not None:
+        score, movie_id = after
+        results = [r for r in results if (-r[0], r[1]) > (-score, movie_id)]
+    page = results[:size]
+    next_cursor = encode_cursor({"s": page[-1][0], "i": page[-1][1]}) if len(results) > size else None
+    return page, next_cursor
+
+
+def _match(*columns, q: str):
+    return mysql_match(*columns, against=q).in_natural_language_mode()
+
+
+def _fulltext_search(db: Session, q: str, genre, language, release_year, size: int, after):
+    score = (
+        FIELD_BOOSTS["title"] * _match(Movies.title, q=q)
+        + FIELD_BOOSTS["director"] * _match(Movies.director, Movies.cast, q=q)
+        + FIELD_BOOSTS["description"] * _match(Movies.description, q=q)
+    ).label("score")
+    inner = select(*(getattr(Movies, key) for key in ("id", *_META)), score).where(
+        _match(Movies.title, Movies.director, Movies.cast, Movies.description, q=q)
+    )
+    # case-insensitive like the memory backend, whatever the column collation
+    if genre:
+        inner = inner.where(func.lower(Movies.genre) == genre.lower())
+    if language:
+        inner = inner.where(func.lower(Movies.language) == language.lower())
+    if release_year:
+        inner = inner.where(Movies.release_year == release_year)
+    ranked = inner.subquery()
+    stmt = select(ranked)
+    if after is not None:
+        stmt = stmt.where((ranked.c.score < after[0]) | ((ranked.c.score == after[0]) & (ranked.c.id > after[1])))
+    stmt = stmt.order_by(ranked.c.score.desc(), ranked.c.id).limit(size + 1)
+    rows = db.execute(stmt).all()
+    results = [(float(row.score), row.id, {key: getattr(row, key) for key in _META}) for row in rows]
+    # already seeked past the cursor in SQL
+    return _page(results, size, None)
+
+
+def search_movies(db: Session, q: str, genre: Optional[str] = None, language: Optional[str] = None,
+    release_year: Optional[int] = None, size: int = 20, cursor: Optional[str] = None):
+    after = _decode_search_cursor(cursor)
+    if _backend(db) == "fulltext":
+        page, next_cursor = _fulltext_search(db, q, genre, language, release_year, size, after)
+    else:
+        results = _ensure_index(db).search(q, genre=genre, language=language, release_year=release_year)
+        page, next_cursor = _page(results, size, after)
+    return {
+        "results": [{"id": movie_id, "score": round(score, 4), **meta} for score, movie_id, meta in page],
+        "next_cursor": next_cursor,
+    }
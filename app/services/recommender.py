@@ -0,0 +1,291 @@
+"""
+Item-item collaborative filtering job that fills the Recommendation table.
+
+Ratings are loaded into CSR arrays (indptr/indices/data) in both orientations,
+mean-centred per user, and item similarities (adjusted cosine, shrunk by the
+number of co-raters) are computed block by block so the dense similarity
+block plus the expanded products stay inside a memory budget. Only the top-k
+neighbours of every movie are kept; they are saved next to the job so the
+next run can be incremental and only recompute recommendations for users
+whose ratings changed: reviews updated since the last run, and reviews
+deleted since then, which delete_review records in ReviewHistory.
+
+Run with `python -m app.cli recommend` (add --full to recompute similarities).
+"""
+import os
+import time
+from array import array
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.models.user import Reviews, Movies, Recommendation, RecommenderState, ReviewHistory
+
+try:
+    import numpy as np
+except ImportError:  # the job refuses to run without it, the API does not need it
+    np = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Working memory per dense similarity cell (similarity, co-rater count and
+# the argpartition scratch) and per expanded rating product
+_DENSE_CELL_BYTES = 32
+_PRODUCT_BYTES = 48
+# Co-rater shrinkage: sim * n / (n + _SHRINK)
+_SHRINK = 10.0
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ----------------- Ratings -----------------
+def _load_ratings(db: Session, user_ids=None, chunk_size: int = 50000):
+    """
+    (user_id, movie_id, rating) columns as NumPy arrays, streamed from Reviews
+    into compact typed arrays instead of Python tuples
+    """
+    users, movies, ratings = array("q"), array("q"), array("d")
+    stmt = select(Reviews.user_id, Reviews.movie_id, Reviews.rating).where(Reviews.rating.is_not(None))
+    batches = [None] if user_ids is None else [user_ids[i:i + 1000] for i in range(0, len(user_ids), 1000)]
+    for batch in batches:
+        query = stmt if batch is None else stmt.where(Reviews.user_id.in_(batch))
+        result = db.execute(query.execution_options(yield_per=chunk_size))
+        for part in result.partitions():
+            users.extend(row[0] for row in part)
+            movies.extend(row[1] for row in part)
+            ratings.extend(row[2] for row in part)
+    return (
+        np.frombuffer(users, dtype=np.int64),
+        np.frombuffer(movies, dtype=np.int64),
+        np.frombuffer(ratings, dtype=np.float64),
+    )
+
+
+def _center(user_idx, ratings, n_users: int):
+    sums = np.bincount(user_idx, weights=ratings, minlength=n_users)
+    counts = np.bincount(user_idx, minlength=n_users)
+    return ratings - (sums / np.maximum(counts, 1))[user_idx]
+
+
+def _csr(rows, cols, values, n_rows: int):
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+def _gather(starts_of, lens):
+    # positions of every element of the given CSR rows, concatenated
+    total = int(lens.sum())
+    offsets = np.repeat(np.cumsum(lens) - lens, lens)
+    return np.arange(total, dtype=np.int64) - offsets + np.repeat(starts_of, lens)
+
+
+# ----------------- Similarities -----------------
+def item_neighbors(item_idx, user_idx, values, n_items: int, n_users: int, k: int, memory_bytes: int):
+    """
+    Top-k most similar items of every item as (indices, similarities), both
+    shaped (n_items, k). Returns the number of blocks it took as well.
+    """
+    k = max(1, min(k, n_items - 1))
+    i_ptr, i_users, i_vals = _csr(item_idx, user_idx, values, n_items)
+    u_ptr, u_items, u_vals = _csr(user_idx, item_idx, values, n_users)
+    norms = np.sqrt(np.bincount(item_idx, weights=values ** 2, minlength=n_items))
+    row_len = np.diff(u_ptr)
+    # expanded products an item generates: the ratings of everyone who rated it
+    products = np.bincount(item_idx, weights=row_len[user_idx], minlength=n_items)
+    cum_bytes = np.concatenate([[0], np.cumsum(n_items * _DENSE_CELL_BYTES + products * _PRODUCT_BYTES)])
+
+    nb_idx = np.zeros((n_items, k), dtype=np.int32)
+    nb_sim = np.zeros((n_items, k), dtype=np.float32)
+    start = blocks = 0
+    while start < n_items:
+        end = int(np.searchsorted(cum_bytes, cum_bytes[start] + memory_bytes, side="right")) - 1
+        end = min(max(end, start + 1), n_items)
+        size = end - start
+        lo, hi = i_ptr[start], i_ptr[end]
+        raters = i_users[lo:hi]
+        lens = row_len[raters]
+        pos = _gather(u_ptr[raters], lens)
+        rows = np.repeat(np.repeat(np.arange(size, dtype=np.int64), np.diff(i_ptr[start:end + 1])), lens)
+        flat = rows * n_items + u_items[pos]
+        dots = np.bincount(flat, weights=np.repeat(i_vals[lo:hi], lens) * u_vals[pos], minlength=size * n_items)
+        co = np.bincount(flat, minlength=size * n_items)
+        del rows, pos, flat
+        dots, co = dots.reshape(size, n_items), co.reshape(size, n_items)
+        sims = (dots / (np.outer(norms[start:end], norms) + 1e-9)) * (co / (co + _SHRINK))
+        sims[np.arange(size), np.arange(start, end)] = 0.0
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < n_items else np.tile(np.arange(n_items), (size, 1))
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        nb_idx[start:end] = np.take_along_axis(top, order, axis=1)
+        nb_sim[start:end] = np.take_along_axis(top_sims, order, axis=1)
+        del dots, co, sims
+        start = end
+        blocks += 1
+    return nb_idx, nb_sim, blocks
+
+
+def _save_model(path: str, movie_ids, nb_idx, nb_sim):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, movie_ids=movie_ids, nb_idx=nb_idx, nb_sim=nb_sim)
+    os.replace(tmp, path)
+
+
+def _load_model(path: str):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return data["movie_ids"], data["nb_idx"], data["nb_sim"]
+
+
+# ----------------- Per-user recommendations -----------------
+def _recommend_user(items, centered, ratings, nb_idx, nb_sim, per_user: int):
+    """
+    Scores the neighbours of the user's rated items; returns a list of
+    (item, score, source item, source rating) best first
+    """
+    k = nb_idx.shape[1]
+    neighbours = nb_idx[items].ravel()
+    sims = nb_sim[items].ravel().astype(np.float64)
+    contrib = sims * np.repeat(centered, k)
+    sources = np.repeat(np.arange(len(items)), k)
+    keep = (sims > 0) & ~np.isin(neighbours, items)
+    if not keep.any():
+        return []
+    neighbours, sims, contrib, sources = neighbours[keep], sims[keep], contrib[keep], sources[keep]
+    candidates, inverse = np.unique(neighbours, return_inverse=True)
+    scores = np.bincount(inverse, weights=contrib) / (np.bincount(inverse, weights=sims) + 1.0)
+    # the rated item that pushed each candidate the most, for the reason text
+    order = np.lexsort((-contrib, inverse))
+    firsts = order[np.concatenate([[0], np.flatnonzero(np.diff(inverse[order])) + 1])]
+    best = np.argsort(-scores)[:per_user]
+    return [
+        (int(candidates[c]), float(scores[c]), int(items[sources[firsts[c]]]), float(ratings[sources[firsts[c]]]))
+        for c in best if scores[c] > 0
+    ]
+
+
+def _write_recommendations(db: Session, user_ids, rows, titles: dict):
+    db.execute(delete(Recommendation).where(Recommendation.user_id.in_(user_ids)))
+    if rows:
+        db.connection().execute(insert(Recommendation), [
+            {
+                "user_id": user_id,
+                "recommended_movie_id": movie_id,
+                "reason": f"Because you rated {titles.get(source_id, 'a movie')} {rating:g}/10",
+            }
+            for user_id, movie_id, source_id, rating in rows
+        ])
+    db.commit()
+
+
+def run_recommender(db: Session, full: bool = False, neighbors: Optional[int] = None, per_user: Optional[int] = None,
+    memory_mb: Optional[int] = None, model_path: Optional[str] = None, batch_size: int = 1000):
+    """
+    Full run: rebuilds item similarities from every rating and recomputes all
+    users. Incremental run (default once a model exists): reuses the saved
+    similarities and only recomputes users with reviews changed or deleted
+    since the last run. Returns a report with counts, timings and peak memory.
+    """
+    if np is None:
+        raise RuntimeError("The recommender job needs NumPy (pip install numpy)")
+    neighbors = neighbors or settings.recommender_neighbors
+    per_user = per_user or settings.recommender_per_user
+    memory_bytes = (memory_mb or settings.recommender_memory_mb) * 1024 * 1024
+    model_path = model_path or settings.recommender_model_path
+    started = time.perf_counter()
+    timings = {}
+
+    state = db.get(RecommenderState, 1)
+    if state is None:
+        state = RecommenderState(id=1)
+        db.add(state)
+    watermark = max(filter(None, (db.scalar(select(func.max(Reviews.updated_at))),
+        db.scalar(select(func.max(ReviewHistory.changed_at))))), default=None)
+    model = None if full or state.last_rating_change is None else _load_model(model_path)
+    mode = "incremental" if model is not None else "full"
+
+    phase = time.perf_counter()
+    if mode == "full":
+        users, movies, ratings = _load_ratings(db)
+    else:
+        changed = db.scalars(
+            select(Reviews.user_id).where(Reviews.updated_at >= state.last_rating_change)
+            .union(select(ReviewHistory.user_id).where(ReviewHistory.changed_at >= state.last_rating_change))
+        ).all()
+        users, movies, ratings = _load_ratings(db, user_ids=list(changed))
+        # users whose last rating was deleted keep nothing to recommend from
+        emptied = sorted(set(changed) - set(users.tolist()))
+        if emptied:
+            _write_recommendations(db, emptied, [], {})
+    timings["load_seconds"] = round(time.perf_counter() - phase, 3)
+
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    centered = _center(user_idx, ratings, len(user_ids))
+    blocks = 0
+    phase = time.perf_counter()
+    if mode == "full":
+        movie_ids, item_idx = np.unique(movies, return_inverse=True)
+        if len(movie_ids) > 1:
+            nb_idx, nb_sim, blocks = item_neighbors(item_idx, user_idx, centered, len(movie_ids), len(user_ids),
+                neighbors, memory_bytes)
+        else:
+            nb_idx, nb_sim = np.zeros((len(movie_ids), 0), np.int32), np.zeros((len(movie_ids), 0), np.float32)
+        _save_model(model_path, movie_ids, nb_idx, nb_sim)
+    else:
+        movie_ids, nb_idx, nb_sim = model
+        # movies added since the last full run have no neighbours yet
+        item_idx = np.searchsorted(movie_ids, movies)
+        known = (item_idx < len(movie_ids)) & (movie_ids[np.minimum(item_idx, len(movie_ids) - 1)] == movies)
+        user_idx, item_idx, centered, ratings = user_idx[known], item_idx[known], centered[known], ratings[known]
+    timings["similarity_seconds"] = round(time.perf_counter() - phase, 3)
+
+    phase = time.perf_counter()
+    u_ptr, u_items, u_centered = _csr(user_idx, item_idx, centered, len(user_ids))
+    _, _, u_ratings = _csr(user_idx, item_idx, ratings, len(user_ids))
+    written = 0
+    for batch_start in range(0, len(user_ids), batch_size):
+        batch_end = min(batch_start + batch_size, len(user_ids))
+        rows = []
+        for u in range(batch_start, batch_end):
+            lo, hi = u_ptr[u], u_ptr[u + 1]
+            if lo == hi or nb_idx.shape[1] == 0:
+                continue
+            for item, _, source, rating in _recommend_user(u_items[lo:hi], u_centered[lo:hi], u_ratings[lo:hi],
+                nb_idx, nb_sim, per_user):
+                rows.append((int(user_ids[u]), int(movie_ids[item]), int(movie_ids[source]), rating))
+        source_ids = {row[2] for row in rows}
+        titles = dict(db.execute(select(Movies.id, Movies.title).where(Movies.id.in_(source_ids))).all()) if source_ids else {}
+        _write_recommendations(db, [int(u) for u in user_ids[batch_start:batch_end]], rows, titles)
+        written += len(rows)
+    timings["write_seconds"] = round(time.perf_counter() - phase, 3)
+
+    state.last_rating_change = watermark
+    if mode == "full":
+        state.last_full_run = datetime.now()
+    db.commit()
+
+    report = {
+        "mode": mode,
+        "ratings": int(len(ratings)),
+        "users": int(len(user_ids)),
+        "movies": int(len(movie_ids)),
+        "similarity_blocks": blocks,
+        "recommendations_written": written,
+        **timings,
+        "seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    logger.info({"event": "recommender_run", **report})
+    return report
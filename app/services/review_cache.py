@@ -0,0 +1,79 @@
+"""
+Response cache for the per-movie review listing. Entries are keyed by the
+movie's version counter, so a review write only has to bump the counter for
+the old pages to stop matching. Every cached body carries a content ETag,
+which lets clients revalidate with If-None-Match and get a 304 back.
+
+The cache and the version counters are per worker: a write only bumps the
+counter of the worker that served it. Other workers keep serving their cached
+pages, and answering 304 to the matching ETag, until the entries expire, so a
+review change can take up to REVIEW_CACHE_TTL to show on every worker. Keep
+the TTL short; it only has to absorb bursts of reads of the same pages.
+"""
+import hashlib
+import threading
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.cache import TTLCache
+from app.core.settings import settings
+
+
+listing_cache = TTLCache(maxsize=settings.review_cache_size, ttl=settings.review_cache_ttl)
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def movie_version(movie_id: int) -> int:
+    return _versions.get(movie_id, 0)
+
+
+def bump_movie(movie_id: int):
+    """
+    Must be called after every committed change to a movie's reviews (or
+    their like_count); the cached pages of that movie are then never served again
+    """
+    with _versions_lock:
+        _versions[movie_id] = _versions.get(movie_id, 0) + 1
+
+
+def bump_movies(movie_ids: Iterable[int]):
+    with _versions_lock:
+        for movie_id in movie_ids:
+            _versions[movie_id] = _versions.get(movie_id, 0) + 1
+
+
+def invalidate_all():
+    listing_cache.clear()
+
+
+def listing_key(movie_id: int, **params):
+    return (movie_id, movie_version(movie_id), tuple(sorted(params.items())))
+
+
+def store(key, result: dict):
+    """
+    Renders the listing once and caches (etag, body) under key
+    """
+    response = JSONResponse(jsonable_encoder(result))
+    etag = '"' + hashlib.sha1(response.body).hexdigest()[:20] + '"'
+    entry = (etag, response.body)
+    listing_cache.set(key, entry)
+    return entry
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def respond(request: Request, entry) -> Response:
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
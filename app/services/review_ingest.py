@@ -0,0 +1,164 @@
+"""
+Bulk review ingestion for partner dumps. Streams NDJSON or CSV rows, validates
+them with ReviewCreate, scores sentiment per batch and inserts in chunks with
+a single executemany; duplicates are skipped through unique_user_movie_review.
+Movie rating aggregates are rebuilt once at the end for every affected movie.
+"""
+import csv
+import json
+import time
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional
+from app.core.logger import logger
+from app.models.user import Reviews, Movies, User
+from app.schemas.reviews import ReviewCreate
+from app.services import sentiment, review_cache
+from app.services.user_reviews import rebuild_movie_rating_aggregates
+
+INGEST_FORMATS = ("ndjson", "csv")
+
+
+def _iter_records(lines: Iterable[str], fmt: str):
+    """
+    Yields (line number, raw record or None, parse error or None)
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, line.rstrip("\n"), f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, record, "Expected a JSON object"
+            continue
+        yield line_no, record, None
+
+
+class _Rejects:
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.count = 0
+        self._fh = None
+
+    def add(self, line_no: int, record, error: str):
+        self.count += 1
+        if self.path is None:
+            return
+        if self._fh is None:
+            self._fh = open(self.path, "w", encoding="utf-8")
+        self._fh.write(json.dumps({"line": line_no, "row": record, "error": error}, default=str) + "\n")
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+
+
+def _insert_chunk(db: Session, chunk, rejects: _Rejects):
+    """
+    chunk is a list of (line number, raw record, user_id, ReviewCreate).
+    Returns (inserted, duplicates, movie ids touched).
+    """
+    movie_ids = {payload.movie_id for _, _, _, payload in chunk}
+    user_ids = {user_id for _, _, user_id, _ in chunk}
+    known_movies = set(db.scalars(select(Movies.id).where(Movies.id.in_(movie_ids))))
+    known_users = set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+
+    valid = []
+    for line_no, record, user_id, payload in chunk:
+        if payload.movie_id not in known_movies:
+            rejects.add(line_no, record, "Movie not found")
+        elif user_id not in known_users:
+            rejects.add(line_no, record, "User not found")
+        else:
+            valid.append((user_id, payload))
+    if not valid:
+        return 0, 0, set()
+
+    scores = sentiment.score_batch([payload.comment for _, payload in valid])
+    rows = [
+        {
+            "movie_id": payload.movie_id,
+            "user_id": user_id,
+            "rating": float(payload.rating),
+            "comment": payload.comment,
+            "sentiment_score": score,
+            "like_count": 0,
+        }
+        for (user_id, payload), score in zip(valid, scores)
+    ]
+    stmt = insert(Reviews).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+    inserted = db.connection().execute(stmt, rows).rowcount
+    db.commit()
+    return inserted, len(rows) - inserted, {row["movie_id"] for row in rows}
+
+
+def ingest_reviews(db: Session, lines: Iterable[str], fmt: str = "ndjson", chunk_size: int = 1000,
+    rejected_path: Optional[str] = None):
+    """
+    Every row needs user_id, movie_id and rating, comment is optional.
+    Returns a report with counts, rows/sec and the rejected-rows file.
+    """
+    if fmt not in INGEST_FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {INGEST_FORMATS}")
+    started = time.perf_counter()
+    rejects = _Rejects(rejected_path)
+    rows = inserted = duplicates = 0
+    affected = set()
+    chunk = []
+    try:
+        for line_no, record, error in _iter_records(lines, fmt):
+            rows += 1
+            if error:
+                rejects.add(line_no, record, error)
+                continue
+            try:
+                user_id = int(record["user_id"])
+                payload = ReviewCreate(
+                    movie_id=record.get("movie_id"),
+                    rating=record.get("rating"),
+                    comment=record.get("comment") or None,
+                )
+            except KeyError:
+                rejects.add(line_no, record, "Missing user_id")
+                continue
+            except (TypeError, ValueError, ValidationError) as e:
+                rejects.add(line_no, record, str(e))
+                continue
+            chunk.append((line_no, record, user_id, payload))
+            if len(chunk) >= chunk_size:
+                added, dupes, movies = _insert_chunk(db, chunk, rejects)
+                inserted, duplicates = inserted + added, duplicates + dupes
+                affected |= movies
+                chunk = []
+        if chunk:
+            added, dupes, movies = _insert_chunk(db, chunk, rejects)
+            inserted, duplicates = inserted + added, duplicates + dupes
+            affected |= movies
+    finally:
+        rejects.close()
+
+    rebuild_movie_rating_aggregates(db, movie_ids=affected)
+    review_cache.bump_movies(affected)
+    elapsed = time.perf_counter() - started
+    report = {
+        "rows": rows,
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "rejected": rejects.count,
+        "rejected_file": rejected_path if rejects.count else None,
+        "movies_rebuilt": len(affected),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+    }
+    logger.info({"event": "reviews_ingested", **report})
+    return report
@@ -0,0 +1,284 @@
+"""
+Lexicon based sentiment scoring for review comments. Comments are tokenized
+into words (so "goodbye" no longer counts as "good"), looked up in a
+precompiled vocabulary and scored with negation handling ("not good" counts
+as negative). score_batch() scores many comments per call and uses NumPy for
+the aggregation when it is installed.
+"""
+import os
+import re
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import select, update, bindparam, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.models.user import Reviews, SentimentRescoreState
+from app.services import review_cache
+
+try:
+    import numpy as np
+except ImportError:  # optional, score_batch falls back to pure Python
+    np = None
+
+# Bump whenever the lexicon or scoring rules change; existing reviews are then
+# rescored in the background by rescore_reviews()
+LEXICON_VERSION = 2
+
+POSITIVE_WORDS = (
+    "good", "great", "amazing", "love", "loved", "loving", "excellent", "enjoyed", "enjoyable",
+    "awesome", "brilliant", "fantastic", "wonderful", "masterpiece", "beautiful", "best",
+    "fun", "funny", "superb", "perfect", "recommend", "favorite", "favourite", "gripping",
+    "moving", "stunning", "hilarious", "entertaining", "impressive", "solid",
+)
+NEGATIVE_WORDS = (
+    "bad", "boring", "terrible", "awful", "hate", "hated", "worst", "dull", "poor", "waste",
+    "disappointing", "disappointed", "horrible", "mediocre", "predictable", "stupid",
+    "weak", "mess", "annoying", "slow", "overrated", "bland", "forgettable", "cringe",
+)
+NEGATIONS = (
+    "not", "no", "never", "nothing", "hardly", "barely", "without", "neither", "nor",
+    "isn't", "wasn't", "aren't", "weren't", "don't", "didn't", "doesn't", "can't",
+    "couldn't", "won't", "wouldn't", "shouldn't", "ain't",
+)
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class SentimentEngine:
+
+    def __init__(self, positive: Iterable[str], negative: Iterable[str], negations: Iterable[str],
+        version: int, negation_window: int = 3):
+        self.version = version
+        self.negation_window = negation_window
+        # word -> +1/-1, negations -> 0
+        self.vocabulary = {word: 1.0 for word in positive}
+        self.vocabulary.update({word: -1.0 for word in negative})
+        self.vocabulary.update({word: 0.0 for word in negations})
+
+    def tokenize(self, text: str) -> List[str]:
+        return _TOKEN_RE.findall(text.lower())
+
+    def _weights(self, text: str) -> List[float]:
+        """
+        Signed weight of every sentiment word in the text; a negation flips the
+        sentiment words that follow it within negation_window tokens
+        """
+        weights = []
+        negated = 0
+        vocabulary = self.vocabulary
+        for token in self.tokenize(text):
+            weight = vocabulary.get(token)
+            if weight == 0.0:
+                negated = self.negation_window
+                continue
+            if weight is not None:
+                weights.append(-weight if negated else weight)
+            if negated:
+                negated -= 1
+        return weights
+
+    @staticmethod
+    def _to_score(pos: float, neg: float) -> float:
+        score = (pos - neg) / (pos + neg + 1e-6)
+        return max(0.0, min(1.0, (score + 1) / 2))
+
+    def score(self, text: Optional[str]) -> Optional[float]:
+        """
+        Score in [0, 1] (0.5 is neutral) or None for an empty comment
+        """
+        if not text:
+            return None
+        weights = self._weights(text)
+        pos = sum(w for w in weights if w > 0)
+        neg = -sum(w for w in weights if w < 0)
+        return self._to_score(pos, neg)
+
+    def score_batch(self, texts: List[Optional[str]]) -> List[Optional[float]]:
+        if np is None:
+            return [self.score(text) for text in texts]
+        docs, weights = [], []
+        for i, text in enumerate(texts):
+            if text:
+                w = self._weights(text)
+                docs.extend([i] * len(w))
+                weights.extend(w)
+        n = len(texts)
+        docs = np.asarray(docs, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        pos = np.bincount(docs, weights=np.maximum(weights, 0.0), minlength=n)
+        neg = np.bincount(docs, weights=np.maximum(-weights, 0.0), minlength=n)
+        scores = np.clip(((pos - neg) / (pos + neg + 1e-6) + 1) / 2, 0.0, 1.0)
+        return [float(score) if text else None for score, text in zip(scores, texts)]
+
+
+sentiment_engine = SentimentEngine(POSITIVE_WORDS, NEGATIVE_WORDS, NEGATIONS, version=LEXICON_VERSION)
+
+
+def set_sentiment_engine(engine: SentimentEngine):
+    """
+    Swaps the engine used by the review write path and the rescoring job
+    """
+    global sentiment_engine
+    sentiment_engine = engine
+
+
+def score(text: Optional[str]) -> Optional[float]:
+    return sentiment_engine.score(text)
+
+
+def score_batch(texts: List[Optional[str]]) -> List[Optional[float]]:
+    return sentiment_engine.score_batch(texts)
+
+
+# ----------------- Background rescoring -----------------
+# A review whose comment changed since it was read is skipped: the edit already
+# stored a score from the current engine. updated_at is kept, the text did not change
+_rescore_stmt = (
+    update(Reviews)
+    .where(Reviews.id == bindparam("b_review_id"), Reviews.comment.is_not_distinct_from(bindparam("b_comment")))
+    .values(sentiment_score=bindparam("b_score"), updated_at=Reviews.updated_at)
+)
+
+# Every worker may start the rescore at startup; the lease on the state row
+# lets one of them run it and the others return. A crashed owner's lease runs
+# out and the next start takes over from last_review_id
+RESCORE_LEASE_SECONDS = 120
+
+
+def needs_rescore(db: Session) -> bool:
+    state = db.get(SentimentRescoreState, 1)
+    return state is None or state.lexicon_version != sentiment_engine.version or not state.completed
+
+
+def _claim(db: Session, owner: str) -> bool:
+    """
+    Takes or renews the lease in the current transaction; False when another
+    process holds an unexpired one
+    """
+    now = datetime.utcnow()
+    stmt = (
+        update(SentimentRescoreState)
+        .where(
+            SentimentRescoreState.id == 1,
+            or_(SentimentRescoreState.owner.is_(None), SentimentRescoreState.owner == owner,
+                SentimentRescoreState.lease_until < now),
+        )
+        .values(owner=owner, lease_until=now + timedelta(seconds=RESCORE_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount == 1
+
+
+def _release(db: Session, owner: str):
+    db.execute(
+        update(SentimentRescoreState)
+        .where(SentimentRescoreState.id == 1, SentimentRescoreState.owner == owner)
+        .values(owner=None, lease_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def rescore_reviews(db: Session, chunk_size: int = 1000, stop_event=None) -> int:
+    """
+    Rescores Reviews.sentiment_score with the current engine, in id order and in
+    chunks. Progress is committed together with each chunk, so an interrupted
+    run resumes where it stopped; a new lexicon version starts over. Returns 0
+    without doing anything while another process holds the rescore lease.
+    """
+    engine = sentiment_engine
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:64]
+    if db.get(SentimentRescoreState, 1) is None:
+        try:
+            db.add(SentimentRescoreState(id=1, lexicon_version=engine.version, last_review_id=0, completed=False))
+            db.commit()
+        except IntegrityError:
+            # created by a worker starting at the same time
+            db.rollback()
+    if not _claim(db, owner):
+        db.rollback()
+        logger.info("Sentiment rescoring is running in another process")
+        return 0
+    db.commit()
+
+    rescored = 0
+    try:
+        state = db.get(SentimentRescoreState, 1, populate_existing=True)
+        if state.lexicon_version != engine.version:
+            state.lexicon_version, state.last_review_id, state.completed = engine.version, 0, False
+        elif state.completed:
+            return 0
+        db.commit()
+
+        while stop_event is None or not stop_event.is_set():
+            rows = db.execute(
+                select(Reviews.id, Reviews.comment)
+                .where(Reviews.id > state.last_review_id)
+                .order_by(Reviews.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                state.completed = True
+                db.commit()
+                break
+            scores = engine.score_batch([comment for _, comment in rows])
+            db.connection().execute(_rescore_stmt, [{"b_review_id": review_id, "b_comment": comment, "b_score": s}
+                for (review_id, comment), s in zip(rows, scores)])
+            state.last_review_id = rows[-1][0]
+            # renewing in the chunk's transaction: a run that lost its lease commits nothing
+            if not _claim(db, owner):
+                db.rollback()
+                logger.warning("Sentiment rescore lease lost, stopping at review %s", state.last_review_id)
+                break
+            db.commit()
+            rescored += len(rows)
+    finally:
+        db.rollback()
+        _release(db, owner)
+    if rescored:
+        review_cache.invalidate_all()
+    logger.info("Rescored sentiment of %s reviews with lexicon version %s", rescored, engine.version)
+    return rescored
+
+
+_rescore_stop = threading.Event()
+_rescore_thread = None
+
+
+def start_background_rescore(chunk_size: int = 1000):
+    """
+    Starts rescore_reviews() on a daemon thread when the stored lexicon version
+    differs from the current one (or a previous run did not finish)
+    """
+    global _rescore_thread
+    from app.db.session import SessionLocal
+
+    if _rescore_thread is not None and _rescore_thread.is_alive():
+        return _rescore_thread
+    db = SessionLocal()
+    try:
+        if not needs_rescore(db):
+            return None
+    finally:
+        db.close()
+
+    def _run():
+        db = SessionLocal()
+        try:
+            rescore_reviews(db, chunk_size=chunk_size, stop_event=_rescore_stop)
+        except Exception:
+            logger.exception("Background sentiment rescoring failed")
+        finally:
+            db.close()
+
+    _rescore_stop.clear()
+    _rescore_thread = threading.Thread(target=_run, name="sentiment-rescore", daemon=True)
+    _rescore_thread.start()
+    return _rescore_thread
+
+
+def stop_background_rescore():
+    _rescore_stop.set()
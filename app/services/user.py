@@ -1,5 +1,6 @@
 from app.models.user import User
 from app.core.security import PasswordManager
+from app.core import hashing
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.repositories.user_repository import UserRepository
@@ -24,7 +25,7 @@ class UserService:
             username=username,
             email=email,
             role=role,
-            password=PasswordManager.hash_password(password)
+            password=hashing.hash_password(password)
         )
         return repo.create(new_user)
 
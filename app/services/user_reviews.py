@@ -4,46 +4,110 @@ the db simultaneously
 """
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from app.models.user import Reviews, Movies, Review_Liked
+from sqlalchemy import func, desc, update, select, insert, delete, case, bindparam, literal, or_, and_
+from app.models.user import Reviews, Movies, Review_Liked, ReviewHistory
 from app.core.logger import logger
-from typing import Optional
-def _sentiment_placeholder(text: str): 
-    if not text:
-        return None
-    txt = text.lower()
-    pos = sum(word in txt for word in ("good","great","amazing","love","excellent","enjoyed"))
-    neg = sum(word in txt for word in ("bad","boring","terrible","awful","hate","worst"))
-    score = (pos - neg) / (pos + neg + 1e-6)
-    return max(0.0, min(1.0, (score + 1) / 2))
-
-def recalc_movie_rating(db: Session, movie_id: int):
-    avg = db.query(func.avg(Reviews.rating)).filter(Reviews.movie_id == movie_id).scalar()
-    avg_val = float(avg) if avg is not None else 0.0
-    movie = db.query(Movies).filter(Movies.id == movie_id).first()
-    if movie:
-        movie.rating = avg_val
-        db.add(movie)
-        db.commit()
-        logger.info("Recalculated movie %s rating -> %s",movie_id ,avg_val)
-    return avg_val
+from app.services.like_buffer import like_buffer
+from app.services.leaderboards import leaderboards
+from app.services import sentiment, review_cache
+from app.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
+from typing import Iterable, Optional
+def _rating_delta_stmt(movie_id: int, d_sum: float, d_count: int, d_sq: float):
+    """
+    Builds a single UPDATE that shifts the running rating aggregates of a movie
+    by the given deltas. The increments happen inside the database so concurrent
+    writers on the same movie serialise on the row lock instead of overwriting
+    each other.
+    """
+    new_sum = Movies.rating_sum + d_sum
+    new_count = Movies.rating_count + d_count
+    # rating goes first: MySQL evaluates single-table UPDATE assignments left to
+    # right, so it has to be computed before rating_sum/rating_count change
+    return (
+        update(Movies)
+        .where(Movies.id == movie_id)
+        .ordered_values(
+            (Movies.rating, case((new_count > 0, new_sum / new_count), else_=0.0)),
+            (Movies.rating_sum, new_sum),
+            (Movies.rating_count, new_count),
+            (Movies.rating_sq_sum, Movies.rating_sq_sum + d_sq),
+        )
+    )
+
+def _apply_rating_delta(db: Session, movie_id: int, old_rating: Optional[float], new_rating: Optional[float]):
+    # Does not commit, the caller commits it together with the review write
+    d_sum = (new_rating or 0.0) - (old_rating or 0.0)
+    d_count = (new_rating is not None) - (old_rating is not None)
+    d_sq = (new_rating or 0.0) ** 2 - (old_rating or 0.0) ** 2
+    if d_sum or d_count or d_sq:
+        db.execute(_rating_delta_stmt(movie_id, d_sum, d_count, d_sq))
+
+def rebuild_movie_rating_aggregates(db: Session, movie_ids: Optional[Iterable[int]] = None, chunk_size: int = 1000):
+    """
+    Repairs Movies.rating/rating_sum/rating_count/rating_sq_sum from the Reviews
+    table with one grouped scan. Rebuilds every movie when movie_ids is None.
+    """
+    ids = None if movie_ids is None else sorted(set(movie_ids))
+    if ids == []:
+        return 0
+    reset = update(Movies).values(rating=0.0, rating_sum=0.0, rating_count=0, rating_sq_sum=0.0)
+    agg = (
+        select(
+            Reviews.movie_id,
+            func.sum(Reviews.rating),
+            func.count(Reviews.rating),
+            func.sum(Reviews.rating * Reviews.rating),
+        )
+        .group_by(Reviews.movie_id)
+    )
+    if ids is not None:
+        reset = reset.where(Movies.id.in_(ids))
+        agg = agg.where(Reviews.movie_id.in_(ids))
+    db.execute(reset)
+
+    stmt = (
+        update(Movies)
+        .where(Movies.id == bindparam("b_movie_id"))
+        .values(rating=bindparam("b_rating"), rating_sum=bindparam("b_sum"),
+                rating_count=bindparam("b_count"), rating_sq_sum=bindparam("b_sq"))
+    )
+    # One row per reviewed movie, so the grouped result is small enough to
+    # buffer; the writes are sent back as executemany batches
+    rows = db.execute(agg).all()
+    for start in range(0, len(rows), chunk_size):
+        params = [
+            {
+                "b_movie_id": movie_id,
+                "b_rating": float(total) / count if count else 0.0,
+                "b_sum": float(total or 0.0),
+                "b_count": count,
+                "b_sq": float(sq or 0.0),
+            }
+            for movie_id, total, count, sq in rows[start:start + chunk_size]
+        ]
+        db.connection().execute(stmt, params)
+    updated = len(rows)
+    db.commit()
+    logger.info("Rebuilt rating aggregates for %s movies", updated)
+    return updated
 
 def add_review(db: Session, user_id: int, movie_id: int, rating: float, comment: str):
     # check movie exists
     movie = db.query(Movies).filter(Movies.id == movie_id).first()
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
-    print("user_id", user_id, "movie_id", movie_id)
-    existing = db.query(Reviews).filter((Reviews.user_id == user_id) and (Reviews.movie_id == movie_id)).first()
-    print(existing, "88888")
+    existing = db.query(Reviews).filter(Reviews.user_id == user_id, Reviews.movie_id == movie_id).first()
     if existing:
         raise HTTPException(status_code=400, detail="You already reviewed this movie")
-    sentiment = _sentiment_placeholder(comment)
-    review = Reviews(movie_id=movie_id, user_id=user_id, rating=float(rating), comment=comment,sentiment_score=sentiment)
+    sentiment_score = sentiment.score(comment)
+    review = Reviews(movie_id=movie_id, user_id=user_id, rating=float(rating), comment=comment,sentiment_score=sentiment_score)
     db.add(review)
+    _apply_rating_delta(db, movie_id, None, review.rating)
     db.commit()
+    review_cache.bump_movie(movie_id)
+    leaderboards.record_review(movie_id, None, review.rating, movie=movie)
     db.refresh(review)
-    recalc_movie_rating(db, movie_id)
     logger.info("Review %s created by user %s for movie %s",review.id, user_id ,movie_id)
     return review
 
@@ -52,15 +116,18 @@ def update_review(db: Session, review_id: int, user_id: int, rating: float, comm
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
  
+    old_rating = review.rating
     if rating is not None:
+        _apply_rating_delta(db, review.movie_id, review.rating, float(rating))
         review.rating = float(rating)
     if comment is not None:
         review.comment = comment
-        review.sentiment_score = _sentiment_placeholder(comment)
+        review.sentiment_score = sentiment.score(comment)
     db.add(review)
     db.commit()
+    review_cache.bump_movie(review.movie_id)
+    leaderboards.record_review(review.movie_id, old_rating, review.rating)
     db.refresh(review)
-    recalc_movie_rating(db, review.movie_id)
     logger.info("Review %s updated by user %s", review_id, user_id)
     return review
 
@@ -68,11 +135,14 @@ def delete_review(db: Session, review_id: int, user_id: int):
     review = db.query(Reviews).filter(Reviews.id == review_id, Reviews.user_id == user_id).first()
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
-    movie_id = review.movie_id
     db.delete(review)
+    # what the incremental recommender run finds deleted ratings by
+    db.add(ReviewHistory(review_id=review.id, user_id=review.user_id, old_rating=review.rating,
+        old_comment=review.comment))
+    _apply_rating_delta(db, review.movie_id, review.rating, None)
     db.commit()
-    db.expire_all()
-    recalc_movie_rating(db, movie_id)
+    review_cache.bump_movie(review.movie_id)
+    leaderboards.record_review(review.movie_id, review.rating, None)
     logger.info("Review %s deleted by user %s", review_id, user_id)
    
     return True
@@ -83,44 +153,199 @@ def delete_review(db: Session, review_id: int, user_id: int):
 #         raise HTTPException(status_code=404, detail="Review not found")
 #     movie_id = review.movie_id
 #     db.delete(review)
+#     _apply_rating_delta(db, movie_id, review.rating, None)
 #     db.commit()
-#     recalc_movie_rating(db, movie_id)
 #     logger.info("Admin %s deleted review %s",admin_user_id, review_id)
 #     return {"message": "Review deleted by admin"}
 
-def list_reviews_by_movie(db: Session, movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0, 
-    userId: Optional[int] = None, sort: str = "created_at", order: str = "desc"):
-    q = db.query(Reviews).filter(Reviews.movie_id == movie_id)
+# Sorts supported by the cursor mode; each one seeks on (column, id). The seek
+# needs non-NULL values: reviews written before like_count had a default keep
+# NULL until `python -m app.cli backfill-like-counts` has run
+REVIEW_SORTS = {
+    "created_at": Reviews.created_at,
+    "rating": Reviews.rating,
+    "helpful": Reviews.like_count,
+    "like_count": Reviews.like_count,
+}
+
+def _listing_conditions(movie_id: int, ratingFrom: float, userId: Optional[int]):
+    conds = [Reviews.movie_id == movie_id]
     if ratingFrom:
-        q = q.filter(Reviews.rating >= ratingFrom)
+        conds.append(Reviews.rating >= ratingFrom)
     if userId:
-        q = q.filter(Reviews.user_id == userId)
+        conds.append(Reviews.user_id == userId)
+    return conds
+
+def _review_cursor(review: Reviews, sort: str, order: str, direction: str):
+    value = getattr(review, REVIEW_SORTS[sort].key)
+    return encode_cursor({"s": sort, "o": order, "d": direction, "v": value, "i": review.id})
+
+def _cursor_seek(cursor: str, sort: str, order: str):
+    """
+    Decodes a cursor into (seek condition, read descending, walking backwards)
+    """
+    data = decode_cursor(cursor)
+    if data.get("s") != sort or data.get("o") != order or data.get("d") not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    col = REVIEW_SORTS[sort]
+    value, last_id = data.get("v"), data.get("i")
+    if value is None or not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if col.key == "created_at":
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    backwards = data["d"] == "prev"
+    # walking back reads in the opposite order and flips the page afterwards
+    read_desc = (order == "desc") != backwards
+    if read_desc:
+        seek = or_(col < value, and_(col == value, Reviews.id < last_id))
+    else:
+        seek = or_(col > value, and_(col == value, Reviews.id > last_id))
+    return seek, read_desc, backwards
+
+def _keyset_page_stmt(conds, sort: str, order: str, size: int, cursor: Optional[str]):
+    col = REVIEW_SORTS[sort]
+    read_desc, backwards = order == "desc", False
+    if cursor:
+        seek, read_desc, backwards = _cursor_seek(cursor, sort, order)
+        conds = conds + [seek]
+    ordering = (desc(col), desc(Reviews.id)) if read_desc else (col, Reviews.id)
+    # one extra row tells whether another page exists
+    stmt = select(Reviews).where(*conds).order_by(*ordering).limit(size + 1)
+    return stmt, backwards
+
+def _keyset_page_result(rows, sort: str, order: str, size: int, cursor: Optional[str], backwards: bool, total: Optional[int]):
+    more = len(rows) > size
+    rows = list(rows[:size])
+    if backwards:
+        rows.reverse()
+    has_next = True if backwards else more
+    has_prev = more if backwards else bool(cursor)
+    return {
+        "total": total,
+        "page": None,
+        "size": size,
+        "reviews": rows,
+        "next_cursor": _review_cursor(rows[-1], sort, order, "next") if rows and has_next else None,
+        "prev_cursor": _review_cursor(rows[0], sort, order, "prev") if rows and has_prev else None,
+    }
+
+def list_reviews_by_movie(db: Session, movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0, 
+    userId: Optional[int] = None, sort: str = "created_at", order: str = "desc", cursor: Optional[str] = None,
+    includeTotal: bool = False):
+    """
+    Page/size mode when no cursor is given (kept for existing clients), otherwise
+    keyset mode that seeks on (sort column, id) and skips COUNT unless asked
+    """
+    order = "desc" if order.lower() == "desc" else "asc"
+    conds = _listing_conditions(movie_id, ratingFrom, userId)
+    if cursor:
+        if sort not in REVIEW_SORTS:
+            raise HTTPException(status_code=400, detail="Unsupported sort for cursor pagination")
+        total = db.scalar(select(func.count()).select_from(Reviews).where(*conds)) if includeTotal else None
+        stmt, backwards = _keyset_page_stmt(conds, sort, order, size, cursor)
+        rows = db.execute(stmt).scalars().all()
+        return _keyset_page_result(rows, sort, order, size, cursor, backwards, total)
+
+    q = db.query(Reviews).filter(*conds)
     total = q.count()
     # sort
-    if sort == "helpful":
-        order_col = Reviews.like_count
-    else:
-        order_col = getattr(Reviews, sort, Reviews.created_at)
-    if order.lower() == "desc":
-        q = q.order_by(desc(order_col))
+    order_col = REVIEW_SORTS.get(sort) or getattr(Reviews, sort, Reviews.created_at)
+    if order == "desc":
+        q = q.order_by(desc(order_col), desc(Reviews.id))
     else:
-        q = q.order_by(order_col)
+        q = q.order_by(order_col, Reviews.id)
     reviews = q.offset((page - 1) * size).limit(size).all()
-    return {"total": total, "page": page, "size": size, "reviews": reviews}
+    # a first cursor lets page-mode clients switch to seeking for deeper pages
+    next_cursor = None
+    if sort in REVIEW_SORTS and len(reviews) == size:
+        next_cursor = _review_cursor(reviews[-1], sort, order, "next")
+    return {"total": total, "page": page, "size": size, "reviews": reviews, "next_cursor": next_cursor, "prev_cursor": None}
+
+def _like_insert_stmt(review_id: int, user_id: int):
+    # INSERT IGNORE ... SELECT: the like only lands when the review exists and the
+    # unique_review_user_like constraint is free, in a single statement
+    source = select(Reviews.id, literal(user_id)).where(Reviews.id == review_id)
+    return (
+        insert(Review_Liked)
+        .from_select(["review_id", "user_id"], source)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+
+def _unlike_stmt(review_id: int, user_id: int):
+    return delete(Review_Liked).where(Review_Liked.review_id == review_id, Review_Liked.user_id == user_id)
+
+def _like_count(stored: Optional[int], review_id: int) -> int:
+    # the stored count plus what this worker has not flushed yet; other
+    # workers' pending likes show up after their next flush
+    return (stored or 0) + like_buffer.pending(review_id)
 
 def like_review(db: Session, review_id: int, user_id: int):
-    review = db.query(Reviews).filter(Reviews.id == review_id).first()
-    if not review:
+    inserted = db.execute(_like_insert_stmt(review_id, user_id)).rowcount
+    db.commit()
+    if inserted:
+        like_buffer.add(review_id, 1)
+    # nothing inserted: either the review is missing or it was already liked
+    row = db.execute(select(Reviews.like_count).where(Reviews.id == review_id)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    exists = db.query(Review_Liked).filter(Review_Liked.review_id == review_id, Review_Liked.user_id == user_id).first()
-    if exists:
-        logger.info("User %s already liked review %s", user_id, review_id)
-        return {"message": "Already liked", "like_count": review.like_count}
-    like = Review_Liked(review_id=review_id, user_id=user_id)
-    db.add(like)
-    review.like_count = (review.like_count or 0) + 1
-    db.add(review)
+    if inserted:
+        logger.info("User %s liked review %s", user_id, review_id)
+        return {"message": "Review liked", "like_count": _like_count(row[0], review_id)}
+    logger.info("User %s already liked review %s", user_id, review_id)
+    return {"message": "Already liked", "like_count": _like_count(row[0], review_id)}
+
+def unlike_review(db: Session, review_id: int, user_id: int):
+    removed = db.execute(_unlike_stmt(review_id, user_id)).rowcount
     db.commit()
-    db.refresh(review)
-    logger.info("User %s liked review %s", user_id, review_id)
-    return {"message": "Review liked", "like_count": review.like_count}
+    if not removed:
+        raise HTTPException(status_code=404, detail="Like not found")
+    like_buffer.add(review_id, -1)
+    stored = db.scalar(select(Reviews.like_count).where(Reviews.id == review_id))
+    logger.info("User %s unliked review %s", user_id, review_id)
+    return {"message": "Review unliked", "like_count": _like_count(stored, review_id)}
+
+def backfill_like_counts(db: Session, chunk_size: int = 10000):
+    """
+    Sets NULL Reviews.like_count to 0, one id range of chunk_size per transaction
+    so a large table is not locked in one go. Run once on databases created
+    before like_count had a default; reconcile_like_counts() also fixes them.
+    """
+    last_id = db.scalar(select(func.max(Reviews.id))) or 0
+    updated = 0
+    for start in range(0, last_id, chunk_size):
+        stmt = (
+            update(Reviews)
+            .where(Reviews.id > start, Reviews.id <= start + chunk_size, Reviews.like_count.is_(None))
+            .values(like_count=0)
+            .execution_options(synchronize_session=False)
+        )
+        updated += db.execute(stmt).rowcount
+        db.commit()
+    if updated:
+        review_cache.invalidate_all()
+    logger.info("Backfilled like_count of %s reviews", updated)
+    return updated
+
+def reconcile_like_counts(db: Session, review_ids: Optional[Iterable[int]] = None):
+    """
+    Recomputes Reviews.like_count from Review_Liked. Safe while workers are
+    serving: their buffered likes are already in Review_Liked and their
+    flushes recount rather than add, so nothing is counted twice.
+    """
+    counts = (
+        select(func.count(Review_Liked.id))
+        .where(Review_Liked.review_id == Reviews.id)
+        .scalar_subquery()
+    )
+    stmt = update(Reviews).values(like_count=counts)
+    if review_ids is not None:
+        stmt = stmt.where(Reviews.id.in_(list(review_ids)))
+    updated = db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    review_cache.invalidate_all()
+    logger.info("Reconciled like_count of %s reviews", updated)
+    return updated
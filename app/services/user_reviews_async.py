@@ -0,0 +1,133 @@
+"""
+AsyncSession versions of the review service functions, used by the async
+review routes when USE_ASYNC_DB is enabled. Statement building is shared with
+app.services.user_reviews so both paths behave the same.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models.user import Reviews, Movies, ReviewHistory
+from app.core.logger import logger
+from app.services.like_buffer import like_buffer
+from app.services.leaderboards import leaderboards
+from app.services import sentiment, review_cache
+from app.services.user_reviews import (
+    REVIEW_SORTS,
+    _like_count,
+    _like_insert_stmt,
+    _unlike_stmt,
+    _rating_delta_stmt,
+    _listing_conditions,
+    _keyset_page_stmt,
+    _keyset_page_result,
+    _review_cursor,
+)
+
+
+async def _apply_rating_delta(db: AsyncSession, movie_id: int, old_rating: Optional[float], new_rating: Optional[float]):
+    d_sum = (new_rating or 0.0) - (old_rating or 0.0)
+    d_count = (new_rating is not None) - (old_rating is not None)
+    d_sq = (new_rating or 0.0) ** 2 - (old_rating or 0.0) ** 2
+    if d_sum or d_count or d_sq:
+        await db.execute(_rating_delta_stmt(movie_id, d_sum, d_count, d_sq))
+
+async def add_review(db: AsyncSession, user_id: int, movie_id: int, rating: float, comment: str):
+    movie = await db.scalar(select(Movies).where(Movies.id == movie_id))
+    if not movie:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    existing = await db.scalar(select(Reviews.id).where(Reviews.user_id == user_id, Reviews.movie_id == movie_id))
+    if existing:
+        raise HTTPException(status_code=400, detail="You already reviewed this movie")
+    sentiment_score = sentiment.score(comment)
+    review = Reviews(movie_id=movie_id, user_id=user_id, rating=float(rating), comment=comment, sentiment_score=sentiment_score)
+    db.add(review)
+    await _apply_rating_delta(db, movie_id, None, review.rating)
+    await db.commit()
+    review_cache.bump_movie(movie_id)
+    leaderboards.record_review(movie_id, None, review.rating, movie=movie)
+    await db.refresh(review)
+    logger.info("Review %s created by user %s for movie %s", review.id, user_id, movie_id)
+    return review
+
+async def update_review(db: AsyncSession, review_id: int, user_id: int, rating: float, comment: str):
+    review = await db.scalar(select(Reviews).where(Reviews.id == review_id, Reviews.user_id == user_id))
+    if not review:
+        raise HTTPException(status_code=404, detail="Review not found")
+
+    old_rating = review.rating
+    if rating is not None:
+        await _apply_rating_delta(db, review.movie_id, review.rating, float(rating))
+        review.rating = float(rating)
+    if comment is not None:
+        review.comment = comment
+        review.sentiment_score = sentiment.score(comment)
+    await db.commit()
+    review_cache.bump_movie(review.movie_id)
+    leaderboards.record_review(review.movie_id, old_rating, review.rating)
+    await db.refresh(review)
+    logger.info("Review %s updated by user %s", review_id, user_id)
+    return review
+
+async def delete_review(db: AsyncSession, review_id: int, user_id: int):
+    review = await db.scalar(select(Reviews).where(Reviews.id == review_id, Reviews.user_id == user_id))
+    if not review:
+        raise HTTPException(status_code=404, detail="Review not found")
+    await db.delete(review)
+    # what the incremental recommender run finds deleted ratings by
+    db.add(ReviewHistory(review_id=review.id, user_id=review.user_id, old_rating=review.rating,
+        old_comment=review.comment))
+    await _apply_rating_delta(db, review.movie_id, review.rating, None)
+    await db.commit()
+    review_cache.bump_movie(review.movie_id)
+    leaderboards.record_review(review.movie_id, review.rating, None)
+    logger.info("Review %s deleted by user %s", review_id, user_id)
+    return True
+
+async def list_reviews_by_movie(db: AsyncSession, movie_id: int, page: int = 1, size: int = 10, ratingFrom: float = 0.0,
+    userId: Optional[int] = None, sort: str = "created_at", order: str = "desc", cursor: Optional[str] = None,
+    includeTotal: bool = False):
+    order = "desc" if order.lower() == "desc" else "asc"
+    conds = _listing_conditions(movie_id, ratingFrom, userId)
+    count_stmt = select(func.count()).select_from(Reviews).where(*conds)
+    if cursor:
+        if sort not in REVIEW_SORTS:
+            raise HTTPException(status_code=400, detail="Unsupported sort for cursor pagination")
+        total = await db.scalar(count_stmt) if includeTotal else None
+        stmt, backwards = _keyset_page_stmt(conds, sort, order, size, cursor)
+        rows = (await db.scalars(stmt)).all()
+        return _keyset_page_result(rows, sort, order, size, cursor, backwards, total)
+
+    total = await db.scalar(count_stmt)
+    order_col = REVIEW_SORTS.get(sort) or getattr(Reviews, sort, Reviews.created_at)
+    ordering = (desc(order_col), desc(Reviews.id)) if order == "desc" else (order_col, Reviews.id)
+    stmt = select(Reviews).where(*conds).order_by(*ordering).offset((page - 1) * size).limit(size)
+    reviews = (await db.scalars(stmt)).all()
+    next_cursor = None
+    if sort in REVIEW_SORTS and len(reviews) == size:
+        next_cursor = _review_cursor(reviews[-1], sort, order, "next")
+    return {"total": total, "page": page, "size": size, "reviews": reviews, "next_cursor": next_cursor, "prev_cursor": None}
+
+async def like_review(db: AsyncSession, review_id: int, user_id: int):
+    inserted = (await db.execute(_like_insert_stmt(review_id, user_id))).rowcount
+    await db.commit()
+    if inserted:
+        like_buffer.add(review_id, 1)
+    row = (await db.execute(select(Reviews.like_count).where(Reviews.id == review_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if inserted:
+        logger.info("User %s liked review %s", user_id, review_id)
+        return {"message": "Review liked", "like_count": _like_count(row[0], review_id)}
+    logger.info("User %s already liked review %s", user_id, review_id)
+    return {"message": "Already liked", "like_count": _like_count(row[0], review_id)}
+
+async def unlike_review(db: AsyncSession, review_id: int, user_id: int):
+    removed = (await db.execute(_unlike_stmt(review_id, user_id))).rowcount
+    await db.commit()
+    if not removed:
+        raise HTTPException(status_code=404, detail="Like not found")
+    like_buffer.add(review_id, -1)
+    stored = await db.scalar(select(Reviews.like_count).where(Reviews.id == review_id))
+    logger.info("User %s unliked review %s", user_id, review_id)
+    return {"message": "Review unliked", "like_count": _like_count(stored, review_id)}
@@ -0,0 +1,71 @@
+"""
+Watchlist operations. Bulk add and remove are one statement each, the listing
+joins Movies in the same query and seeks on (user_id, id) instead of OFFSET.
+"""
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.orm import Session
+from app.models.user import Watchlist, Movies
+from app.core.logger import logger
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+def _unique(movie_ids: List[int]) -> List[int]:
+    return list(dict.fromkeys(movie_ids))
+
+def add_to_watchlist(db: Session, user_id: int, movie_ids: List[int]):
+    movie_ids = _unique(movie_ids)
+    # INSERT IGNORE ... SELECT: unknown movies are filtered by the SELECT and
+    # entries already present by unique_user_movie_watchlist
+    source = select(literal(user_id), Movies.id).where(Movies.id.in_(movie_ids))
+    stmt = (
+        insert(Watchlist)
+        .from_select(["user_id", "movie_id"], source)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    added = db.execute(stmt).rowcount
+    db.commit()
+    logger.info("User %s added %s of %s movies to the watchlist", user_id, added, len(movie_ids))
+    return {"requested": len(movie_ids), "added": added}
+
+def remove_from_watchlist(db: Session, user_id: int, movie_ids: List[int]):
+    movie_ids = _unique(movie_ids)
+    stmt = delete(Watchlist).where(Watchlist.user_id == user_id, Watchlist.movie_id.in_(movie_ids))
+    removed = db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    logger.info("User %s removed %s of %s movies from the watchlist", user_id, removed, len(movie_ids))
+    return {"requested": len(movie_ids), "removed": removed}
+
+def list_watchlist(db: Session, user_id: int, size: int = 20, cursor: Optional[str] = None):
+    """
+    Newest entries first, one query joined with Movies
+    """
+    stmt = (
+        select(
+            Watchlist.id, Watchlist.movie_id, Watchlist.created_at.label("added_at"),
+            Movies.title, Movies.genre, Movies.language, Movies.release_year, Movies.poster_url, Movies.rating,
+        )
+        .join(Movies, Movies.id == Watchlist.movie_id)
+        .where(Watchlist.user_id == user_id)
+    )
+    if cursor:
+        last_id = decode_cursor(cursor).get("i")
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(Watchlist.id < last_id)
+    rows = db.execute(stmt.order_by(Watchlist.id.desc()).limit(size + 1)).all()
+    next_cursor = encode_cursor({"i": rows[size - 1].id}) if len(rows) > size else None
+    items = [dict(row._mapping) for row in rows[:size]]
+    return {"size": size, "items": items, "next_cursor": next_cursor}
+
+def watchlist_contains(db: Session, user_id: int, movie_ids: List[int]):
+    """
+    Membership of a page of movies in one indexed lookup
+    """
+    movie_ids = _unique(movie_ids)
+    present = set(db.scalars(
+        select(Watchlist.movie_id).where(Watchlist.user_id == user_id, Watchlist.movie_id.in_(movie_ids))
+    ).all())
+    return {"in_watchlist": {str(movie_id): movie_id in present for movie_id in movie_ids}}
@@ -1,17 +1,27 @@
 from fastapi import HTTPException, status, Request
+from starlette.concurrency import run_in_threadpool
 from app.core.logger import logger
+from app.core.profiling import profiled_call
 from functools import wraps 
 import inspect
 
+
+async def _call(func, *args, **kwargs):
+    # The wrappers are async, so FastAPI runs them on the event loop: plain def
+    # routes (blocking DB calls) go to the threadpool as they would undecorated,
+    # through profiled_call so a profiled request covers the worker too
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    result = await run_in_threadpool(profiled_call, func, *args, **kwargs)
+    return await result if inspect.isawaitable(result) else result
+
+
 def login_required(func):
     @wraps(func)
     async def wrapper(request: Request, *args, **kwargs):
         if not hasattr(request.state, "user"):
             raise HTTPException(status_code=401, detail="Authentication required here")
-        result = func(request, *args, **kwargs)
-        if inspect.isawaitable(result):
-            result = await result
-        return result
+        return await _call(func, request, *args, **kwargs)
     return wrapper
 
 
@@ -35,8 +45,7 @@ def admin_required(func):
 
         # Skip admin check for public routes
         if request.url.path in PUBLIC_ROUTES:
-            result = func(*args, **kwargs)
-            return await result if inspect.isawaitable(result) else result
+            return await _call(func, *args, **kwargs)
 
         # Check user
         user = getattr(request.state, "user", None)
@@ -51,7 +60,6 @@ def admin_required(func):
         logger.info(f"Admin '{user.username}' authorized successfully")
 
         # Call the actual route function (handles sync and async)
-        result = func(*args, **kwargs)
-        return await result if inspect.isawaitable(result) else result
+        return await _call(func, *args, **kwargs)
 
     return wrapper
\ No newline at end of file
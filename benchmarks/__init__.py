@@ -0,0 +1,3 @@
+"""
+In-process load tests for the API, run with `python -m benchmarks.run`
+"""
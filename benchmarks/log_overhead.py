@@ -0,0 +1,88 @@
+"""
+Per-call cost of AuthLogger on the calling thread:
+
+    python -m benchmarks.log_overhead                  # queue handler (current setup)
+    python -m benchmarks.log_overhead --mode direct    # handlers called inline, as before the queue
+
+Runs in a temporary directory, so logs/auth.log of the checkout is not
+touched; the console handler is silenced. Calls are timed in batches smaller
+than the queue and the queue is drained between batches, so no record is
+dropped and the numbers are the enqueue path, not the drop path.
+"""
+import argparse
+import atexit
+import os
+import sys
+import tempfile
+import time
+
+
+class _Row:
+    # stands in for an ORM instance logged through %s
+    def __init__(self, row_id: int):
+        self.row_id = row_id
+
+    def __str__(self):
+        return f"<Row {self.row_id}>"
+
+
+def _cases(logger):
+    row = _Row(7)
+    return {
+        "info(dict)": lambda: logger.info({"message": "Review created", "review_id": 42, "user_id": 7}),
+        "info(%s args)": lambda: logger.info("Review %s created by user %s for %s", 42, 7, row),
+        "info(callable)": lambda: logger.info(lambda: {"message": "Lazy fields", "row": row}),
+        "debug disabled": lambda: logger.debug("Not emitted %s", row),
+    }
+
+
+def _time(call, calls: int, batch: int, drain) -> float:
+    elapsed = 0.0
+    done = 0
+    while done < calls:
+        n = min(batch, calls - done)
+        started = time.perf_counter()
+        for _ in range(n):
+            call()
+        elapsed += time.perf_counter() - started
+        done += n
+        drain()
+    return elapsed / calls * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.log_overhead")
+    parser.add_argument("--mode", choices=["queue", "direct"], default="queue")
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=1000, help="Calls between queue drains (below LOG_QUEUE_SIZE)")
+    args = parser.parse_args(argv)
+
+    # logs/ is created relative to the working directory; the TemporaryDirectory
+    # is removed at exit, after the listener has flushed
+    workdir = tempfile.TemporaryDirectory(prefix="movie-logbench-")
+    os.chdir(workdir.name)
+    # debug is the level under test for the disabled case
+    os.environ["LOG_LEVEL"] = "INFO"
+    os.environ.setdefault("LOG_QUEUE_SIZE", str(max(args.batch * 2, 10000)))
+    import logging
+    from app.core import logger as log
+
+    log.console_handler.setLevel(logging.CRITICAL)
+    drain = log.log_queue.join
+    if args.mode == "direct":
+        log.listener.stop()
+        atexit.unregister(log.listener.stop)
+        log.logger.removeHandler(log.queue_handler)
+        log.logger.addHandler(log.console_handler)
+        log.logger.addHandler(log.file_handler)
+        drain = lambda: None
+
+    print(f"{'case':<18}{'us/call':>10}   ({args.mode}, {args.calls} calls)")
+    for name, call in _cases(log.logger).items():
+        print(f"{name:<18}{_time(call, args.calls, args.batch, drain):>10.2f}")
+    if args.mode == "queue":
+        print(f"dropped: {log.queue_handler.dropped}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
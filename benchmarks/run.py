@@ -0,0 +1,257 @@
+"""
+Runs the API in-process against a freshly seeded SQLite database and drives
+concurrent scenarios through an ASGI client (no network, no server):
+
+    python -m benchmarks.run                                   # all scenarios
+    python -m benchmarks.run -s deep_page -s like --concurrency 64
+    python -m benchmarks.run --save-baseline                   # record benchmarks/baselines/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baselines/baseline.json --threshold 0.15
+    python -m benchmarks.run -s availability_batch --availability-rows 1000000   # large where-to-watch table
+
+Reports p50/p95/p99 latency and req/s per scenario. With a baseline, exits
+with status 1 when a scenario's p95 grew or its req/s dropped by more than
+--threshold, or when any request failed. Baselines are only comparable on
+the same machine and with the same seed sizes, which are stored in the file.
+
+The review listing cache is disabled unless --review-cache is given, so
+deep_page measures list_reviews_by_movie rather than cache hits. Request
+metrics are on, as in production; compare with --no-metrics for their overhead:
+
+    python -m benchmarks.run -s auth_me -s deep_page --output with.json
+    python -m benchmarks.run -s auth_me -s deep_page --no-metrics --baseline with.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+DEFAULT_BASELINE = BASELINE_DIR / "baseline.json"
+
+
+def _configure_environment(args, db_path: str):
+    # read by app.core.settings at import time, so set before importing the app
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["USE_ASYNC_DB"] = "1" if args.async_db else "0"
+    os.environ["METRICS_ENABLED"] = "1" if args.metrics else "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SENTIMENT_RESCORE_ON_STARTUP", "false")
+    # the availability scenarios build their index during their unmeasured warm-up requests
+    os.environ.setdefault("STARTUP_WARM_CACHES", "false")
+    # every simulated client shares one address, the per-IP limits would reject most requests
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("DB_POOL_SIZE", str(args.concurrency))
+    if not args.review_cache:
+        os.environ["REVIEW_CACHE_TTL"] = "0"
+
+
+def _percentile(ordered, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+async def run_scenario(client, scenario, ctx, requests: int, concurrency: int, warmup: int):
+    for i in range(warmup):
+        await scenario.call(client, ctx, i)
+
+    latencies = []
+    statuses = Counter()
+    numbers = itertools.count(warmup)
+    last = warmup + requests
+
+    async def worker():
+        for i in numbers:
+            if i >= last:
+                return
+            start = time.perf_counter()
+            response = await scenario.call(client, ctx, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for code, count in statuses.items() if code >= 400)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float):
+    """
+    Regressions of report against baseline, as readable lines
+    """
+    problems = []
+    for name, result in report["scenarios"].items():
+        if result["errors"]:
+            problems.append(f"{name}: {result['errors']} failed requests {result['statuses']}")
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {base['p95_ms']}ms "
+                f"(+{(result['p95_ms'] / base['p95_ms'] - 1) * 100:.0f}%)")
+        if base["rps"] and result["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"{name}: {result['rps']} req/s vs baseline {base['rps']} req/s "
+                f"(-{(1 - result['rps'] / base['rps']) * 100:.0f}%)")
+    if baseline.get("seed") and baseline["seed"] != report["seed"]:
+        problems.append(f"seed sizes differ from the baseline ({baseline['seed']}), numbers are not comparable")
+    return problems
+
+
+def _print_table(report: dict, baseline: dict):
+    print(f"{'scenario':<20}{'req':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'p95 vs base':>13}")
+    for name, r in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name) if baseline else None
+        delta = f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base["p95_ms"] else "-"
+        print(f"{name:<20}{r['requests']:>7}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}{delta:>13}")
+
+
+async def _run(args, scenario_names):
+    import httpx
+    from app.main import app
+    from app.core.security import JWTManager
+    from app.db import session
+    from app.db.schema import create_schema
+    from app.db.session import SessionLocal, get_engine
+    from benchmarks.scenarios import SCENARIOS, Context
+    from benchmarks.seed import seed
+
+    started = time.perf_counter()
+    create_schema(get_engine())
+    db = SessionLocal()
+    try:
+        fixture = seed(db, users=args.users, movies=args.movies, reviews_per_user=args.reviews_per_user,
+            availability_rows=args.availability_rows)
+    finally:
+        db.close()
+    print(f"Seeded {len(fixture.user_ids)} users, {args.movies} movies, {fixture.reviews} reviews, "
+        f"{fixture.availability_rows} availability rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    tokens = [JWTManager.create_jwt({"user_id": user_id, "role": "user", "jti": uuid.uuid4().hex})
+        for user_id in fixture.user_ids]
+    ctx = Context(fixture=fixture, tokens=tokens, page_size=args.page_size)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in scenario_names:
+                scenario = SCENARIOS[name]
+                requests = args.requests or scenario.requests
+                if scenario.capacity is not None:
+                    requests = min(requests, scenario.capacity(ctx) - args.warmup)
+                results[name] = await run_scenario(client, scenario, ctx, requests, args.concurrency, args.warmup)
+                print(f"{name}: {results[name]['rps']} req/s, p95 {results[name]['p95_ms']}ms", file=sys.stderr)
+    if session.async_engine is not None:
+        # pooled aiosqlite connections each hold a non-daemon thread
+        await session.async_engine.dispose()
+    return results
+
+
+def build_parser():
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these (repeatable)")
+    parser.add_argument("--requests", type=int, help="Requests per scenario (default: per scenario)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--movies", type=int, default=500)
+    parser.add_argument("--reviews-per-user", type=int, default=25)
+    parser.add_argument("--availability-rows", type=int, default=20000,
+        help="Where-to-watch windows to seed; use 1000000 or more for a large table")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--async-db", action="store_true", help="Serve the hot routes from the async engine")
+    parser.add_argument("--review-cache", action="store_true", help="Keep the review listing cache enabled")
+    parser.add_argument("--metrics", action=argparse.BooleanOptionalAction, default=True,
+        help="Request/SQL metrics (METRICS_ENABLED); --no-metrics measures without them")
+    parser.add_argument("--db", help="SQLite file to create (default: a temporary file)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Compare against this report (default: benchmarks/baselines/baseline.json if it exists)")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression (0.25 = 25%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from benchmarks.scenarios import SCENARIOS
+
+    scenario_names = args.scenario or list(SCENARIOS)
+    workdir = None
+    if args.db:
+        db_path = os.path.abspath(args.db)
+        if os.path.exists(db_path):
+            sys.exit(f"{db_path} already exists, the benchmark seeds a new database")
+    else:
+        workdir = tempfile.TemporaryDirectory(prefix="movie-bench-")
+        db_path = os.path.join(workdir.name, "bench.db")
+    _configure_environment(args, db_path)
+
+    try:
+        results = asyncio.run(_run(args, scenario_names))
+    finally:
+        if workdir is not None:
+            workdir.cleanup()
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "async_db": args.async_db,
+        "review_cache": args.review_cache,
+        "metrics": args.metrics,
+        "seed": {"users": args.users, "movies": args.movies, "reviews_per_user": args.reviews_per_user,
+            "availability_rows": args.availability_rows},
+        "scenarios": results,
+    }
+
+    baseline_path = args.baseline or (str(DEFAULT_BASELINE) if DEFAULT_BASELINE.exists() and not args.save_baseline else None)
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_table(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    problems = compare(report, baseline, args.threshold)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
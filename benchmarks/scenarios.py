@@ -0,0 +1,110 @@
+"""
+Benchmark scenarios. Each one is an async callable taking (client, ctx, i)
+where i is the request number; request numbers are unique across a run, so
+scenarios that need a fresh (user, review) or (user, movie) pair derive it from i.
+"""
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from benchmarks.seed import Fixture, PASSWORD
+
+
+@dataclass
+class Context:
+    fixture: Fixture
+    tokens: List[str]
+    page_size: int = 20
+
+    def auth(self, i: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[i % len(self.tokens)]}"}
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    requests: int
+    call: Callable[[httpx.AsyncClient, Context, int], Awaitable[httpx.Response]]
+    # largest request number the scenario can serve without reusing a pair
+    capacity: Optional[Callable[[Context], int]] = None
+
+
+async def login_burst(client: httpx.AsyncClient, ctx: Context, i: int):
+    n = i % len(ctx.fixture.user_ids)
+    return await client.post("/auth/login", json={"email": f"bench{n}@example.com", "password": PASSWORD})
+
+
+async def auth_me(client: httpx.AsyncClient, ctx: Context, i: int):
+    # the route does no work of its own: this is JWTAuthMiddleware (and the
+    # middleware stack around it). 16 users, so the warm-up fills the principal cache
+    return await client.get("/auth/me", headers=ctx.auth(i % 16))
+
+
+async def deep_page(client: httpx.AsyncClient, ctx: Context, i: int):
+    # a random page in the deepest half of the deep movie's reviews
+    pages = max(1, len(ctx.fixture.deep_review_ids) // ctx.page_size)
+    page = random.Random(i).randint(pages // 2 + 1, pages)
+    return await client.get(f"/user/reviews/by-movie/{ctx.fixture.deep_movie_id}",
+        params={"page": page, "size": ctx.page_size}, headers=ctx.auth(i))
+
+
+async def hot_review_create(client: httpx.AsyncClient, ctx: Context, i: int):
+    # every request is a different user reviewing the same movie
+    return await client.post("/user/reviews", headers=ctx.auth(i),
+        json={"movie_id": ctx.fixture.hot_movie_id, "rating": i % 11, "comment": f"benchmark review {i}"})
+
+
+async def like(client: httpx.AsyncClient, ctx: Context, i: int):
+    # user i % U likes review i // U: each (review, user) pair once, hottest reviews first
+    users = len(ctx.tokens)
+    review_id = ctx.fixture.deep_review_ids[(i // users) % len(ctx.fixture.deep_review_ids)]
+    return await client.post(f"/user/reviews/{review_id}/like", headers=ctx.auth(i))
+
+
+async def watchlist(client: httpx.AsyncClient, ctx: Context, i: int):
+    # per user: add a few movies, then check membership and read the first page
+    movies = ctx.fixture.movie_ids
+    picked = [movies[(i + k * 7) % len(movies)] for k in range(5)]
+    step = (i // len(ctx.tokens)) % 3
+    if step == 0:
+        return await client.post("/user/watchlist", headers=ctx.auth(i), json={"movie_ids": picked})
+    if step == 1:
+        return await client.get("/user/watchlist/contains", params={"movieIds": picked}, headers=ctx.auth(i))
+    return await client.get("/user/watchlist", params={"size": ctx.page_size}, headers=ctx.auth(i))
+
+
+async def availability_batch(client: httpx.AsyncClient, ctx: Context, i: int):
+    # where to watch a page of movies, as a listing page would ask
+    movies = ctx.fixture.movie_ids
+    start = (i * ctx.page_size) % len(movies)
+    page = [movies[(start + k) % len(movies)] for k in range(ctx.page_size)]
+    region = ctx.fixture.region_codes[i % len(ctx.fixture.region_codes)]
+    return await client.get("/availability/movies", params={"region": region, "movieIds": page}, headers=ctx.auth(i))
+
+
+async def availability_platform(client: httpx.AsyncClient, ctx: Context, i: int):
+    # what is on a platform over the next week, first page
+    region = ctx.fixture.region_codes[i % len(ctx.fixture.region_codes)]
+    platform_id = ctx.fixture.platform_ids[(i // len(ctx.fixture.region_codes)) % len(ctx.fixture.platform_ids)]
+    return await client.get(f"/availability/platforms/{platform_id}", params={"region": region, "days": 7,
+        "size": ctx.page_size}, headers=ctx.auth(i))
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s for s in (
+        Scenario("login_burst", "POST /auth/login with valid credentials (password KDF bound)", 100, login_burst),
+        Scenario("auth_me", "GET /auth/me, authentication middleware overhead", 3000, auth_me),
+        Scenario("deep_page", "GET /user/reviews/by-movie/{id} at pages in the deepest half", 2000, deep_page),
+        Scenario("hot_review_create", "POST /user/reviews, many users reviewing one movie", 1000, hot_review_create,
+            capacity=lambda ctx: len(ctx.tokens)),
+        Scenario("like", "POST /user/reviews/{id}/like on the deep movie's reviews", 2000, like,
+            capacity=lambda ctx: len(ctx.tokens) * len(ctx.fixture.deep_review_ids)),
+        Scenario("watchlist", "POST /user/watchlist, GET /user/watchlist/contains and GET /user/watchlist", 3000,
+            watchlist),
+        Scenario("availability_batch", "GET /availability/movies for a page of movies (--availability-rows)", 2000,
+            availability_batch),
+        Scenario("availability_platform", "GET /availability/platforms/{id} for the next week (--availability-rows)",
+            2000, availability_platform),
+    )
+}
@@ -0,0 +1,121 @@
+"""
+Seeds the benchmark database: one admin, `users` regular users, `movies`
+movies and about `reviews_per_user` reviews per user. Two movies are special:
+- the deep movie is reviewed by every user, for listing at deep pages;
+- the hot movie starts with no reviews and is the target of the create scenario.
+Plus `availability_rows` where-to-watch windows spread over the movies, a few
+regions and platforms, starting within a year either side of today.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List
+from sqlalchemy import insert, select, text
+
+PASSWORD = "Bench@12345"
+GENRES = ["Drama", "Comedy", "Action", "Thriller", "Romance", "Sci-Fi", "Horror", "Documentary"]
+LANGUAGES = ["English", "Hindi", "Telugu", "Tamil", "French", "Spanish"]
+REGIONS = ["US", "IN", "GB", "FR", "DE", "JP"]
+PLATFORMS = ["StreamOne", "FlixBox", "CinemaNow", "PrimeView", "HotReel", "Popcorn+", "ReelTime", "ScreenHub"]
+AVAILABILITY_TYPES = ["stream", "rent", "buy"]
+WORDS = ["great", "boring", "brilliant", "slow", "fun", "awful", "moving", "predictable", "excellent", "weak"]
+
+
+@dataclass
+class Fixture:
+    user_ids: List[int] = field(default_factory=list)
+    movie_ids: List[int] = field(default_factory=list)
+    deep_movie_id: int = 0
+    hot_movie_id: int = 0
+    deep_review_ids: List[int] = field(default_factory=list)
+    reviews: int = 0
+    region_codes: List[str] = field(default_factory=list)
+    platform_ids: List[int] = field(default_factory=list)
+    availability_rows: int = 0
+
+
+def _comment(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+
+
+def _seed_availability(db, rng: random.Random, movie_ids: List[int], rows: int, chunk_size: int):
+    from app.models.user import MovieAvailability, Platforms, Regions
+
+    conn = db.connection()
+    conn.execute(insert(Regions), [{"name": code, "code": code} for code in REGIONS])
+    conn.execute(insert(Platforms), [{"name": name, "type": "streaming"} for name in PLATFORMS])
+    region_ids = list(db.scalars(select(Regions.id).order_by(Regions.id)))
+    platform_ids = list(db.scalars(select(Platforms.id).order_by(Platforms.id)))
+    today = date.today().toordinal()
+    batch = []
+    for n in range(rows):
+        start = today + rng.randint(-365, 365)
+        # about one in five windows is open ended
+        end = None if rng.random() < 0.2 else date.fromordinal(start + rng.randint(7, 180))
+        batch.append({"movie_id": movie_ids[n % len(movie_ids)], "platform_id": rng.choice(platform_ids),
+            "region_id": rng.choice(region_ids), "availability_type": rng.choice(AVAILABILITY_TYPES),
+            "start_date": date.fromordinal(start), "end_date": end, "url": f"https://example.com/watch/{n}"})
+        if len(batch) >= chunk_size:
+            conn.execute(insert(MovieAvailability), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(MovieAvailability), batch)
+    db.commit()
+    return platform_ids
+
+
+def seed(db, users: int, movies: int, reviews_per_user: int, availability_rows: int = 0, chunk_size: int = 5000,
+    rng_seed: int = 7) -> Fixture:
+    # the app is imported late: benchmarks.run configures its settings first
+    from app.core.hashing import hash_password
+    from app.models.user import User, Movies, Reviews
+    from app.services.user_reviews import rebuild_movie_rating_aggregates
+
+    rng = random.Random(rng_seed)
+    # hashing is the expensive part of creating users, every user shares one hash
+    hashed = hash_password(PASSWORD)
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        # readers do not block the writer (review creation and likes run concurrently)
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+
+    conn.execute(insert(User), [{"username": "bench_admin", "email": "bench_admin@example.com",
+        "password": hashed, "role": "admin", "status": "active"}])
+    conn.execute(insert(User), [
+        {"username": f"bench{i}", "email": f"bench{i}@example.com", "password": hashed, "role": "user", "status": "active"}
+        for i in range(users)
+    ])
+    admin_id = db.scalar(select(User.id).where(User.email == "bench_admin@example.com"))
+    user_ids = list(db.scalars(select(User.id).where(User.role == "user").order_by(User.id)))
+
+    conn.execute(insert(Movies), [
+        {"title": f"Benchmark movie {i}", "description": _comment(rng), "genre": rng.choice(GENRES),
+            "language": rng.choice(LANGUAGES), "release_year": rng.randint(1970, 2025), "approved": True,
+            "created_by": admin_id}
+        for i in range(movies)
+    ])
+    movie_ids = list(db.scalars(select(Movies.id).order_by(Movies.id)))
+    deep_movie_id, hot_movie_id, others = movie_ids[0], movie_ids[1], movie_ids[2:]
+
+    start = datetime.utcnow() - timedelta(days=365)
+    batch = []
+    total = 0
+    for user_id in user_ids:
+        picked = [deep_movie_id] + rng.sample(others, min(reviews_per_user, len(others)))
+        for movie_id in picked:
+            total += 1
+            batch.append({"movie_id": movie_id, "user_id": user_id, "rating": float(rng.randint(0, 10)),
+                "comment": _comment(rng), "like_count": 0, "created_at": start + timedelta(seconds=37 * total)})
+        if len(batch) >= chunk_size:
+            conn.execute(insert(Reviews), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(Reviews), batch)
+    db.commit()
+    rebuild_movie_rating_aggregates(db)
+
+    deep_review_ids = list(db.scalars(select(Reviews.id).where(Reviews.movie_id == deep_movie_id).order_by(Reviews.id)))
+    platform_ids = _seed_availability(db, rng, movie_ids, availability_rows, chunk_size) if availability_rows else []
+    return Fixture(user_ids=user_ids, movie_ids=movie_ids, deep_movie_id=deep_movie_id, hot_movie_id=hot_movie_id,
+        deep_review_ids=deep_review_ids, reviews=total, region_codes=list(REGIONS) if availability_rows else [],
+        platform_ids=platform_ids, availability_rows=availability_rows)
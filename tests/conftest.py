@@ -0,0 +1,54 @@
+"""
+Tests run against SQLite files, never the configured MySQL database. The
+settings are read when app.core.settings is imported, so the environment is
+set here, before any test module imports the app.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="movie-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("SENTIMENT_RESCORE_ON_STARTUP", "false")
+os.environ.setdefault("STARTUP_WARM_CACHES", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("PROFILING_ENABLED", "false")
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from app.db.schema import create_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_connection, _):
+        # readers do not block the writer while the threads of a test run concurrently
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    create_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture(scope="session")
+def app_session_factory():
+    """
+    SessionLocal of the app itself (DATABASE_URL above), for code that opens
+    its own sessions: the like_count flush, the audit writer, the routes
+    """
+    from app.db.schema import create_schema
+    from app.db.session import SessionLocal, get_engine
+
+    create_schema(get_engine())
+    return SessionLocal
@@ -0,0 +1,101 @@
+import uuid
+from collections import Counter
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+from app.db.session import get_async_db, get_db
+from app.models.user import Movies, Reviews, User, UserActivityLogs
+from app.services.audit import audit_sink
+
+
+def _sync_app():
+    from app.main import create_app
+
+    return create_app()
+
+
+def _async_app():
+    # the USE_ASYNC_DB routes, with the sync register route they fall back to
+    from app.api.v1 import auth, auth_async, reviews_async
+    from app.middleware.auth_middleware import JWTAuthMiddleware
+
+    app = FastAPI()
+    app.include_router(auth_async.router)
+    app.include_router(reviews_async.router)
+    app.include_router(auth.router)
+    app.add_middleware(JWTAuthMiddleware)
+    return app
+
+
+@pytest.fixture
+def request_commits():
+    """
+    Commits per route on the sessions handed to the routes, keyed by path
+    """
+    commits = Counter()
+
+    def _count(session):
+        path = session.info.get("request_path")
+        if path is not None:
+            commits[path] += 1
+
+    event.listen(Session, "after_commit", _count)
+    yield commits
+    event.remove(Session, "after_commit", _count)
+
+
+def _tag_sessions(app):
+    def tagged_db(request: Request):
+        for db in get_db(request):
+            db.info["request_path"] = request.url.path
+            yield db
+
+    async def tagged_async_db(request: Request):
+        async for db in get_async_db(request):
+            db.info["request_path"] = request.url.path
+            yield db
+
+    app.dependency_overrides[get_db] = tagged_db
+    app.dependency_overrides[get_async_db] = tagged_async_db
+
+
+@pytest.mark.parametrize("make_app", [_sync_app, _async_app], ids=["sync", "async"])
+def test_audit_events_add_no_commit_and_are_written_in_batches(app_session_factory, request_commits, make_app):
+    from app.core.revocation import load_denylist
+
+    load_denylist()
+    db = app_session_factory()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        author = db.execute(insert(User).values(username=f"{tag}-a", email=f"{tag}-a@example.com",
+            password="x")).inserted_primary_key[0]
+        movie_id = db.execute(insert(Movies).values(title=tag, created_by=author)).inserted_primary_key[0]
+        other_movie_id = db.execute(insert(Movies).values(title=f"{tag}-2", created_by=author)).inserted_primary_key[0]
+        review_id = db.execute(insert(Reviews).values(movie_id=movie_id, user_id=author, rating=6.0)).inserted_primary_key[0]
+        db.commit()
+
+        app = make_app()
+        _tag_sessions(app)
+        email = f"{tag}@example.com"
+        with TestClient(app) as client:
+            assert client.post("/auth/register", json={"username": tag, "email": email,
+                "password": "Secret@123"}).status_code == 200
+            login = client.post("/auth/login", json={"email": email, "password": "Secret@123"})
+            assert login.status_code == 200
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            assert client.post("/user/reviews", headers=headers,
+                json={"movie_id": other_movie_id, "rating": 8, "comment": "fine"}).status_code == 201
+            assert client.post(f"/user/reviews/{review_id}/like", headers=headers).status_code == 200
+
+        # one commit each, the route's own write: the audit events add none
+        assert request_commits == {"/auth/register": 1, "/auth/login": 1, "/user/reviews": 1,
+            f"/user/reviews/{review_id}/like": 1}
+
+        audit_sink.stop()
+        user_id = db.scalar(select(User.id).where(User.email == email))
+        actions = sorted(db.scalars(select(UserActivityLogs.action_type).where(UserActivityLogs.user_id == user_id)))
+        assert actions == ["login", "register", "review_create", "review_like"]
+    finally:
+        db.close()
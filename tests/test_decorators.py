@@ -0,0 +1,36 @@
+import threading
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.utils.decorators import login_required
+
+
+def _app():
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def authenticate(request: Request, call_next):
+        request.state.user = object()
+        return await call_next(request)
+
+    @app.get("/sync")
+    @login_required
+    def sync_route(request: Request):
+        return {"thread": threading.get_ident()}
+
+    @app.get("/async")
+    @login_required
+    async def async_route(request: Request):
+        return {"thread": threading.get_ident()}
+
+    @app.get("/loop")
+    async def loop_thread():
+        return {"thread": threading.get_ident()}
+
+    return app
+
+
+def test_login_required_runs_sync_routes_off_the_event_loop():
+    with TestClient(_app()) as client:
+        loop = client.get("/loop").json()["thread"]
+        assert client.get("/async").json()["thread"] == loop
+        assert client.get("/sync").json()["thread"] != loop
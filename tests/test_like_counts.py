@@ -0,0 +1,54 @@
+import uuid
+from sqlalchemy import insert, select
+from app.models.user import Movies, Reviews, User
+from app.services.like_buffer import like_buffer
+from app.services.user_reviews import like_review, reconcile_like_counts, unlike_review
+
+
+def _seed_review(db, likers: int):
+    tag = uuid.uuid4().hex[:8]
+    db.execute(insert(User), [{"username": f"{tag}-{i}", "email": f"{tag}-{i}@example.com", "password": "x"}
+        for i in range(likers + 1)])
+    user_ids = list(db.scalars(select(User.id).where(User.username.like(f"{tag}-%")).order_by(User.id)))
+    movie_id = db.execute(insert(Movies).values(title=tag, created_by=user_ids[0])).inserted_primary_key[0]
+    review_id = db.execute(insert(Reviews).values(movie_id=movie_id, user_id=user_ids[0], rating=7.0)).inserted_primary_key[0]
+    db.commit()
+    return review_id, user_ids[1:]
+
+
+def _stored_count(db, review_id):
+    db.expire_all()
+    return db.scalar(select(Reviews.like_count).where(Reviews.id == review_id))
+
+
+def test_like_responses_keep_like_count(app_session_factory):
+    db = app_session_factory()
+    try:
+        review_id, likers = _seed_review(db, 2)
+        assert like_review(db, review_id, likers[0])["like_count"] == 1
+        again = like_review(db, review_id, likers[0])
+        assert again == {"message": "Already liked", "like_count": 1}
+        assert like_review(db, review_id, likers[1])["like_count"] == 2
+        assert unlike_review(db, review_id, likers[0])["like_count"] == 1
+    finally:
+        db.close()
+
+
+def test_reconcile_while_deltas_are_pending_does_not_double_count(app_session_factory):
+    db = app_session_factory()
+    try:
+        review_id, likers = _seed_review(db, 3)
+        for user_id in likers:
+            like_review(db, review_id, user_id)
+        # as when reconcile-likes runs from the CLI while a worker still buffers deltas
+        reconcile_like_counts(db, review_ids=[review_id])
+        assert _stored_count(db, review_id) == 3
+        like_buffer.flush()
+        assert _stored_count(db, review_id) == 3
+
+        unlike_review(db, review_id, likers[0])
+        like_buffer.flush()
+        like_buffer.flush()
+        assert _stored_count(db, review_id) == 2
+    finally:
+        db.close()
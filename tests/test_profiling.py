@@ -0,0 +1,46 @@
+import json
+import time
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.profiling import RequestProfiler
+from app.middleware import profiling_middleware
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.utils.decorators import login_required
+
+
+def _busy_work():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _app():
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def authenticate(request: Request, call_next):
+        request.state.user = object()
+        return await call_next(request)
+
+    @app.get("/slow")
+    @login_required
+    def slow_route(request: Request):
+        _busy_work()
+        return {}
+
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_capture_covers_sync_routes_run_in_the_threadpool(monkeypatch, tmp_path, mode):
+    profiler = RequestProfiler(directory=str(tmp_path), max_captures=5, header="X-Profile",
+        sample_rates="/slow=1", mode=mode)
+    monkeypatch.setattr(profiling_middleware, "request_profiler", profiler)
+    with TestClient(_app()) as client:
+        name = client.get("/slow").headers["X-Profile-Id"]
+    with open(tmp_path / f"{name}.json", encoding="utf-8") as f:
+        record = json.load(f)
+    assert record["mode"] == mode
+    assert "_busy_work" in "\n".join(record["summary"])
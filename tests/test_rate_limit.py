@@ -0,0 +1,69 @@
+import dataclasses
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.ratelimit import RateLimiter, parse_rate_limits
+from app.core.settings import settings
+from app.middleware import rate_limit_middleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+
+
+def _limiter(rules: str) -> RateLimiter:
+    return RateLimiter(rules=parse_rate_limits(rules), backend_name="memory", max_keys=1000, sqlite_path="")
+
+
+def test_rejection_refunds_the_tokens_of_earlier_limits():
+    limiter = _limiter("POST /a=ip:10/60|user:1/60")
+    limits = limiter.rules[("POST", "/a")]
+    assert limiter.check("POST /a", limits, "10.0.0.1", 1) is None
+    assert limiter.check("POST /a", limits, "10.0.0.1", 1)[1] == "user"
+    # one token for the allowed request, none for the rejected one
+    assert round(limiter.backend._buckets["POST /a|0|10.0.0.1"][0]) == 9
+
+
+def _app(monkeypatch, rules: str, **overrides):
+    monkeypatch.setattr(rate_limit_middleware, "rate_limiter", _limiter(rules))
+    monkeypatch.setattr(rate_limit_middleware, "settings", dataclasses.replace(settings, **overrides))
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login(request: Request):
+        return {"body": (await request.json())["email"]}
+
+    app.add_middleware(RateLimitMiddleware)
+    return app
+
+
+def test_login_attempts_are_limited_per_email(monkeypatch):
+    with TestClient(_app(monkeypatch, "POST /auth/login=ip:100/60|email:2/60")) as client:
+        for _ in range(2):
+            response = client.post("/auth/login", json={"email": "Victim@example.com", "password": "x"})
+            # the body still reaches the route after the middleware read it
+            assert response.json() == {"body": "Victim@example.com"}
+        assert client.post("/auth/login", json={"email": "victim@example.com ", "password": "x"}).status_code == 429
+        assert client.post("/auth/login", json={"email": "other@example.com", "password": "x"}).status_code == 200
+
+
+def test_oversized_login_bodies_are_rejected_before_any_bucket(monkeypatch):
+    app = _app(monkeypatch, "POST /auth/login=ip:1/60|email:1/60", rate_limit_max_body_bytes=64)
+    with TestClient(app) as client:
+        payload = {"email": "a@example.com", "password": "x" * 100}
+        assert client.post("/auth/login", json=payload).status_code == 413
+        # chunked, without a Content-Length to check up front
+        chunks = iter([b'{"email": "a@example.com", ', b'"password": "' + b"x" * 100 + b'"}'])
+        assert client.post("/auth/login", content=chunks,
+            headers={"Content-Type": "application/json"}).status_code == 413
+        # nothing was charged for them
+        assert client.post("/auth/login", json={"email": "a@example.com"}).status_code == 200
+
+
+def test_forwarded_address_is_taken_from_the_trusted_proxy(monkeypatch):
+    app = _app(monkeypatch, "POST /auth/login=ip:1/60", rate_limit_trust_forwarded=True, rate_limit_trusted_proxies=1)
+    with TestClient(app) as client:
+        def login(forwarded):
+            return client.post("/auth/login", json={"email": "a@example.com"},
+                headers={"X-Forwarded-For": forwarded}).status_code
+
+        assert login("1.1.1.1, 203.0.113.7") == 200
+        # a spoofed leftmost entry does not give the same client a new bucket
+        assert login("2.2.2.2, 203.0.113.7") == 429
+        assert login("1.1.1.1, 203.0.113.8") == 200
@@ -0,0 +1,104 @@
+import random
+import threading
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select
+from app.models.user import Movies, Reviews, User
+from app.services.user_reviews import add_review, delete_review, rebuild_movie_rating_aggregates, update_review
+
+USERS = 12
+MOVIES = 3
+OPERATIONS = 60
+
+
+def _seed(session_factory):
+    db = session_factory()
+    try:
+        db.execute(insert(User), [{"username": f"u{i}", "email": f"u{i}@example.com", "password": "x"}
+            for i in range(USERS)])
+        user_ids = list(db.scalars(select(User.id).order_by(User.id)))
+        db.execute(insert(Movies), [{"title": f"movie {i}", "created_by": user_ids[0]} for i in range(MOVIES)])
+        db.commit()
+        return user_ids, list(db.scalars(select(Movies.id).order_by(Movies.id)))
+    finally:
+        db.close()
+
+
+def _rescan(db):
+    """
+    movie_id -> (sum, count, avg) straight from Reviews
+    """
+    rows = db.execute(
+        select(Reviews.movie_id, func.sum(Reviews.rating), func.count(Reviews.rating), func.avg(Reviews.rating))
+        .group_by(Reviews.movie_id)
+    ).all()
+    return {movie_id: (total or 0.0, count, avg or 0.0) for movie_id, total, count, avg in rows}
+
+
+def _assert_aggregates_match(db, movie_ids):
+    expected = _rescan(db)
+    for movie in db.scalars(select(Movies).where(Movies.id.in_(movie_ids))):
+        total, count, avg = expected.get(movie.id, (0.0, 0, 0.0))
+        assert movie.rating_count == count
+        assert movie.rating_sum == pytest.approx(total)
+        assert movie.rating == pytest.approx(avg)
+
+
+def _churn(session_factory, user_id, movie_ids, seed, errors):
+    # one user creating, rerating and deleting reviews of the shared movies
+    rng = random.Random(seed)
+    db = session_factory()
+    reviews = {}
+    try:
+        for _ in range(OPERATIONS):
+            movie_id = rng.choice(movie_ids)
+            review_id = reviews.get(movie_id)
+            try:
+                if review_id is None:
+                    reviews[movie_id] = add_review(db, user_id, movie_id, rng.randint(0, 10), "good fun").id
+                elif rng.random() < 0.6:
+                    update_review(db, review_id, user_id, rng.randint(0, 10), None)
+                else:
+                    delete_review(db, review_id, user_id)
+                    del reviews[movie_id]
+            except HTTPException:
+                db.rollback()
+    except Exception as e:
+        errors.append(e)
+    finally:
+        db.close()
+
+
+def test_concurrent_review_writes_keep_aggregates_exact(session_factory):
+    user_ids, movie_ids = _seed(session_factory)
+    errors = []
+    threads = [threading.Thread(target=_churn, args=(session_factory, user_id, movie_ids, n, errors))
+        for n, user_id in enumerate(user_ids)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    db = session_factory()
+    try:
+        assert db.scalar(select(func.count()).select_from(Reviews)) > 0
+        _assert_aggregates_match(db, movie_ids)
+    finally:
+        db.close()
+
+
+def test_rebuild_repairs_drifted_aggregates(session_factory):
+    user_ids, movie_ids = _seed(session_factory)
+    db = session_factory()
+    try:
+        for user_id in user_ids:
+            add_review(db, user_id, movie_ids[0], user_id % 11, "")
+        db.execute(Movies.__table__.update().values(rating=1.0, rating_sum=3.0, rating_count=99))
+        db.commit()
+
+        assert rebuild_movie_rating_aggregates(db) == 1
+        db.expire_all()
+        _assert_aggregates_match(db, movie_ids)
+    finally:
+        db.close()
@@ -0,0 +1,51 @@
+from sqlalchemy import func, insert, select, text, update
+from app.models.user import Movies, Recommendation, Reviews, User
+from app.services.recommender import run_recommender
+from app.services.user_reviews import delete_review
+
+USERS = 6
+MOVIES = 5
+
+
+def _seed(db):
+    db.execute(insert(User), [{"username": f"u{i}", "email": f"u{i}@example.com", "password": "x"}
+        for i in range(USERS)])
+    user_ids = list(db.scalars(select(User.id).order_by(User.id)))
+    db.execute(insert(Movies), [{"title": f"movie {i}", "created_by": user_ids[0]} for i in range(MOVIES)])
+    movie_ids = list(db.scalars(select(Movies.id).order_by(Movies.id)))
+    # everyone skips one movie, so there is something left to recommend
+    db.execute(insert(Reviews), [{"user_id": user_id, "movie_id": movie_id, "rating": float((u * 3 + m * 7) % 10 + 1)}
+        for u, user_id in enumerate(user_ids) for m, movie_id in enumerate(movie_ids) if m != u % MOVIES])
+    # well before the deletions below; runs re-read ties with their watermark,
+    # so only the user holding the newest review is recomputed on every run
+    db.execute(update(Reviews).values(updated_at=text("'2026-01-01 00:00:00'")))
+    db.execute(update(Reviews).where(Reviews.user_id == user_ids[-1]).values(updated_at=text("'2026-01-02 00:00:00'")))
+    db.commit()
+    return user_ids
+
+
+def _recommendations(db, user_id):
+    return db.scalar(select(func.count()).select_from(Recommendation).where(Recommendation.user_id == user_id))
+
+
+def test_incremental_run_recomputes_users_whose_reviews_were_deleted(session_factory, tmp_path):
+    db = session_factory()
+    try:
+        user_ids = _seed(db)
+        model_path = str(tmp_path / "model.npz")
+        assert run_recommender(db, model_path=model_path)["mode"] == "full"
+        emptied, trimmed = user_ids[2], user_ids[3]
+        assert _recommendations(db, emptied) > 0
+
+        for review in db.scalars(select(Reviews).where(Reviews.user_id == emptied)).all():
+            delete_review(db, review.id, emptied)
+        review_id = db.scalar(select(Reviews.id).where(Reviews.user_id == trimmed).limit(1))
+        delete_review(db, review_id, trimmed)
+
+        report = run_recommender(db, model_path=model_path)
+        # the newest review's user and the trimmed one; the emptied one has no ratings left
+        assert (report["mode"], report["users"]) == ("incremental", 2)
+        # nothing left to recommend from
+        assert _recommendations(db, emptied) == 0
+    finally:
+        db.close()
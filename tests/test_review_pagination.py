@@ -0,0 +1,67 @@
+import uuid
+import pytest
+from sqlalchemy import insert, select, text, update
+from app.models.user import Movies, Reviews, User
+from app.services.user_reviews import REVIEW_SORTS, list_reviews_by_movie
+
+
+@pytest.fixture
+def tied_movie(app_session_factory):
+    """
+    A movie with 30 reviews that share one created_at second (as CURRENT_TIMESTAMP
+    stores it), three ratings and one like_count, so every sort has long ties
+    """
+    db = app_session_factory()
+    tag = uuid.uuid4().hex[:8]
+    db.execute(insert(User), [{"username": f"{tag}-{i}", "email": f"{tag}-{i}@example.com", "password": "x"}
+        for i in range(30)])
+    user_ids = list(db.scalars(select(User.id).where(User.username.like(f"{tag}-%")).order_by(User.id)))
+    movie_id = db.execute(insert(Movies).values(title=tag, created_by=user_ids[0])).inserted_primary_key[0]
+    db.execute(insert(Reviews), [{"movie_id": movie_id, "user_id": user_id, "rating": float(i % 3), "like_count": 0}
+        for i, user_id in enumerate(user_ids)])
+    db.execute(update(Reviews).where(Reviews.movie_id == movie_id).values(created_at=text("'2026-01-01 00:00:00'")))
+    db.commit()
+    yield db, movie_id
+    db.close()
+
+
+def _walk(db, movie_id, sort, order, direction):
+    first = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order)
+    pages = [first["reviews"]]
+    cursor = first["next_cursor"]
+    while cursor and len(pages) < 20:
+        page = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order, cursor=cursor)
+        pages.append(page["reviews"])
+        cursor = page["next_cursor"]
+    if direction == "prev":
+        # back from the last page to the first
+        pages = [pages[-1]]
+        cursor = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order,
+            cursor=_last_page_cursor(db, movie_id, sort, order))["prev_cursor"]
+        while cursor and len(pages) < 20:
+            page = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order, cursor=cursor)
+            pages.insert(0, page["reviews"])
+            cursor = page["prev_cursor"]
+    return [review.id for page in pages for review in page]
+
+
+def _last_page_cursor(db, movie_id, sort, order):
+    result = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order)
+    last_cursor = None
+    for _ in range(20):
+        if not result["next_cursor"]:
+            break
+        last_cursor = result["next_cursor"]
+        result = list_reviews_by_movie(db, movie_id, size=7, sort=sort, order=order, cursor=last_cursor)
+    return last_cursor
+
+
+@pytest.mark.parametrize("direction", ["next", "prev"])
+@pytest.mark.parametrize("order", ["desc", "asc"])
+@pytest.mark.parametrize("sort", sorted(REVIEW_SORTS))
+def test_cursor_walks_every_review_once_across_ties(tied_movie, sort, order, direction):
+    db, movie_id = tied_movie
+    col = REVIEW_SORTS[sort]
+    ordering = (col.desc(), Reviews.id.desc()) if order == "desc" else (col, Reviews.id)
+    expected = list(db.scalars(select(Reviews.id).where(Reviews.movie_id == movie_id).order_by(*ordering)))
+    assert _walk(db, movie_id, sort, order, direction) == expected
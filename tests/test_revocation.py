@@ -0,0 +1,43 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from app.core.revocation import TokenDenylist, claim_run
+from app.models.user import RevokedTokens
+
+
+def _revoked_row(db, row_id, revoked_at):
+    jti = uuid.uuid4().hex
+    db.execute(insert(RevokedTokens).values(id=row_id, jti=jti, user_id=1, revoked_at=revoked_at,
+        expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.commit()
+    return jti
+
+
+def test_sync_picks_up_rows_committed_out_of_order(app_session_factory):
+    db = app_session_factory()
+    try:
+        denylist = TokenDenylist()
+        now = datetime.utcnow()
+        top = db.scalar(select(func.max(RevokedTokens.id))) or 0
+        first = _revoked_row(db, top + 10, now)
+        denylist.sync(db)
+        # got its id and revoked_at before the row above, but committed after the sync
+        late = _revoked_row(db, top + 5, now - timedelta(seconds=5))
+        denylist.sync(db)
+        assert denylist.loaded
+        assert denylist.is_revoked(first) and denylist.is_revoked(late)
+    finally:
+        db.close()
+
+
+def test_claim_run_lets_one_worker_run_per_interval(app_session_factory):
+    db = app_session_factory()
+    try:
+        name = f"job-{uuid.uuid4().hex[:8]}"
+        assert claim_run(db, name, 3600)
+        assert not claim_run(db, name, 3600)
+        time.sleep(0.1)
+        assert claim_run(db, name, 0.1)
+    finally:
+        db.close()
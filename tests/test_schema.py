@@ -0,0 +1,89 @@
+import json
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app import cli
+from app.db.schema import upgrade_schema
+
+# Watchlist as created before it had unique_user_movie_watchlist
+_OLD_WATCHLIST = """
+CREATE TABLE "Watchlist" (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    movie_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_OLD_WATCHLIST)
+        conn.exec_driver_sql('INSERT INTO "Watchlist" (user_id, movie_id) VALUES (1, 1), (1, 2), (2, 1)')
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_adds_the_watchlist_unique_index(old_engine):
+    result = upgrade_schema(old_engine)
+    assert [step for step in result["steps"] if "unique_user_movie_watchlist" in step] == [
+        "create index unique_user_movie_watchlist on Watchlist"]
+    assert result["skipped"] == []
+    with old_engine.begin() as conn:
+        conn.exec_driver_sql('INSERT OR IGNORE INTO "Watchlist" (user_id, movie_id) VALUES (1, 1), (3, 3)')
+        assert conn.scalar(text('SELECT count(*) FROM "Watchlist"')) == 4
+    with pytest.raises(IntegrityError), old_engine.begin() as conn:
+        conn.exec_driver_sql('INSERT INTO "Watchlist" (user_id, movie_id) VALUES (2, 1)')
+    # nothing left to do afterwards
+    assert upgrade_schema(old_engine, dry_run=True)["steps"] == []
+
+
+def test_upgrade_reports_duplicates_instead_of_failing(old_engine):
+    with old_engine.begin() as conn:
+        conn.exec_driver_sql('INSERT INTO "Watchlist" (user_id, movie_id) VALUES (1, 1)')
+    result = upgrade_schema(old_engine)
+    assert not [step for step in result["steps"] if "unique_user_movie_watchlist" in step]
+    assert any(item.startswith("Watchlist.unique_user_movie_watchlist: duplicate") for item in result["skipped"])
+
+
+def test_upgrade_keeps_the_constraint_of_databases_created_with_it(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'constraint.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_OLD_WATCHLIST.replace("CURRENT_TIMESTAMP",
+            "CURRENT_TIMESTAMP,\n    CONSTRAINT unique_user_movie_watchlist UNIQUE (user_id, movie_id)"))
+    try:
+        steps = upgrade_schema(engine, dry_run=True)["steps"]
+        assert not [step for step in steps if "unique_user_movie_watchlist" in step]
+    finally:
+        engine.dispose()
+
+
+def test_upgrade_schema_command_rebuilds_the_rating_aggregates_it_adds(tmp_path, monkeypatch, capsys):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ratings.db'}")
+    # SQLite cannot add CURRENT_TIMESTAMP columns, so the old tables already have them
+    stamps = "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE "Movies" (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, '
+            f'rating FLOAT, created_by INTEGER NOT NULL, {stamps})')
+        conn.exec_driver_sql('CREATE TABLE "Reviews" (id INTEGER PRIMARY KEY, movie_id INTEGER NOT NULL, '
+            f'user_id INTEGER NOT NULL, rating FLOAT, {stamps})')
+        conn.exec_driver_sql('INSERT INTO "Movies" (id, title, rating, created_by) VALUES (1, \'a\', 7.0, 1), (2, \'b\', 0, 1)')
+        conn.exec_driver_sql('INSERT INTO "Reviews" (movie_id, user_id, rating) VALUES (1, 1, 6.0), (1, 2, 8.0)')
+    monkeypatch.setattr(cli, "get_engine", lambda: engine)
+    monkeypatch.setattr(cli, "SessionLocal", sessionmaker(bind=engine))
+    try:
+        cli.main(["upgrade-schema", "--dry-run"])
+        assert json.loads(capsys.readouterr().out)["steps"][-1] == "rebuild Movies rating aggregates from Reviews"
+        cli.main(["upgrade-schema"])
+        assert json.loads(capsys.readouterr().out)["steps"][-1] == \
+            "rebuild Movies rating aggregates from Reviews (1 movies)"
+        with engine.connect() as conn:
+            # what the next review write adds its delta to
+            assert conn.exec_driver_sql('SELECT rating_sum, rating_count FROM "Movies" WHERE id = 1').one() == (14.0, 2)
+        cli.main(["upgrade-schema"])
+        assert json.loads(capsys.readouterr().out)["steps"] == []
+    finally:
+        engine.dispose()